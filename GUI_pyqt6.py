@@ -116,59 +116,102 @@
 #     win.show()
 #     sys.exit(app.exec())
 
+import os
 import sys
-import re
 import serial
 import serial.tools.list_ports
-import threading
-from time import time
-from collections import defaultdict
-from PyQt6.QtCore import pyqtSignal, QObject, QTimer, Qt
+from time import perf_counter, perf_counter_ns, strftime
+from PyQt6.QtCore import pyqtSignal, QEvent, QObject, QSortFilterProxyModel, QTimer, Qt
+from PyQt6.QtGui import QStandardItem, QStandardItemModel
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QCheckBox,
-    QLabel, QScrollArea, QFrame, QComboBox, QGroupBox, QMessageBox
+    QLabel, QComboBox, QGridLayout, QMessageBox, QFileDialog, QSpinBox, QLineEdit, QListView,
+    QSizePolicy, QTabWidget
 )
+import numpy as np
 import pyqtgraph as pg
 
+from acquisition import AcquisitionEngine
+from decimate import Decimator
+from export import Exporter, buffer_reader
+from perf_stats import format_snapshot
+from recorder import RecordingReader
+from ring_buffer import RingBuffer
+from spectrum import StreamingSpectrum
+
+# Render loop limits: with nothing new to draw the frame interval backs off up to
+# IDLE_INTERVAL_MS, and drawing may take at most MAX_RENDER_LOAD of the GUI thread
+IDLE_INTERVAL_MS = 250
+MAX_RENDER_LOAD = 0.5
+# Past this many channels all curves are drawn as one item (one draw call)
+BATCH_CURVES_ABOVE = 64
+# Compatibility mode: samples signalled but not yet handled by the GUI thread
+MAX_SIGNAL_BACKLOG = 20000
+# Channels copied out of the engine per lock acquisition by pull_new_data
+PULL_GROUP = 16
+OVERLOAD_LABELS = {
+    "drop_oldest": "Drop oldest",
+    "decimate": "Decimate N:1",
+    "record": "Record all, thin display",
+}
+
+
+def channel_color(index):
+    # Golden-ratio hue steps with alternating brightness, so even neighbours in a
+    # long channel list get clearly different colours
+    return pg.hsvColor((index * 0.618033988749895) % 1.0, sat=0.85, val=1.0 if index % 2 == 0 else 0.7)
+
 
 class SerialReader(QObject):
-    new_data = pyqtSignal(str, float)
+    new_data = pyqtSignal(str, float, float)  # label, timestamp taken by the reader, value
 
-    def __init__(self):
+    def __init__(self, engine):
         super().__init__()
-        self.serial = None
-        self.running = False
-        self.pattern = re.compile(r">(\w+):\s*(-?\d+\.?\d*)")
-
-    def start(self, port, baudrate, parity, databits, stopbits):
+        self.engine = engine
+        # Batch mode: the GUI pulls new samples from the engine once per frame;
+        # otherwise new_data is emitted for every sample (compatibility mode)
+        self.batch_mode = True
+        # "text", "binary" or "auto" (decided from the first bytes received)
+        self.protocol = "auto"
+        self.emitted = 0  # signals sent in compatibility mode, for the stats overlay
+        self.handled = 0  # ... and handled by the GUI thread
+        self.stale_until = 0  # queued signals up to this count are skipped (drop_oldest)
+
+    def start(self, port, baudrate, parity, databits, stopbits, speed=1.0):
+        # `port` may also be "synthetic" or a recording/capture path (see sources.open_source),
+        # or several of them separated by commas, read together as "<port>/<label>" channels
+        ports = [p.strip() for p in port.split(",") if p.strip()]
+        port = ports[0] if len(ports) == 1 else ports
+        self.engine.protocol = self.protocol
+        self.engine.listeners = [] if self.batch_mode else [self.emit_samples]
         try:
-            self.serial = serial.Serial(
-                port=port,
-                baudrate=baudrate,
-                parity=parity,
-                bytesize=databits,
-                stopbits=stopbits,
-                timeout=1
-            )
-            self.running = True
-            threading.Thread(target=self.read_loop, daemon=True).start()
+            self.engine.open(port, baudrate, speed=speed, parity=parity, bytesize=databits, stopbits=stopbits)
         except Exception as e:
             QMessageBox.critical(None, "Serial Error", f"Could not open serial port:\n{e}")
 
-    def read_loop(self):
-        while self.running and self.serial and self.serial.is_open:
-            try:
-                line = self.serial.readline().decode("utf-8").strip()
-                matches = self.pattern.findall(line)
-                for label, value in matches:
-                    self.new_data.emit(label, float(value))
-            except Exception:
-                pass
+    def emit_samples(self, label, t, values):
+        # The Qt event queue is bounded too: past MAX_SIGNAL_BACKLOG pending samples
+        # the queued ones are dropped (signals cannot be taken back, so the GUI thread
+        # skips them), or new batches thinned N:1 under the decimating policies
+        backlog = self.emitted - self.handled
+        if backlog > MAX_SIGNAL_BACKLOG:
+            stats = self.engine.stats
+            if self.engine.overload_policy == "drop_oldest":
+                stale = self.emitted - max(self.handled, self.stale_until)
+                self.stale_until = self.emitted
+                stats.add("signal_dropped", stale)
+                stats.alarm("signal_queue", f"{backlog} samples waiting for the GUI, dropping the oldest")
+            else:
+                step = 1 + backlog // MAX_SIGNAL_BACKLOG
+                stats.add("signal_decimated", len(values) - len(values[::step]))
+                stats.alarm("signal_queue", f"{backlog} samples waiting for the GUI, keeping 1 in {step}")
+                t, values = t[::step], values[::step]
+        self.emitted += len(values)
+        for t_value, value in zip(t.tolist(), values.tolist()):
+            self.new_data.emit(label, t_value, value)
 
     def stop(self):
-        self.running = False
-        if self.serial and self.serial.is_open:
-            self.serial.close()
+        self.engine.stop()
 
 
 class SerialPlotter(QWidget):
@@ -180,68 +223,245 @@ class SerialPlotter(QWidget):
         main_layout = QVBoxLayout(self)
         self.plotWidget = pg.PlotWidget()
         self.plotWidget.showGrid(x=True, y=True)
-        main_layout.addWidget(self.plotWidget)
+        main_layout.addWidget(self.plotWidget, 1)
+
+        # Spectrum views, shown instead of the time plot: Welch PSD of every channel,
+        # or the STFT waterfall (time x frequency) of one channel
+        self.spectrumWidget = pg.PlotWidget()
+        self.spectrumWidget.showGrid(x=True, y=True)
+        self.spectrumWidget.setLabel("bottom", "Frequency", units="Hz")
+        self.spectrumWidget.setLabel("left", "PSD (dB)")
+        self.spectrumWidget.hide()
+        main_layout.addWidget(self.spectrumWidget, 1)
+        self.waterfallWidget = pg.PlotWidget()
+        self.waterfallWidget.setLabel("bottom", "Frequency", units="Hz")
+        self.waterfallWidget.setLabel("left", "Segment")
+        self.waterfallImage = pg.ImageItem(axisOrder="row-major")
+        self.waterfallImage.setColorMap(pg.colormap.get("viridis"))
+        self.waterfallWidget.addItem(self.waterfallImage)
+        self.waterfallWidget.hide()
+        main_layout.addWidget(self.waterfallWidget, 1)
+
+        # Performance overlay in the top-left corner of the plot
+        self.statsLabel = QLabel(self.plotWidget)
+        self.statsLabel.setStyleSheet("background: rgba(0, 0, 0, 160); color: white; font-family: monospace; padding: 4px;")
+        self.statsLabel.move(60, 10)
+        self.statsLabel.hide()
 
         # Khu vực config và toggle
         config_toggle_layout = QHBoxLayout()
         main_layout.addLayout(config_toggle_layout)
 
-        # --- Serial Config ---
-        self.serialGroup = QGroupBox("Serial Config")
-        config_layout = QVBoxLayout(self.serialGroup)
+        # --- Config ---
+        # Settings are grouped into tabs so the window fits a 1080p screen and the plot
+        # keeps most of the height; the connect/record buttons and the alarm and export
+        # status lines stay visible below the tabs
+        self.transportBox = QComboBox()
+        self.netPortBox = QSpinBox()
         self.portBox = QComboBox()
+        self.portBox.setEditable(True)
         self.baudBox = QComboBox()
         self.parityBox = QComboBox()
         self.databitsBox = QComboBox()
         self.stopbitsBox = QComboBox()
+        self.protocolBox = QComboBox()
+        self.speedBox = QComboBox()
+        self.batchCheck = QCheckBox("Batch samples")
+        self.processCheck = QCheckBox("Read in separate process")
+        self.overrunLabel = QLabel("Overruns: 0")
+        self.overloadBox = QComboBox()
+        self.statsCheck = QCheckBox("Show stats")
+        self.fpsBox = QSpinBox()
+        self.budgetBox = QSpinBox()
+        self.viewBox = QComboBox()
+        self.fftSizeBox = QComboBox()
+        self.waterfallChannelBox = QComboBox()
 
         self.refreshButton = QPushButton("Refresh Ports")
+        self.replayButton = QPushButton("Replay File...")
+        self.replayRecordingButton = QPushButton("Replay Recording...")
         self.connectButton = QPushButton("Connect")
         self.disconnectButton = QPushButton("Disconnect")
-
-        config_layout.addWidget(QLabel("Port:"))
-        config_layout.addWidget(self.portBox)
-        config_layout.addWidget(self.refreshButton)
-        config_layout.addWidget(QLabel("Baudrate:"))
-        config_layout.addWidget(self.baudBox)
-        config_layout.addWidget(QLabel("Parity:"))
-        config_layout.addWidget(self.parityBox)
-        config_layout.addWidget(QLabel("Data Bits:"))
-        config_layout.addWidget(self.databitsBox)
-        config_layout.addWidget(QLabel("Stop Bits:"))
-        config_layout.addWidget(self.stopbitsBox)
-        config_layout.addWidget(self.connectButton)
-        config_layout.addWidget(self.disconnectButton)
-
-        config_toggle_layout.addWidget(self.serialGroup)
+        self.recordButton = QPushButton("Start Recording")
+        self.exportButton = QPushButton("Export View...")
+        self.exportRecordingButton = QPushButton("Export Recording...")
+        self.wideCheck = QCheckBox("Export as wide table")
+        self.exportLabel = QLabel("")
+
+        # Each tab is a grid of "label, field" pairs, two pairs per row
+        connection_tab = QWidget()
+        connection_layout = QGridLayout(connection_tab)
+        connection_layout.addWidget(QLabel("Transport:"), 0, 0)
+        connection_layout.addWidget(self.transportBox, 0, 1)
+        connection_layout.addWidget(QLabel("Listen Port (UDP/TCP):"), 0, 2)
+        connection_layout.addWidget(self.netPortBox, 0, 3)
+        connection_layout.addWidget(QLabel("Port(s), comma separated:"), 1, 0)
+        connection_layout.addWidget(self.portBox, 1, 1, 1, 3)
+        connection_layout.addWidget(QLabel("Baudrate:"), 2, 0)
+        connection_layout.addWidget(self.baudBox, 2, 1)
+        connection_layout.addWidget(QLabel("Parity:"), 2, 2)
+        connection_layout.addWidget(self.parityBox, 2, 3)
+        connection_layout.addWidget(QLabel("Data Bits:"), 3, 0)
+        connection_layout.addWidget(self.databitsBox, 3, 1)
+        connection_layout.addWidget(QLabel("Stop Bits:"), 3, 2)
+        connection_layout.addWidget(self.stopbitsBox, 3, 3)
+        connection_layout.addWidget(QLabel("Protocol:"), 4, 0)
+        connection_layout.addWidget(self.protocolBox, 4, 1)
+        connection_layout.addWidget(QLabel("Replay/Synthetic Speed:"), 4, 2)
+        connection_layout.addWidget(self.speedBox, 4, 3)
+        connection_layout.addWidget(self.batchCheck, 5, 0, 1, 2)
+        connection_layout.addWidget(self.processCheck, 5, 2, 1, 2)
+        source_layout = QHBoxLayout()
+        source_layout.addWidget(self.refreshButton)
+        source_layout.addWidget(self.replayButton)
+        source_layout.addWidget(self.replayRecordingButton)
+        connection_layout.addLayout(source_layout, 6, 0, 1, 4)
+        connection_layout.setRowStretch(7, 1)
+
+        display_tab = QWidget()
+        display_layout = QGridLayout(display_tab)
+        display_layout.addWidget(QLabel("View:"), 0, 0)
+        display_layout.addWidget(self.viewBox, 0, 1)
+        display_layout.addWidget(QLabel("FFT Size:"), 0, 2)
+        display_layout.addWidget(self.fftSizeBox, 0, 3)
+        display_layout.addWidget(QLabel("Waterfall Channel:"), 1, 0)
+        display_layout.addWidget(self.waterfallChannelBox, 1, 1)
+        display_layout.addWidget(QLabel("Target FPS:"), 2, 0)
+        display_layout.addWidget(self.fpsBox, 2, 1)
+        display_layout.addWidget(QLabel("Frame Budget (ms):"), 2, 2)
+        display_layout.addWidget(self.budgetBox, 2, 3)
+        display_layout.addWidget(self.statsCheck, 3, 0, 1, 2)
+        display_layout.setRowStretch(4, 1)
+
+        export_tab = QWidget()
+        export_layout = QGridLayout(export_tab)
+        export_layout.addWidget(self.exportButton, 0, 0)
+        export_layout.addWidget(self.exportRecordingButton, 0, 1)
+        export_layout.addWidget(self.wideCheck, 1, 0, 1, 2)
+        export_layout.setRowStretch(2, 1)
+
+        overload_tab = QWidget()
+        overload_layout = QGridLayout(overload_tab)
+        overload_layout.addWidget(QLabel("Overload Policy:"), 0, 0)
+        overload_layout.addWidget(self.overloadBox, 0, 1)
+        overload_layout.setRowStretch(1, 1)
+
+        self.configTabs = QTabWidget()
+        self.configTabs.addTab(connection_tab, "Serial Config")
+        self.configTabs.addTab(display_tab, "Display")
+        self.configTabs.addTab(export_tab, "Export")
+        self.configTabs.addTab(overload_tab, "Overload")
+
+        action_layout = QHBoxLayout()
+        action_layout.addWidget(self.connectButton)
+        action_layout.addWidget(self.disconnectButton)
+        action_layout.addWidget(self.recordButton)
+
+        config_layout = QVBoxLayout()
+        config_layout.addWidget(self.configTabs)
+        config_layout.addLayout(action_layout)
+        config_layout.addWidget(self.overrunLabel)
+        config_layout.addWidget(self.exportLabel)
+        config_toggle_layout.addLayout(config_layout)
 
         # --- Plot Toggles ---
-        self.checkboxFrame = QFrame()
-        self.checkboxLayout = QVBoxLayout(self.checkboxFrame)
-        self.checkboxScroll = QScrollArea()
-        self.checkboxScroll.setWidget(self.checkboxFrame)
-        self.checkboxScroll.setWidgetResizable(True)
+        # One checkable model row per channel; the list view only creates what is on
+        # screen, and the filter box narrows it down by name
+        self.channelModel = QStandardItemModel()
+        self.channelProxy = QSortFilterProxyModel()
+        self.channelProxy.setSourceModel(self.channelModel)
+        self.channelProxy.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.channelFilter = QLineEdit()
+        self.channelFilter.setPlaceholderText("Filter channels")
+        self.channelList = QListView()
+        self.channelList.setModel(self.channelProxy)
+        self.channelList.setUniformItemSizes(True)
+        # The list takes whatever height the config tabs leave, not its own size hint
+        self.channelList.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Ignored)
+        self.channelList.setMinimumHeight(60)
+        self.showAllButton = QPushButton("Show All")
+        self.hideAllButton = QPushButton("Hide All")
+        self.batchCurvesCheck = QCheckBox("Draw all channels as one curve")
+        show_hide_layout = QHBoxLayout()
+        show_hide_layout.addWidget(self.showAllButton)
+        show_hide_layout.addWidget(self.hideAllButton)
 
         checkbox_container = QVBoxLayout()
         checkbox_container.addWidget(QLabel("Toggle Plot Lines"))
-        checkbox_container.addWidget(self.checkboxScroll)
+        checkbox_container.addWidget(self.channelFilter)
+        checkbox_container.addWidget(self.channelList)
+        checkbox_container.addLayout(show_hide_layout)
+        checkbox_container.addWidget(self.batchCurvesCheck)
+
+        # Derived channels: "name = expression", e.g. "diff = a - b" or "lp = lowpass(a, 5)"
+        self.derivedEdit = QLineEdit()
+        self.derivedEdit.setPlaceholderText("name = expression, e.g. rms_a = rms(a, 0.1)")
+        self.derivedButton = QPushButton("Add Derived Channel")
+        checkbox_container.addWidget(self.derivedEdit)
+        checkbox_container.addWidget(self.derivedButton)
 
         checkbox_widget = QWidget()
         checkbox_widget.setLayout(checkbox_container)
         config_toggle_layout.addWidget(checkbox_widget)
 
-        # Plot data
-        self.data_buffers = defaultdict(lambda: {"x": [], "y": []})
+        # Plot data: one RingBuffer per channel, capacity can be overridden per label.
+        # The live (auto range) view draws from it; panning or zooming out draws from
+        # the channel's MinMaxPyramid, which the engine keeps for the whole session.
+        self.buffer_capacity = 1000
+        self.channel_capacity = {}
+        self.data_buffers = {}
+        self.exporter = None  # running or last export job, polled once per frame
+
+        # Spectrum mode: each channel's StreamingSpectrum is fed from its RingBuffer
+        # once per frame with the samples it has not seen yet (spectrum_seq), and only
+        # while a spectrum view is shown. spectrum_gaps: ring sequence numbers where
+        # the pull skipped samples, so no segment spans them
+        self.view_mode = "Time"
+        self.fft_size = 1024
+        self.spectra = {}
+        self.spectrum_seq = {}
+        self.spectrum_gaps = {}
+        self.spectrum_curves = {}
         self.curves = {}
-        self.checkboxes = {}
-
-        # Serial reader
-        self.reader = SerialReader()
+        self.channel_items = {}
+        self.hidden = set()  # hidden channels are not even pulled from the engine
+        # Batched drawing: every visible curve's decimated points in one PlotCurveItem,
+        # separated with a connect array (one colour, one draw call)
+        self.batch_curves = False
+        self.batch_parts = {}
+        self.batchCurve = pg.PlotCurveItem(pen=pg.mkPen(channel_color(0)))
+        self.batchCurve.hide()
+        self.plotWidget.addItem(self.batchCurve)
+        self.decimators = {}
+
+        # Acquisition runs headless in the engine; the plot pulls new samples per frame
+        self.engine = AcquisitionEngine()
+        self.engine.keep_history = True
+        self.read_seq = {}
+        self.pull_pending = {}  # label -> None, channels a budget-limited pull left for later
+        self.reader = SerialReader(self.engine)
         self.reader.new_data.connect(self.handle_new_data)
 
+        # The engine's stats also carry the GUI side: frame times and queue depths
+        self.stats = self.engine.stats
+        self.stats.gauges["pending_samples"] = self.pending_samples
+        self.stats.gauges["signal_queue"] = lambda: self.reader.emitted - self.reader.handled
+        self.stats_shown_at = 0.0
+
+        # Render loop: up to target_fps frames/s while data arrives, slower when idle
+        # or when frames get expensive, paused while the window is hidden. Only dirty
+        # curves (new samples or a new view) are re-uploaded; uploads past the frame
+        # budget wait for the next frame.
+        self.target_fps = 30
+        self.frame_budget_ms = 15
+        self.dirty = {}  # label -> None, in the order the changes came in
+        self.view_key = None
+        self.frame_cost = 0.0  # running average, seconds
+        self.idle_frames = 0
+        self.render_paused = False
         self.timer = QTimer()
         self.timer.timeout.connect(self.update_plot)
-        self.timer.start(50)
+        self.timer.start(int(1000 / self.target_fps))
 
         # UI setup
         self.setup_ui()
@@ -255,18 +475,76 @@ class SerialPlotter(QWidget):
         self.databitsBox.addItems(["5", "6", "7", "8"])
         self.databitsBox.setCurrentText("8")
         self.stopbitsBox.addItems(["1", "1.5", "2"])
+        self.protocolBox.addItems(["Auto", "Text", "Binary"])
+        self.speedBox.addItems(["1x", "2x", "10x", "100x", "Max"])
+        # Network devices (e.g. ESP32 over Wi-Fi) send the same text to a UDP or TCP port
+        self.transportBox.addItems(["Serial", "UDP", "TCP"])
+        self.netPortBox.setRange(1, 65535)
+        self.netPortBox.setValue(4210)
+        self.batchCheck.setChecked(True)
 
         self.refreshButton.clicked.connect(self.refresh_ports)
+        self.replayButton.clicked.connect(self.choose_replay)
+        self.replayRecordingButton.clicked.connect(self.choose_replay_recording)
         self.connectButton.clicked.connect(self.connect_serial)
         self.disconnectButton.clicked.connect(self.disconnect_serial)
+        self.recordButton.clicked.connect(self.toggle_recording)
+        self.exportButton.clicked.connect(self.export_view)
+        self.exportRecordingButton.clicked.connect(self.export_recording)
+        self.derivedButton.clicked.connect(self.add_derived)
+        self.derivedEdit.returnPressed.connect(self.add_derived)
+        self.channelFilter.textChanged.connect(self.channelProxy.setFilterFixedString)
+        self.channelModel.itemChanged.connect(self.channel_item_changed)
+        self.showAllButton.clicked.connect(lambda: self.set_filtered_visible(True))
+        self.hideAllButton.clicked.connect(lambda: self.set_filtered_visible(False))
+        self.batchCurvesCheck.stateChanged.connect(self.set_batch_curves)
+        for policy, text in OVERLOAD_LABELS.items():
+            self.overloadBox.addItem(text, policy)
+        self.overloadBox.currentIndexChanged.connect(self.set_overload_policy)
+        self.statsCheck.stateChanged.connect(self.toggle_stats)
+        self.fpsBox.setRange(1, 120)
+        self.fpsBox.setValue(self.target_fps)
+        self.fpsBox.valueChanged.connect(self.set_target_fps)
+        self.budgetBox.setRange(1, 1000)
+        self.budgetBox.setValue(self.frame_budget_ms)
+        self.budgetBox.valueChanged.connect(self.set_frame_budget)
+        self.viewBox.addItems(["Time", "Spectrum", "Waterfall"])
+        self.viewBox.currentTextChanged.connect(self.set_view_mode)
+        self.fftSizeBox.addItems([str(2 ** k) for k in range(8, 15)])
+        self.fftSizeBox.setCurrentText(str(self.fft_size))
+        self.fftSizeBox.currentTextChanged.connect(self.set_fft_size)
+        self.waterfallChannelBox.currentTextChanged.connect(self.mark_all_dirty)
 
     def refresh_ports(self):
         self.portBox.clear()
         ports = [port.device for port in serial.tools.list_ports.comports()]
         self.portBox.addItems(ports)
+        if len(ports) > 1:
+            # Every port at once, one reader for all of them
+            self.portBox.addItem(", ".join(ports))
+        # Generated test traffic: 4 channels at 1 kHz
+        self.portBox.addItem("synthetic:4:1000")
+
+    def choose_replay(self):
+        # A text capture file
+        path, _ = QFileDialog.getOpenFileName(self, "Replay Capture")
+        self.set_replay_path(path)
+
+    def choose_replay_recording(self):
+        # A recording folder (raw.bin + raw.offsets)
+        self.set_replay_path(QFileDialog.getExistingDirectory(self, "Replay Recording Folder"))
+
+    def set_replay_path(self, path):
+        if path:
+            self.portBox.addItem(path)
+            self.portBox.setCurrentText(path)
 
     def connect_serial(self):
         port = self.portBox.currentText()
+        transport = self.transportBox.currentText()
+        if transport != "Serial":
+            # Listen on every interface; see sources.UdpSource / TcpSource
+            port = f"{transport.lower()}://:{self.netPortBox.value()}"
         baudrate = int(self.baudBox.currentText())
         parity_map = {"None": serial.PARITY_NONE, "Even": serial.PARITY_EVEN, "Odd": serial.PARITY_ODD}
         parity = parity_map[self.parityBox.currentText()]
@@ -274,43 +552,439 @@ class SerialPlotter(QWidget):
         stopbits_map = {"1": serial.STOPBITS_ONE, "1.5": serial.STOPBITS_ONE_POINT_FIVE, "2": serial.STOPBITS_TWO}
         stopbits = stopbits_map[self.stopbitsBox.currentText()]
 
-        self.reader.start(port, baudrate, parity, databits, stopbits)
+        self.reader.batch_mode = self.batchCheck.isChecked()
+        self.reader.protocol = self.protocolBox.currentText().lower()
+        self.engine.use_process = self.processCheck.isChecked()
+        speed = self.speedBox.currentText()
+        speed = None if speed == "Max" else float(speed.rstrip("x"))
+        self.read_seq = {label: self.engine.seq(label) for label in self.engine.labels()}
+        self.reader.start(port, baudrate, parity, databits, stopbits, speed)
 
     def disconnect_serial(self):
         self.reader.stop()
 
-    def handle_new_data(self, label, value):
-        t = time()
-        buffer = self.data_buffers[label]
-        buffer["x"].append(t)
-        buffer["y"].append(value)
-        if len(buffer["x"]) > 1000:
-            buffer["x"] = buffer["x"][-1000:]
-            buffer["y"] = buffer["y"][-1000:]
+    def toggle_recording(self):
+        if self.engine.recorder is not None:
+            directory = self.engine.recorder.directory
+            self.engine.stop_recording()
+            self.recordButton.setText("Start Recording")
+            self.attach_recording(directory)
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Recording Folder")
+        if not folder:
+            return
+        # One sub-folder per recording; raw bytes are logged too when reading in-process
+        self.engine.start_recording(os.path.join(folder, strftime("%Y%m%d-%H%M%S")), raw=True)
+        self.recordButton.setText("Stop Recording")
+
+    def export_path(self, title):
+        path, chosen = QFileDialog.getSaveFileName(
+            self, title, "", "CSV (*.csv);;NumPy archive (*.npz);;Parquet (*.parquet)")
+        if path and not os.path.splitext(path)[1]:
+            path += "." + chosen.split("*.")[-1].rstrip(")")
+        return path
+
+    def export_view(self):
+        # Visible channels over the current view (the whole buffer when following the data)
+        if self.exporter is not None and not self.exporter.finished:
+            self.exporter.cancel()
+            return
+        path = self.export_path("Export View")
+        if not path:
+            return
+        labels = [label for label in self.curves if label not in self.hidden]
+        x0, x1 = self.view_key[:2] if self.view_key else (None, None)
+        self.start_export(buffer_reader(self.engine), labels, path, x0, x1)
+
+    def export_recording(self):
+        # Every channel of a recording folder, streamed from disk
+        if self.exporter is not None and not self.exporter.finished:
+            self.exporter.cancel()
+            return
+        folder = QFileDialog.getExistingDirectory(self, "Recording Folder")
+        if not folder:
+            return
+        try:
+            reader = RecordingReader(folder)
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, "Export", f"Not a recording: {e}")
+            return
+        path = self.export_path("Export Recording")
+        if path:
+            self.start_export(reader.read, reader.labels(), path)
+
+    def start_export(self, read, labels, path, t0=None, t1=None):
+        try:
+            self.exporter = Exporter(read, labels, path, t0, t1, wide=self.wideCheck.isChecked())
+        except ValueError as e:
+            QMessageBox.warning(self, "Export", str(e))
+            return
+        self.exporter.start()
+        self.exportButton.setText("Cancel Export")
+        self.exportRecordingButton.setText("Cancel Export")
+
+    def show_export(self):
+        exporter = self.exporter
+        if exporter is None:
+            return
+        if not exporter.finished:
+            self.exportLabel.setText(f"Exporting: {exporter.progress:.0%}")
+            return
+        self.exporter = None
+        self.exportButton.setText("Export View...")
+        self.exportRecordingButton.setText("Export Recording...")
+        if exporter.error:
+            self.exportLabel.setText("Export failed")
+            QMessageBox.warning(self, "Export", exporter.error)
+        elif exporter.cancelled:
+            self.exportLabel.setText("Export cancelled")
+        else:
+            self.exportLabel.setText(f"Exported {exporter.total} samples to {os.path.basename(exporter.path)}")
+
+    def add_derived(self):
+        # "name = expression" adds or replaces a channel, "name =" removes it
+        name, sep, expression = self.derivedEdit.text().partition("=")
+        name = name.strip()
+        if not sep or not name:
+            QMessageBox.warning(self, "Derived Channel", "Use the form: name = expression")
+            return
+        if not expression.strip():
+            self.engine.remove_derived(name)
+            return
+        try:
+            self.engine.add_derived(name, expression.strip())
+        except ValueError as e:
+            QMessageBox.warning(self, "Derived Channel", str(e))
+            return
+        self.derivedEdit.clear()
+
+    def get_buffer(self, label):
+        buffer = self.data_buffers.get(label)
+        if buffer is None:
+            capacity = self.channel_capacity.get(label, self.buffer_capacity)
+            buffer = self.data_buffers[label] = RingBuffer(capacity)
+        return buffer
+
+    def attach_recording(self, directory):
+        # Zooms into the past finer than the pyramids hold read the recording instead
+        try:
+            self.engine.attach_history(RecordingReader(directory))
+        except (OSError, ValueError):
+            return
+
+    def set_buffer_capacity(self, label, capacity):
+        self.channel_capacity[label] = capacity
+        if label in self.data_buffers:
+            self.data_buffers[label].resize(capacity)
+
+    def handle_new_data(self, label, t, value):
+        self.reader.handled += 1
+        if self.reader.handled <= self.reader.stale_until:
+            return  # dropped while the queue was over MAX_SIGNAL_BACKLOG (counted there)
+        self.get_buffer(label).append(t, value)
+        self.dirty[label] = None
 
         if label not in self.curves:
             self.add_curve(label)
 
+    def pull_new_data(self, deadline):
+        # New samples of every changed channel until `deadline` (at least one channel);
+        # the rest go first next frame. Only what fits the display ring is copied, so
+        # a channel that was hidden or paused catches up in one bounded step (the
+        # engine's history pyramid has been fed all along).
+        for label in self.engine.updated(self.read_seq):
+            if label not in self.hidden:  # hidden ones are pulled when shown again
+                self.pull_pending[label] = None
+        pending = list(self.pull_pending)
+        for i in range(0, len(pending), PULL_GROUP):
+            if i and perf_counter_ns() > deadline:
+                break
+            group = pending[i:i + PULL_GROUP]
+            since = {label: self.read_seq.get(label, 0) for label in group}
+            newest = {label: self.get_buffer(label).capacity for label in group}
+            for label, (seq, t, values) in self.engine.windows(since, newest).items():
+                del self.pull_pending[label]
+                self.read_seq[label] = seq
+                if not len(values):
+                    continue
+                if since[label] and seq - since[label] > len(values):
+                    self.spectrum_gaps[label] = self.data_buffers[label].seq
+                self.data_buffers[label].extend(t, values)
+                self.dirty[label] = None
+                if label not in self.curves:
+                    self.add_curve(label)
+
+    def pending_samples(self):
+        # Samples the engine holds that the plot has not pulled yet (batch mode)
+        if not self.reader.batch_mode:
+            return 0
+        return sum(max(self.engine.seq(label) - self.read_seq.get(label, 0), 0) for label in self.engine.labels())
+
+    def stats_snapshot(self):
+        return self.engine.stats_snapshot()
+
+    def toggle_stats(self):
+        self.statsLabel.setVisible(self.statsCheck.isChecked())
+        self.stats_shown_at = 0.0
+
+    def show_stats(self):
+        # Refreshed twice a second; the snapshot is too coarse to be worth more
+        now = perf_counter()
+        if now - self.stats_shown_at < 0.5:
+            return
+        self.stats_shown_at = now
+        self.statsLabel.setText(format_snapshot(self.stats_snapshot()))
+        self.statsLabel.adjustSize()
+        self.statsLabel.raise_()
+
     def add_curve(self, label):
-        color = pg.intColor(len(self.curves))
+        color = channel_color(len(self.curves))
         self.curves[label] = self.plotWidget.plot([], [], pen=color, name=label)
-        checkbox = QCheckBox(label)
-        checkbox.setChecked(True)
-        checkbox.stateChanged.connect(lambda: self.toggle_curve(label))
-        self.checkboxes[label] = checkbox
-        self.checkboxLayout.addWidget(checkbox)
+        self.curves[label].setVisible(not self.batch_curves)
+        self.decimators[label] = Decimator()
+        item = QStandardItem(label)
+        item.setCheckable(True)
+        item.setCheckState(Qt.CheckState.Checked)
+        item.setEditable(False)
+        item.setForeground(color)
+        self.channel_items[label] = item
+        self.channelModel.appendRow(item)
+        self.spectrum_curves[label] = self.spectrumWidget.plot([], [], pen=color, name=label)
+        self.waterfallChannelBox.addItem(label)
+        if len(self.curves) == BATCH_CURVES_ABOVE + 1:
+            self.batchCurvesCheck.setChecked(True)
+
+    def channel_item_changed(self, item):
+        self.toggle_curve(item.text(), item.checkState() == Qt.CheckState.Checked)
+
+    def set_filtered_visible(self, visible):
+        # Show/Hide All act on the channels the filter lets through
+        state = Qt.CheckState.Checked if visible else Qt.CheckState.Unchecked
+        for row in range(self.channelProxy.rowCount()):
+            source = self.channelProxy.mapToSource(self.channelProxy.index(row, 0))
+            self.channelModel.itemFromIndex(source).setCheckState(state)
+
+    def toggle_curve(self, label, visible):
+        if visible:
+            self.hidden.discard(label)
+            self.dirty[label] = None
+        else:
+            self.hidden.add(label)
+            if self.batch_parts.pop(label, None) is not None:
+                self.dirty[label] = None  # rebuilds the batched curve without it
+        self.curves[label].setVisible(visible and not self.batch_curves)
+        self.spectrum_curves[label].setVisible(visible)
+
+    def set_batch_curves(self):
+        self.batch_curves = self.batchCurvesCheck.isChecked()
+        for label, curve in self.curves.items():
+            curve.setVisible(not self.batch_curves and label not in self.hidden)
+            self.decimators[label].invalidate()
+        self.batchCurve.setVisible(self.batch_curves)
+        self.batch_parts.clear()
+        self.batchCurve.setData([], [])
+        self.mark_all_dirty()
+
+    def draw_batch(self):
+        # One PlotCurveItem for every visible channel; connect=False ends each channel's line
+        parts = list(self.batch_parts.values())
+        if not parts:
+            self.batchCurve.setData([], [])
+            return
+        x = np.concatenate([p[0] for p in parts])
+        y = np.concatenate([p[1] for p in parts])
+        connect = np.ones(len(x), dtype=bool)
+        connect[np.cumsum([len(p[0]) for p in parts]) - 1] = False
+        self.batchCurve.setData(x, y, connect=connect)
+
+    def mark_all_dirty(self):
+        self.dirty.update(dict.fromkeys(self.curves))
+
+    def set_view_mode(self, mode):
+        self.view_mode = mode
+        self.plotWidget.setVisible(mode == "Time")
+        self.spectrumWidget.setVisible(mode == "Spectrum")
+        self.waterfallWidget.setVisible(mode == "Waterfall")
+        if mode != "Time":
+            self.reset_spectra()
+        self.mark_all_dirty()
+
+    def set_fft_size(self, text):
+        self.fft_size = int(text)
+        self.reset_spectra()
+        self.mark_all_dirty()
+
+    def reset_spectra(self):
+        # Restart from what the ring buffers hold now
+        self.spectra.clear()
+        self.spectrum_gaps.clear()
+        for label, buffer in self.data_buffers.items():
+            self.spectrum_seq[label] = buffer.seq - len(buffer)
 
-    def toggle_curve(self, label):
-        visible = self.checkboxes[label].isChecked()
-        self.curves[label].setVisible(visible)
+    def update_spectrum(self, label):
+        spectrum = self.spectra.get(label)
+        if spectrum is None:
+            spectrum = self.spectra[label] = StreamingSpectrum(self.fft_size)
+        buffer = self.data_buffers[label]
+        new = buffer.seq - self.spectrum_seq.get(label, buffer.seq - len(buffer))
+        self.spectrum_seq[label] = buffer.seq
+        gap = self.spectrum_gaps.pop(label, None)
+        if new > len(buffer):
+            spectrum.restart()  # the ring overran between frames: start a fresh segment
+            new = len(buffer)
+        if new:
+            x, y = buffer.view()
+            x, y = x[-new:], y[-new:]
+            # Samples before and after a skip in the pull go in separately (the
+            # spectrum also restarts at timestamp jumps on its own)
+            split = 0 if gap is None else max(gap - (buffer.seq - new), 0)
+            count = spectrum.feed(x[:split], y[:split]) if split else 0
+            if gap is not None:
+                spectrum.restart()
+            if not count + spectrum.feed(x[split:], y[split:]):
+                return
+        if self.view_mode == "Spectrum":
+            freqs, psd = spectrum.welch()
+            self.spectrum_curves[label].setData(freqs, 10 * np.log10(np.maximum(psd, 1e-20)))
+        elif label == self.waterfallChannelBox.currentText():
+            rows = spectrum.waterfall()
+            if len(rows):
+                self.waterfallImage.setImage(10 * np.log10(np.maximum(rows, 1e-20)))
+                self.waterfallImage.setRect(0, 0, spectrum.rate / 2, len(rows))
+
+    def set_target_fps(self, fps):
+        self.target_fps = fps
+        self.idle_frames = 0
+        self.timer.setInterval(int(1000 / fps))
+
+    def set_frame_budget(self, ms):
+        self.frame_budget_ms = ms
 
     def update_plot(self):
-        for label, buffer in self.data_buffers.items():
-            if label in self.curves and self.checkboxes[label].isChecked():
-                self.curves[label].setData(buffer["x"], buffer["y"])
+        # The frame budget covers pulling and drawing: the pull gets half of it, the
+        # uploads what is left but at least the other half, and at least one curve is
+        # uploaded per frame however long the pull took. The whole frame's cost sets
+        # the frame rate (schedule_frame).
+        start = perf_counter_ns()
+        budget = self.frame_budget_ms * 1_000_000
+        if self.reader.batch_mode:
+            self.pull_new_data(start + budget // 2)
+        active = bool(self.dirty)
+        self.show_alarms()
+        self.show_export()
+
+        # About 2 points per pixel of the current view; while the view follows
+        # the data (auto range) the whole buffer is in view
+        view_box = self.plotWidget.getViewBox()
+        pixels = max(int(view_box.width()), 1)
+        if view_box.autoRangeEnabled()[0]:
+            x0 = x1 = None
+        else:
+            x0, x1 = view_box.viewRange()[0]
+        if (x0, x1, pixels) != self.view_key:
+            # Panned, zoomed or resized: every curve needs new decimation
+            self.view_key = (x0, x1, pixels)
+            self.dirty.update(dict.fromkeys(self.curves))
+
+        deadline = max(start + budget, perf_counter_ns() + budget // 2)
+        batch_changed = False
+        uploaded = False
+        for label in list(self.dirty):
+            if uploaded and perf_counter_ns() > deadline:
+                break  # the rest keep their place at the front of the queue
+            del self.dirty[label]
+            if label not in self.curves:
+                continue
+            if label in self.hidden:
+                batch_changed = True  # only dirty here if it just left the batched curve
+                continue
+            uploaded = True
+            if self.view_mode != "Time":
+                self.update_spectrum(label)
+                continue
+            if x0 is not None:
+                # Panned or zoomed: the right pyramid level, O(pixels) per curve
+                x, y = self.engine.history(label, x0, x1, pixels)
+                self.decimators[label].invalidate()  # redraw the live view on return
+            else:
+                buffer = self.data_buffers[label]
+                x, y = buffer.view()
+                decimator = self.decimators[label]
+                x, y = decimator.decimate(x, y, x0, x1, pixels, (buffer.seq, len(buffer)))
+                if not decimator.changed:
+                    continue
+            if self.batch_curves:
+                self.batch_parts[label] = (x.copy(), y.copy())  # x, y may be views into the ring
+                batch_changed = True
+            else:
+                self.curves[label].setData(x, y)
+        if batch_changed and self.batch_curves:
+            self.draw_batch()
+        cost = perf_counter_ns() - start
+        self.stats.record("frame", cost)
+        self.schedule_frame(active, cost / 1e9)
+
+        if self.statsLabel.isVisible():
+            self.show_stats()
+
+    def set_overload_policy(self):
+        # Takes effect for the display at once, for recordings at the next Start Recording
+        self.engine.overload_policy = self.overloadBox.currentData()
+
+    def show_alarms(self):
+        counters = self.stats.counters
+        lost = counters.get("dropped", 0) + counters.get("signal_dropped", 0) + counters.get("recorder_dropped", 0)
+        thinned = counters.get("decimated", 0) + counters.get("signal_decimated", 0)
+        text = f"Overruns: {self.engine.overruns}  Dropped: {lost}  Decimated: {thinned}"
+        alarms = self.stats.active_alarms()
+        if text != self.overrunLabel.text() or bool(alarms) != bool(self.overrunLabel.toolTip()):
+            self.overrunLabel.setText(text)
+            self.overrunLabel.setStyleSheet("color: red; font-weight: bold;" if alarms else "")
+            self.overrunLabel.setToolTip("\n".join(f"{name}: {message}" for name, message in sorted(alarms.items())))
+
+    def schedule_frame(self, active, cost):
+        # Next frame interval from the data rate (idle back-off) and the render cost
+        self.frame_cost = 0.8 * self.frame_cost + 0.2 * cost
+        interval = 1000 / self.target_fps
+        if active or self.dirty:
+            self.idle_frames = 0
+        else:
+            self.idle_frames += 1
+            interval = max(interval, min(interval * 2 ** min(self.idle_frames, 8), IDLE_INTERVAL_MS))
+        interval = max(interval, self.frame_cost * 1000 / MAX_RENDER_LOAD)
+        self.timer.setInterval(int(interval))
+
+    def pause_rendering(self):
+        if self.timer.isActive():
+            self.timer.stop()
+            self.render_paused = True
+
+    def resume_rendering(self):
+        if self.render_paused:
+            self.render_paused = False
+            self.idle_frames = 0
+            self.timer.start(int(1000 / self.target_fps))
+
+    def hideEvent(self, event):
+        # Acquisition keeps running; the plot catches up when shown again
+        self.pause_rendering()
+        super().hideEvent(event)
+
+    def showEvent(self, event):
+        self.resume_rendering()
+        super().showEvent(event)
+
+    def changeEvent(self, event):
+        if event.type() == QEvent.Type.WindowStateChange:
+            if self.isMinimized():
+                self.pause_rendering()
+            else:
+                self.resume_rendering()
+        super().changeEvent(event)
 
     def closeEvent(self, event):
         self.reader.stop()
+        self.engine.stop_recording()
         event.accept()
 
 
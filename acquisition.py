@@ -0,0 +1,580 @@
+import multiprocessing
+import selectors
+import sys
+import threading
+from time import perf_counter_ns, sleep
+
+import numpy as np
+import serial
+
+from binary_protocol import BinaryFramer, detect_protocol
+from derived import DerivedChannel
+from minmax_pyramid import MinMaxPyramid
+from perf_stats import PerfStats, format_snapshot
+from recorder import Recorder
+from ring_buffer import RingBuffer, TimeWindowBuffer
+from serial_ingest import LineFramer
+from shm_ring import SharedSampleRing
+from sources import SerialSource, open_source
+from text_parser import parse_block
+from timestamps import ArrivalClock, DeviceClock, now
+
+# What happens when a consumer falls behind (engine.overload_policy):
+#   "drop_oldest"  window() hands out at most max_window of the newest samples
+#   "decimate"     window() hands out every Nth sample, at most max_window of them
+#   "record"       like "decimate" for the display, but a recording never drops
+#                  samples: the reader waits for the disk instead
+# Channel buffers, the recorder queue and the signal queue are all bounded; every
+# sample lost or thinned is counted in the stats and raises an alarm.
+OVERLOAD_POLICIES = ("drop_oldest", "decimate", "record")
+# Seconds a process-mode child may take to import and open its ports
+PROCESS_START_TIMEOUT = 20
+
+
+class AcquisitionEngine:
+    # Headless acquisition core shared by every front end: owns the byte source
+    # (serial port, replay or synthetic generator, see sources.py),
+    # the reader thread, the parser and one buffer per channel. Renderers pull
+    # from it with window(label, since), so nothing here depends on a GUI toolkit.
+    def __init__(self, capacity=100000, window=None, protocol="auto", use_process=False):
+        self.capacity = capacity
+        self.channel_capacity = {}
+        self.window_seconds = window  # None: keep the newest `capacity` samples
+        self.protocol = protocol  # "text", "binary" or "auto"
+        # Device stamps (">label:stamp:value" or stamped binary frames), see timestamps.DeviceClock
+        self.stamp_mode = "time"
+        self.stamp_scale = 1e-3
+        self.overload_policy = "drop_oldest"
+        self.max_window = 20000  # samples per window() call
+        self.channels = {}
+        self.listeners = []  # called as f(label, t, values) on the reader thread
+        self.derived = []  # DerivedChannels, computed from each batch as it is stored
+        # Whole-session min/max history per channel (keep_history=True), fed as samples
+        # are stored, whatever the consumers pull; history_reader (a RecordingReader)
+        # backs zooms finer than the pyramids hold
+        self.keep_history = False
+        self.histories = {}
+        self.history_reader = None
+        self.recorder = None
+        self.lock = threading.Lock()
+        self.sources = []
+        self.running = False
+        self._thread = None
+        # Process mode: read and parse in a child process that fills a shared-memory
+        # ring, so the reader never competes with the GUI for the GIL
+        self.use_process = use_process
+        self.ring_capacity = 1 << 20
+        self.ring_channels = 4096  # channel names the ring can hold
+        self._process = None
+        self._ring = None
+        self._stop_conn = None  # closing it tells the child to stop
+        self._closed_overruns = 0
+        # Pipeline counters and stage timings, see stats_snapshot()
+        self.stats = PerfStats()
+        self.stats.gauges["recorder_queue"] = lambda: self.recorder.queue_depth() if self.recorder else 0
+        self.stats.gauges["recorder_queued_mb"] = lambda: round(self.recorder.queued_bytes() / 1e6, 1) if self.recorder else 0
+        self.stats.gauges["ring_backlog"] = lambda: self._ring.backlog() if self._ring is not None else 0
+
+    @property
+    def overruns(self):
+        # Samples lost because the GUI process fell a whole ring behind
+        current = self._ring.overruns if self._ring is not None else 0
+        return self._closed_overruns + current
+
+    # --- Source ---
+    def open(self, port, baudrate=115200, timeout=0.1, **serial_kwargs):
+        # Opens the port (or a "synthetic"/replay spec, see open_source) and starts
+        # reading; serial.SerialException is left to the caller. A list of ports is
+        # read by one reader, with channels named "<port>/<label>".
+        ports = [port] if isinstance(port, str) else list(port)
+        if self.use_process:
+            self._start_process(ports, baudrate, timeout, serial_kwargs)
+            return None
+        sources = []
+        try:
+            for spec in ports:
+                sources.append(open_source(spec, baudrate, timeout, **serial_kwargs))
+        except Exception:
+            for source in sources:
+                source.close()
+            raise
+        self.start(sources)
+        return sources[0] if isinstance(port, str) else sources
+
+    def start(self, sources):
+        # `sources` is one source or a list of them: anything with read_chunk()/
+        # is_open/close() (and fileno() if it can be selected on); a bare
+        # serial.Serial is wrapped in a SerialSource
+        self.stop()
+        if not isinstance(sources, (list, tuple)):
+            sources = [sources]
+        self.sources = [s if hasattr(s, "read_chunk") else SerialSource(s) for s in sources]
+        self.running = True
+        self._thread = threading.Thread(target=self.read_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        if self._process is not None:
+            self._stop_conn.close()
+            self._process.join(timeout=2)
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join()
+            self._process = None
+        for source in self.sources:
+            if source.is_open:
+                source.close()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self._thread = None
+        if self._ring is not None:
+            self._closed_overruns += self._ring.overruns
+            self._ring.close()
+            self._ring = None
+
+    def _start_process(self, ports, baudrate, timeout, serial_kwargs):
+        self.stop()
+        self._ring = SharedSampleRing(self.ring_capacity, max_channels=self.ring_channels)
+        # Spawned, not forked: the GUI process already runs threads (Qt, readers, the
+        # recorder) whose locks a fork would copy in whatever state they are in
+        context = multiprocessing.get_context("spawn")
+        # Stop signal: the child waits for EOF on a pipe whose only write end is ours.
+        # (An Event could hang set() if the child exited while waiting on it.)
+        stop_conn, self._stop_conn = context.Pipe(duplex=False)
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        self._process = context.Process(
+            target=_acquisition_process,
+            args=(self._ring.name, self.ring_capacity, self.protocol, self.stamp_mode, self.stamp_scale,
+                  ports, baudrate, timeout, serial_kwargs, child_conn, stop_conn),
+            daemon=True,
+        )
+        self._process.start()
+
+        # The child reports whether the ports opened (a spawned child imports first)
+        error = parent_conn.recv() if parent_conn.poll(PROCESS_START_TIMEOUT) else "acquisition process did not start"
+        if error is not None:
+            self.stop()
+            raise serial.SerialException(error)
+        self.running = True
+        self._thread = threading.Thread(target=self.collect_loop, daemon=True)
+        self._thread.start()
+
+    def collect_loop(self):
+        # GUI process side of process mode: move new ring records into the channel buffers
+        ring = self._ring
+        stats = self.stats
+        overruns = ring.overruns
+        rejected = 0
+        while self.running:
+            # The child's read/parse counters come through the ring header
+            stats.counters.update(ring.counters())
+            if stats.counters["ring_rejected"] > rejected:
+                rejected = stats.counters["ring_rejected"]
+                stats.alarm("ring_channels", f"more than {ring.max_channels} channels, samples of the rest dropped")
+            if ring.overruns > overruns:
+                stats.alarm("ring", f"{ring.overruns - overruns} samples lost, the GUI process fell a ring behind")
+                overruns = ring.overruns
+            start = perf_counter_ns()
+            records = ring.read()
+            if not len(records):
+                if not self._process.is_alive():
+                    break
+                sleep(0.005)
+                continue
+            channels = records["channel"]
+            for channel in np.unique(channels):
+                batch = records[channels == channel]
+                self.add_samples(ring.label(int(channel)), batch["t"], batch["value"])
+            stats.record("collect", perf_counter_ns() - start)
+
+    def read_loop(self):
+        # One thread for every source: sources with a file descriptor (serial ports on
+        # POSIX, sockets) are multiplexed with a selector, the rest are polled. All
+        # sources share one clock, so their channels land on one time base.
+        streams = _streams(self.sources, self.protocol)
+        device_clock = DeviceClock(self.stamp_mode, self.stamp_scale)
+        for stream in streams:
+            stream.frames.stamp_mode = self.stamp_mode
+        selector = selectors.DefaultSelector()
+        polled = []
+        for stream in streams:
+            stream.fd = stream.fileno()
+            if stream.fd is None:
+                polled.append(stream)
+            else:
+                selector.register(stream.fd, selectors.EVENT_READ, stream)
+        registered = len(streams) - len(polled)
+        # A single source may block in its own read (up to the port timeout)
+        block = len(streams) == 1
+
+        while self.running and streams:
+            if registered:
+                ready = [key.data for key, _ in selector.select(0.01 if polled else 0.1)]
+            else:
+                ready = []
+            got = False
+            for stream in ready + polled:
+                try:
+                    start = perf_counter_ns()
+                    chunk = stream.source.read_chunk(block)
+                    if chunk:
+                        got = True
+                        self.stats.record("read", perf_counter_ns() - start)  # includes waiting in read
+                        self._ingest(stream, chunk, device_clock)
+                except (OSError, serial.SerialException) as e:
+                    # The port went away: stop reading it, keep the others
+                    self.stats.error(e)
+                    stream.source.close()
+                except Exception as e:
+                    self.stats.error(e)
+                if not stream.source.is_open:
+                    streams.remove(stream)
+                    if stream in polled:
+                        polled.remove(stream)
+                    else:
+                        selector.unregister(stream.fd)
+                        registered -= 1
+            if not got and polled and not block and not ready:
+                sleep(0.001)
+        selector.close()
+
+    def _ingest(self, stream, chunk, device_clock):
+        stats = self.stats
+        read = perf_counter_ns()
+        arrival = now()
+        span = stream.arrival_clock.span(arrival, len(chunk))
+        stats.add("bytes_read", len(chunk))
+        recorder = self.recorder
+        if recorder is not None:
+            if not recorder.write_raw(arrival, chunk, stream.raw_name):
+                stats.add("recorder_dropped_bytes", len(chunk))
+                stats.alarm("recorder", "disk too slow, raw bytes dropped")
+        if stream.protocol == "auto":
+            stream.probe += chunk
+            stream.protocol = detect_protocol(stream.probe)
+            if stream.protocol == "auto":
+                if len(stream.probe) < 4096:
+                    return
+                stream.protocol = "text"
+            chunk = bytes(stream.probe)
+
+        stamps = {}
+        if stream.protocol == "binary":
+            frames = stream.frames
+            bad_frames, unspaced = frames.bad_frames, frames.unspaced_frames
+            batch = frames.feed(chunk, stamps)
+            samples = sum(len(values) for values in batch.values())
+            stats.add("parse_failures", frames.bad_frames - bad_frames)
+            stats.add("unspaced_frames", frames.unspaced_frames - unspaced)
+        else:
+            block = stream.lines.feed(chunk)
+            batch = parse_block(block, stamps)
+            samples = sum(len(values) for values in batch.values())
+            if block:
+                # Lines that gave no sample (noise, corrupt or partial lines)
+                count = block.count(b"\n") + 1
+                stats.add("lines", count)
+                stats.add("parse_failures", max(count - samples, 0))
+        stats.add("samples", samples)
+
+        prefix = stream.prefix
+        gaps, missing = device_clock.gaps, device_clock.missing
+        out = []
+        for label, values in batch.items():
+            if prefix:
+                label = prefix + label
+            stamp = stamps.get(label[len(prefix):])
+            if stamp is not None and not np.isnan(stamp).any():
+                t = device_clock.to_host(label, stamp, arrival)
+            else:
+                t = stream.arrival_clock.spread(arrival, span, len(values))
+            out.append((label, t, values))
+        if device_clock.gaps != gaps:
+            stats.add("gaps", device_clock.gaps - gaps)
+            stats.add("samples_missing", device_clock.missing - missing)
+        parsed = perf_counter_ns()
+        stats.record("parse", parsed - read)
+        for label, t, values in out:
+            self.add_samples(label, t, values)
+        stats.record("store", perf_counter_ns() - parsed)
+        self.publish_stats()
+
+    def publish_stats(self):
+        # Process mode: the child hands its counters to the GUI process (_RingWriter)
+        pass
+
+    def stats_snapshot(self):
+        # Counters, gauges, stage timings and samples/s per channel since the last call
+        with self.lock:
+            channel_seq = {label: buffer.seq for label, buffer in self.channels.items()}
+        return self.stats.snapshot(channel_seq)
+
+    # --- Recording ---
+    def start_recording(self, directory, raw=False):
+        # Everything parsed from now on goes to disk; raw=True also logs the raw
+        # serial bytes (only available when reading in this process)
+        self.stop_recording()
+        self.recorder = Recorder(directory, raw=raw, block=self.overload_policy == "record")
+        return self.recorder
+
+    def stop_recording(self):
+        recorder, self.recorder = self.recorder, None
+        if recorder is not None:
+            recorder.stop()
+
+    # --- Channels ---
+    def add_samples(self, label, t, values):
+        # `t` is one timestamp for all values or one per value
+        values = np.asarray(values, dtype=np.float64)
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64), values.shape)
+        with self.lock:
+            buffer = self.channels.get(label)
+            if buffer is None:
+                buffer = self.channels[label] = self._new_buffer(label)
+            buffer.extend(t, values)
+            history = self.histories.get(label)
+            if history is None and self.keep_history:
+                history = self.histories[label] = MinMaxPyramid(source=self._history_source(label))
+        if history is not None:
+            history.extend(t, values)
+        recorder = self.recorder
+        if recorder is not None and not recorder.write(label, t, values):
+            self.stats.add("recorder_dropped", len(values))
+            self.stats.alarm("recorder", "disk too slow, samples dropped")
+        for listener in self.listeners:
+            listener(label, t, values)
+        for channel in self.derived:
+            if label in channel.inputs:
+                result = channel.feed(label, t, values)
+                if result is not None:
+                    self.add_samples(channel.name, *result)
+
+    # --- Derived channels ---
+    def add_derived(self, name, expression):
+        # "name = expression" channel computed on the host (see derived.py); it shows
+        # up like any other channel. Raises ValueError for a bad expression.
+        channel = DerivedChannel(name, expression)
+        derived = [c for c in self.derived if c.name != name]
+        if self._depends_on(channel, name, derived):
+            raise ValueError(f"{name}: circular definition")
+        self.derived = derived + [channel]  # swapped whole, the reader thread may be iterating
+        return channel
+
+    def remove_derived(self, name):
+        self.derived = [c for c in self.derived if c.name != name]
+
+    @staticmethod
+    def _depends_on(channel, name, derived):
+        by_name = {c.name: c for c in derived}
+        todo = list(channel.inputs)
+        seen = set()
+        while todo:
+            label = todo.pop()
+            if label == name:
+                return True
+            if label in by_name and label not in seen:
+                seen.add(label)
+                todo.extend(by_name[label].inputs)
+        return False
+
+    # --- History ---
+    def history(self, label, x0=None, x1=None, pixels=1000):
+        # Min/max points of `label` over [x0, x1] from its pyramid, O(pixels)
+        history = self.histories.get(label)
+        if history is None:
+            return np.empty(0), np.empty(0)
+        return history.query(x0, x1, pixels)
+
+    def attach_history(self, reader):
+        # A finished recording serves zooms into the past finer than the pyramids hold
+        self.history_reader = reader
+        for label, history in list(self.histories.items()):
+            history.source = self._history_source(label)
+
+    def _history_source(self, label):
+        reader = self.history_reader
+        if reader is None or label not in reader.labels():
+            return None
+        return lambda t0, t1: reader.read(label, t0, t1)
+
+    def _new_buffer(self, label):
+        capacity = self.channel_capacity.get(label, self.capacity)
+        if self.window_seconds:
+            return TimeWindowBuffer(self.window_seconds, capacity)
+        return RingBuffer(capacity)
+
+    def set_capacity(self, label, capacity):
+        with self.lock:
+            self.channel_capacity[label] = capacity
+            if label in self.channels:
+                self.channels[label].resize(capacity)
+
+    def labels(self):
+        with self.lock:
+            return list(self.channels)
+
+    def seq(self, label):
+        with self.lock:
+            buffer = self.channels.get(label)
+            return buffer.seq if buffer is not None else 0
+
+    def updated(self, since):
+        # Labels with samples newer than since[label] (a dict of sequence numbers)
+        with self.lock:
+            return [label for label, buffer in self.channels.items() if buffer.seq != since.get(label, 0)]
+
+    def window(self, label, since=0, newest=None):
+        # Copies of the samples of `label` newer than sequence number `since`
+        # (everything still buffered when since=0). Returns (seq, t, values);
+        # pass seq back as `since` on the next call to get only new samples.
+        # A consumer that only keeps the last `newest` samples (a display ring) gets
+        # at most those; the older ones are skipped, not lost. At most max_window
+        # samples come back; a consumer further behind loses or thins samples
+        # according to overload_policy (counted in the stats).
+        with self.lock:
+            return self._window(label, since, newest)
+
+    def windows(self, since, newest=None):
+        # window() for each label of `since` ({label: seq}) under one lock acquisition;
+        # `newest` is one count for all or {label: count}. Returns {label: (seq, t, values)}.
+        with self.lock:
+            return {label: self._window(label, seq, newest.get(label) if isinstance(newest, dict) else newest)
+                    for label, seq in since.items()}
+
+    def _window(self, label, since, newest):
+        buffer = self.channels.get(label)
+        if buffer is None:
+            return since, np.empty(0), np.empty(0)
+        x, y = buffer.view()
+        seq = buffer.seq
+        wanted = seq - since if newest is None else min(seq - since, newest)
+        new = min(wanted, len(x))
+        if new <= 0:
+            return seq, np.empty(0), np.empty(0)
+        if since and wanted > new:
+            if len(x) < buffer.capacity:
+                # Older than the time window: evicted as configured, not an overload
+                self.stats.add("evicted", wanted - new)
+            else:
+                # Overwritten before this consumer got to them
+                self.stats.add("dropped", wanted - new)
+                self.stats.alarm("display", f"{label}: {wanted - new} samples overwritten before display")
+        x, y = x[-new:], y[-new:]
+        limit = self.max_window
+        if limit and new > limit:
+            if self.overload_policy == "drop_oldest":
+                x, y = x[-limit:], y[-limit:]
+                self.stats.add("dropped", new - limit)
+            else:
+                step = -(-new // limit)
+                x, y = x[::-1][::step][::-1], y[::-1][::step][::-1]  # keeps the newest sample
+                self.stats.add("decimated", new - len(x))
+            self.stats.alarm("display", f"{label}: {new} samples behind, {self.overload_policy}")
+        return seq, x.copy(), y.copy()
+
+    def clear(self):
+        with self.lock:
+            self.channels.clear()
+            self.histories.clear()
+
+
+class _Stream:
+    # Per-source reader state: framing, protocol detection and arrival clock
+    def __init__(self, source, protocol, prefix="", raw_name="raw"):
+        self.source = source
+        self.protocol = protocol
+        self.prefix = prefix  # "<port>/" when several sources are read at once
+        self.raw_name = raw_name
+        self.lines = LineFramer()
+        self.frames = BinaryFramer()
+        self.probe = bytearray()
+        self.fd = None
+        self.arrival_clock = ArrivalClock(getattr(source, "byte_time", None))
+
+    def fileno(self):
+        fileno = getattr(self.source, "fileno", None)
+        return fileno() if fileno is not None else None
+
+
+def _streams(sources, protocol):
+    if len(sources) == 1:
+        return [_Stream(sources[0], protocol)]
+    streams = []
+    names = set()
+    for i, source in enumerate(sources):
+        name = getattr(source, "name", None) or f"source{i}"
+        if name in names:
+            name = f"{name}{i}"
+        names.add(name)
+        streams.append(_Stream(source, protocol, name + "/", "raw-" + name))
+    return streams
+
+
+class _RingWriter(AcquisitionEngine):
+    # Child-process side of process mode: the normal read loop, but samples go to the shared ring
+    def __init__(self, ring, protocol, stamp_mode, stamp_scale):
+        super().__init__(protocol=protocol)
+        self.stamp_mode = stamp_mode
+        self.stamp_scale = stamp_scale
+        self.ring = ring
+
+    def add_samples(self, label, t, values):
+        try:
+            self.ring.write(label, t, values)
+        except ValueError:
+            # Name table full: only this channel's samples are lost, counted for the GUI
+            self.stats.add("ring_rejected", len(values))
+
+    def publish_stats(self):
+        self.ring.publish_counters(self.stats.counters)
+
+
+def _acquisition_process(ring_name, ring_capacity, protocol, stamp_mode, stamp_scale, ports,
+                         baudrate, timeout, serial_kwargs, conn, stop_conn):
+    ring = SharedSampleRing(ring_capacity, name=ring_name)
+    writer = _RingWriter(ring, protocol, stamp_mode, stamp_scale)
+    sources = []
+    try:
+        for port in ports:
+            sources.append(open_source(port, baudrate, timeout, **serial_kwargs))
+    except Exception as e:
+        conn.send(str(e))
+        for source in sources:
+            source.close()
+        ring.close()
+        return
+    conn.send(None)
+
+    def wait_for_stop():
+        try:
+            stop_conn.recv()  # nothing is sent: EOF once the GUI side closes (or dies)
+        except EOFError:
+            pass
+        writer.running = False
+
+    threading.Thread(target=wait_for_stop, daemon=True).start()
+    writer.sources = sources
+    writer.running = True
+    writer.read_loop()
+    for source in sources:
+        source.close()
+    ring.close()
+
+
+if __name__ == "__main__":
+    # Headless run: python acquisition.py PORT[,PORT...] [BAUD], prints the pipeline stats
+    # every second. PORT may also be "synthetic[:CHANNELS[:RATE]]" or a recording/capture to replay
+    port = sys.argv[1]
+    baudrate = int(sys.argv[2]) if len(sys.argv) > 2 else 115200
+    engine = AcquisitionEngine()
+    engine.open(port.split(",") if "," in port else port, baudrate)
+    print(f"Reading {port} at {baudrate} baud, Ctrl+C to stop")
+    try:
+        while True:
+            sleep(1)
+            print(format_snapshot(engine.stats_snapshot()) + "\n")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
@@ -0,0 +1,279 @@
+# End-to-end benchmark of every front end against a pseudo-terminal (Linux).
+# A pty pair stands in for the device: the slave end is opened through pyserial the
+# way SerialReader.start does, the master end gets ">s<c>: <k>\n" lines paced to the
+# byte rate of the baud rate. Each (front end, channels) run is a child process so
+# peak RSS is measured per run. The Tk front end needs a display (e.g. xvfb-run).
+# Usage: python benchmarks/bench_e2e.py [output.json] [baud] [seconds]
+import bisect
+import json
+import os
+import platform
+import pty
+import resource
+import runpy
+import subprocess
+import sys
+import threading
+import time
+import tty
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+FRONT_ENDS = ("pyqt6", "tk", "matplotlib")
+CHANNELS = (1, 8, 64)
+FRAME_INTERVAL = 0.05  # the front ends' own 50 ms timers
+DRAIN_SECONDS = 0.5
+
+
+class TrafficGenerator:
+    # Writes lines at baud / 10 bytes per second. <k> is a global sample counter, so
+    # the receiving side can tell when each sample was sent and which never arrived.
+    def __init__(self, fd, channels, baud):
+        self.fd = fd
+        self.channels = channels
+        self.bytes_per_second = baud / 10
+        self.sent = 0
+        self.send_seq = []  # first sample counter of each write
+        self.send_time = []
+        self.running = False
+        self.elapsed = 0.0  # seconds spent sending
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.running = True
+        self._thread.start()
+
+    def stop(self):
+        self.running = False
+        self._thread.join()
+
+    def send_time_of(self, k):
+        return self.send_time[bisect.bisect_right(self.send_seq, k) - 1]
+
+    def _run(self):
+        start = time.perf_counter()
+        sent_bytes = 0
+        while self.running:
+            due = int((time.perf_counter() - start) * self.bytes_per_second) - sent_bytes
+            if due < 64:
+                time.sleep(0.002)
+                continue
+            lines = []
+            size = 0
+            k = self.sent
+            while size < due:
+                line = b">s%d: %d\n" % (k % self.channels, k)
+                lines.append(line)
+                size += len(line)
+                k += 1
+            self.send_seq.append(self.sent)
+            self.send_time.append(time.perf_counter())
+            data = memoryview(b"".join(lines))
+            while data:  # blocks when the reader falls a pty buffer behind
+                data = data[os.write(self.fd, data):]
+            self.sent = k
+            sent_bytes += size
+        self.elapsed = time.perf_counter() - start
+
+
+class Receiver:
+    # Engine listener (reader thread): counts samples that arrived intact
+    def __init__(self, channels):
+        self.channels = channels
+        self.received = 0
+        self.malformed = 0
+
+    def __call__(self, label, t, values):
+        channel = int(label[1:]) if label[1:].isdigit() else -1
+        ok = (values == np.round(values)) & (values % self.channels == channel)
+        good = int(ok.sum())
+        self.received += good
+        self.malformed += len(values) - good
+
+
+def percentiles(values, scale=1000.0):
+    if not values:
+        return None
+    values = np.asarray(values) * scale
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max()),
+    }
+
+
+def drive(generator, render, newest, seconds):
+    # Runs frames at the front ends' timer rate, then keeps rendering while the pipeline drains
+    frame_times = []
+    latencies = []
+    last = -1
+    start = time.perf_counter()
+    while True:
+        now = time.perf_counter()
+        if generator.running and now - start > seconds:
+            generator.stop()
+        if now - start > seconds + DRAIN_SECONDS:
+            break
+        render()
+        done = time.perf_counter()
+        frame_times.append(done - now)
+        k = newest()
+        if k is not None and k > last:
+            # Ingest-to-render latency of the newest sample on screen
+            latencies.append(done - generator.send_time_of(k))
+            last = k
+        time.sleep(max(0.0, FRAME_INTERVAL - (time.perf_counter() - now)))
+    return {"frames": len(frame_times), "frame_ms": percentiles(frame_times), "latency_ms": percentiles(latencies)}
+
+
+def newest_value(buffers):
+    newest = None
+    for buffer in buffers:
+        _, y = buffer.view()
+        if len(y):
+            newest = int(y[-1]) if newest is None else max(newest, int(y[-1]))
+    return newest
+
+
+def run_pyqt6(port, baud, generator, receiver, seconds):
+    if not os.environ.get("DISPLAY"):
+        os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt6.QtWidgets import QApplication
+    app = QApplication([])
+    from GUI_pyqt6 import SerialPlotter
+
+    window = SerialPlotter()
+    window.timer.stop()  # frames are driven here instead
+    window.show()
+    window.portBox.addItem(port)
+    window.portBox.setCurrentText(port)
+    window.baudBox.setCurrentText(str(baud))
+    window.connect_serial()
+    window.engine.listeners.append(receiver)
+    generator.start()
+
+    def render():
+        window.update_plot()
+        app.processEvents()
+
+    try:
+        return drive(generator, render, lambda: newest_value(window.data_buffers.values()), seconds)
+    finally:
+        window.reader.stop()
+
+
+def run_script(name, port, generator, receiver, seconds):
+    # The scripts run as-is; their blocking main loop is replaced by the frame driver
+    import matplotlib
+    if name == "plotter_with_tkinter_gui.py":
+        import tkinter
+        tkinter.Tk().destroy()  # TclError without a display
+        patch, attr = tkinter.Tk, "mainloop"
+    else:
+        if not os.environ.get("DISPLAY"):
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        patch, attr = plt, "show"
+
+    result = {}
+
+    def main_loop(*args, **kwargs):
+        g = sys._getframe(1).f_globals  # the script's module globals
+        g["engine"].listeners.append(receiver)
+        generator.start()
+
+        def render():
+            g["update"](None)
+            if "root" in g:
+                g["root"].update()
+            else:
+                g["fig"].canvas.flush_events()
+
+        buffers = lambda: [s_data["buffer"] for s_data in g["sensor_data"].values()]
+        result.update(drive(generator, render, lambda: newest_value(buffers()), seconds))
+        if "root" in g:
+            g["root"].destroy()
+
+    os.environ["SERIAL_PORT"] = port
+    setattr(patch, attr, main_loop)
+    runpy.run_path(os.path.join(ROOT, name), run_name="__main__")
+    return result
+
+
+def worker(front_end, channels, baud, seconds):
+    master, slave = pty.openpty()
+    tty.setraw(slave)
+    port = os.ttyname(slave)
+    generator = TrafficGenerator(master, channels, baud)
+    receiver = Receiver(channels)
+    if front_end == "pyqt6":
+        result = run_pyqt6(port, baud, generator, receiver, seconds)
+    elif front_end == "tk":
+        result = run_script("plotter_with_tkinter_gui.py", port, generator, receiver, seconds)
+    else:
+        result = run_script("ploter_test.py", port, generator, receiver, seconds)
+    if generator.running:
+        generator.stop()
+
+    result.update(
+        front_end=front_end,
+        channels=channels,
+        baud=baud,
+        seconds=seconds,
+        samples_sent=generator.sent,
+        samples_received=receiver.received,
+        samples_per_s=receiver.received / generator.elapsed if generator.elapsed else 0.0,
+        dropped=generator.sent - receiver.received - receiver.malformed,
+        malformed=receiver.malformed,
+        peak_rss_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    )
+    return result
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        front_end, channels, baud, seconds = sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), float(sys.argv[5])
+        result = worker(front_end, channels, baud, seconds)
+        print("\n" + json.dumps(result))  # the scripts print too: the result is the last line
+        sys.exit(0)
+
+    output = sys.argv[1] if len(sys.argv) > 1 else "bench_e2e.json"
+    baud = int(sys.argv[2]) if len(sys.argv) > 2 else 921600
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+
+    runs = []
+    for front_end in FRONT_ENDS:
+        for channels in CHANNELS:
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker", front_end, str(channels), str(baud), str(seconds)]
+            proc = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT)
+            try:
+                result = json.loads(proc.stdout.strip().splitlines()[-1])
+            except (IndexError, ValueError):
+                error = proc.stderr.strip().splitlines()
+                result = {"front_end": front_end, "channels": channels, "skipped": error[-1] if error else "failed"}
+                print(f"{front_end:>10} {channels:>3} ch: skipped ({result['skipped']})")
+            else:
+                latency = result["latency_ms"] or {}
+                frame = result["frame_ms"] or {}
+                print(f"{front_end:>10} {channels:>3} ch: {result['samples_per_s']:9.0f} samples/s, "
+                      f"dropped {result['dropped']}, malformed {result['malformed']}, "
+                      f"latency p50/p99 {latency.get('p50', 0):.1f}/{latency.get('p99', 0):.1f} ms, "
+                      f"frame p50 {frame.get('p50', 0):.1f} ms, RSS {result['peak_rss_mb']:.0f} MB")
+            runs.append(result)
+
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "baud": baud,
+        "seconds": seconds,
+        "runs": runs,
+    }
+    with open(output, "w") as f:
+        json.dump(report, f, indent=1)
+    print(f"Results written to {output}")
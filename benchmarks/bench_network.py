@@ -0,0 +1,80 @@
+# Network ingest throughput: loopback senders (one process each) blast ">sN: value"
+# lines at a UdpSource / TcpSource read by the AcquisitionEngine.
+# Usage: python benchmarks/bench_network.py [udp|tcp|both] [senders] [seconds] [rate]
+# rate = total samples/s over all senders, 0 = as fast as the senders can go (UDP will
+# then mostly measure the kernel dropping datagrams)
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from acquisition import AcquisitionEngine
+from sources import TcpSource, UdpSource
+
+PORT = 47210
+LINES_PER_SEND = 64  # one datagram (or TCP write) holds this many lines
+CHANNELS = 8
+
+
+def sender(kind, port, seconds, rate, sent):
+    payload = b"".join(b">s%d: %d.5\n" % (i % CHANNELS, i) for i in range(LINES_PER_SEND))
+    if kind == "udp":
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        send = lambda: sock.sendto(payload, ("127.0.0.1", port))
+    else:
+        sock = socket.create_connection(("127.0.0.1", port))
+        send = lambda: sock.sendall(payload)
+    count = 0
+    start = time.perf_counter()
+    while True:
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            break
+        if rate and count > elapsed * rate:
+            time.sleep(0.001)
+            continue
+        send()
+        count += LINES_PER_SEND
+    sock.close()
+    sent.value = count
+
+
+def run(kind, senders, seconds, rate):
+    source = UdpSource(port=PORT) if kind == "udp" else TcpSource(port=PORT)
+    engine = AcquisitionEngine(protocol="text")
+    engine.start(source)
+    counters = [multiprocessing.Value("q", 0) for _ in range(senders)]
+    procs = [multiprocessing.Process(target=sender, args=(kind, PORT, seconds, rate / senders, c)) for c in counters]
+    t0 = time.perf_counter()
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+    # Drain: wait until the engine stops receiving
+    received = -1
+    while True:
+        now = sum(engine.seq(label) for label in engine.labels())
+        if now == received:
+            break
+        received = now
+        done = time.perf_counter()
+        time.sleep(0.2)
+    elapsed = done - t0
+    engine.stop()
+    sent = sum(c.value for c in counters)
+    stats = engine.stats_snapshot()
+    print(f"{kind}: {senders} senders, {received / elapsed:,.0f} samples/s received "
+          f"({sent / elapsed:,.0f} sent), lost {sent - received} "
+          f"({(sent - received) / max(sent, 1):.1%}), parse failures {stats['counters'].get('parse_failures', 0)}")
+
+
+if __name__ == "__main__":
+    kinds = sys.argv[1] if len(sys.argv) > 1 else "both"
+    senders = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 3.0
+    rate = float(sys.argv[4]) if len(sys.argv) > 4 else 500_000
+    for kind in (("udp", "tcp") if kinds == "both" else (kinds,)):
+        run(kind, senders, seconds, rate)
@@ -0,0 +1,77 @@
+# Parse throughput of the text protocol: old per-line code vs. text_parser.parse_block
+# Usage: python benchmarks/bench_parser.py [lines] [channels]
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from text_parser import parse_block
+
+OLD_PATTERN = re.compile(r">(\w+):\s*(-?\d+\.?\d*)")
+
+
+def make_block(lines, channels):
+    rng = np.random.default_rng(0)
+    values = rng.normal(0, 100, lines)
+    return b"".join(
+        b">sensor%d: %.4f\n" % (i % channels, v) for i, v in enumerate(values)
+    )
+
+
+def old_pyqt6(block):
+    # GUI_pyqt6.py before: decode + regex + float() per line
+    out = {}
+    for raw in block.split(b"\n"):
+        line = raw.decode("utf-8").strip()
+        for label, value in OLD_PATTERN.findall(line):
+            out.setdefault(label, []).append(float(value))
+    return out
+
+
+def old_matplotlib(block):
+    # ploter_test.py / plotter_with_tkinter_gui.py before: split chain per line
+    out = {}
+    for raw in block.split(b"\n"):
+        line_data = raw.decode("utf-8").strip()
+        try:
+            if line_data.startswith('>') and ': ' in line_data:
+                parts = line_data.split('>')
+                if len(parts) < 2:
+                    continue
+                sensor_part = parts[1].split(': ')
+                if len(sensor_part) < 2:
+                    continue
+                out.setdefault(sensor_part[0].lower(), []).append(float(sensor_part[1]))
+        except ValueError:
+            pass
+    return out
+
+
+def bench(name, func, block, lines, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func(block)
+        best = min(best, time.perf_counter() - t0)
+    print(f"{name:<16} {lines / best / 1e6:8.2f} M lines/s  ({best * 1e3:8.2f} ms)")
+    return best
+
+
+if __name__ == "__main__":
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    channels = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    block = make_block(lines, channels)
+    print(f"{lines} lines, {channels} channels, {len(block) / 1e6:.1f} MB")
+
+    base = bench("old pyqt6", old_pyqt6, block, lines)
+    bench("old matplotlib", old_matplotlib, block, lines)
+    new = bench("parse_block", parse_block, block, lines)
+    # Stray non-sample lines and malformed samples take the slower paths
+    bench("+ stray line", parse_block, block + b"boot ok\n", lines)
+    bench("+ bad sample", parse_block, block + b">x:1\n", lines)
+    bench("+ nan value", parse_block, block + b">x: nan\n", lines)
+    print(f"speedup vs old pyqt6: {base / new:.1f}x")
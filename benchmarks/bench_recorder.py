@@ -0,0 +1,53 @@
+# Write throughput of recorder.Recorder compared with what a 921600 baud link can deliver
+# Usage: python benchmarks/bench_recorder.py [samples] [channels] [batch]
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from recorder import Recorder, RecordingReader
+
+MAX_BAUD = 921600
+# 10 bits per byte on the wire; ">s0: 1.23\n" is about 10 bytes, a binary int16 sample 2 bytes
+TEXT_RATE = MAX_BAUD / 10 / 10
+BINARY_RATE = MAX_BAUD / 10 / 2
+
+
+if __name__ == "__main__":
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000_000
+    channels = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    batch = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    per_channel = samples // channels
+    values = np.random.default_rng(0).normal(size=batch)
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = Recorder(directory, raw=True)
+        t0 = time.perf_counter()
+        queued = 0
+        for i in range(per_channel // batch):
+            t = np.arange(i * batch, (i + 1) * batch, dtype=np.float64)
+            for c in range(channels):
+                recorder.write(f"s{c}", t, values)
+            recorder.write_raw(float(i), b">s0: 1.23\n" * batch)
+            queued += batch * channels
+        t_queue = time.perf_counter() - t0
+        recorder.stop()
+        elapsed = time.perf_counter() - t0
+
+        size = sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+        rate = queued / elapsed
+        print(f"{queued} samples, {channels} channels, batches of {batch}")
+        print(f"queue:  {queued / t_queue / 1e6:8.2f} M samples/s (time spent on the reader thread)")
+        print(f"disk:   {rate / 1e6:8.2f} M samples/s, {size / elapsed / 1e6:.0f} MB/s written")
+        print(f"needed: {TEXT_RATE / 1e3:8.1f} k samples/s text, {BINARY_RATE / 1e3:.1f} k samples/s binary int16")
+        print(f"headroom over binary at max baud: {rate / BINARY_RATE:.0f}x")
+
+        reader = RecordingReader(directory)
+        t0 = time.perf_counter()
+        t, v = reader.read("s0", per_channel * 0.25, per_channel * 0.75)
+        float(v.sum())
+        print(f"seek + read of {len(v)} samples: {(time.perf_counter() - t0) * 1e3:.1f} ms")
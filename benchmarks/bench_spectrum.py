@@ -0,0 +1,63 @@
+# Cost of the spectrum view: StreamingSpectrum fed per frame (30 fps) for N channels
+# at a given sample rate, plus one Welch average per channel and frame, compared with
+# recomputing the Welch estimate from the whole buffer every frame.
+# Usage: python benchmarks/bench_spectrum.py [channels] [rate] [seconds] [nperseg]
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from spectrum import StreamingSpectrum
+
+FPS = 30
+
+
+def full_welch(y, nperseg, averages):
+    # What a non-incremental view would do: window + FFT the last `averages` segments
+    step = nperseg // 2
+    y = y[-(averages - 1) * step - nperseg:]
+    frames = np.lib.stride_tricks.sliding_window_view(y, nperseg)[::step]
+    frames = (frames - frames.mean(axis=1, keepdims=True)) * np.hanning(nperseg)
+    return (np.abs(np.fft.rfft(frames, axis=1)) ** 2).mean(axis=0)
+
+
+def main(channels, rate, seconds, nperseg):
+    per_frame = int(rate / FPS)
+    frames = int(seconds * FPS)
+    rng = np.random.default_rng(0)
+    t = np.arange(per_frame * frames) / rate
+    y = np.sin(2 * np.pi * 1000 * t) + rng.normal(0, 0.1, len(t))
+    spectra = [StreamingSpectrum(nperseg) for _ in range(channels)]
+
+    start = time.process_time()
+    for f in range(frames):
+        chunk = slice(f * per_frame, (f + 1) * per_frame)
+        for spectrum in spectra:
+            spectrum.feed(t[chunk], y[chunk])
+            spectrum.welch()
+    incremental = time.process_time() - start
+
+    averages = spectra[0].averages
+    start = time.process_time()
+    for f in range(frames):
+        end = (f + 1) * per_frame
+        if end < nperseg:
+            continue
+        for _ in range(channels):
+            full_welch(y[:end], nperseg, averages)
+    full = time.process_time() - start
+
+    print(f"{channels} channels x {rate:,.0f} Hz, nperseg {nperseg}, {FPS} fps, {seconds:.0f} s of data:")
+    print(f"  incremental: {incremental / seconds:6.1%} of one core ({incremental / frames * 1000:.2f} ms/frame)")
+    print(f"  full Welch:  {full / seconds:6.1%} of one core ({full / frames * 1000:.2f} ms/frame)")
+
+
+if __name__ == "__main__":
+    channels = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+    nperseg = int(sys.argv[4]) if len(sys.argv) > 4 else 1024
+    main(channels, rate, seconds, nperseg)
@@ -0,0 +1,198 @@
+import binascii
+import struct
+
+import numpy as np
+
+# Binary framing, used instead of ">label: value" lines when bandwidth matters.
+# Every frame is COBS encoded and terminated by a 0x00 byte. Decoded frame:
+#   [type][channel id][payload][crc16, only if type has FLAG_CRC]
+# Types:
+#   REGISTER  payload = channel name (utf-8), sent once per channel (or periodically)
+#   DATA_F32  payload = little-endian float32 values
+#   DATA_I16  payload = little-endian int16 values
+# The CRC is CRC-16/CCITT (binascii.crc_hqx, init 0xFFFF) over type, id and payload.
+
+FRAME_REGISTER = 0x01
+FRAME_DATA_F32 = 0x02
+FRAME_DATA_I16 = 0x03
+FLAG_CRC = 0x80
+# Stamped sample frames start with a uint32 stamp (device time or sequence number)
+# of their first sample. With FLAG_PERIOD a float32 sample period (in stamp units)
+# follows it; without one, the following samples count up by one, which only holds
+# for sequence numbers: in stamp_mode "time" the later samples of such a frame get no
+# stamp (NaN), so the engine times the batch by arrival instead (unspaced_frames).
+FLAG_STAMP = 0x40
+FLAG_PERIOD = 0x20
+
+_DTYPES = {
+    FRAME_DATA_F32: np.dtype("<f4"),
+    FRAME_DATA_I16: np.dtype("<i2"),
+}
+
+
+def cobs_encode(data):
+    out = bytearray()
+    for block in bytes(data).split(b"\x00"):
+        # A zero-free block longer than 254 bytes is split into 0xFF-coded runs
+        while len(block) >= 254:
+            out.append(0xFF)
+            out += block[:254]
+            block = block[254:]
+        out.append(len(block) + 1)
+        out += block
+    return bytes(out)
+
+
+def cobs_decode(data):
+    out = bytearray()
+    i = 0
+    n = len(data)
+    while i < n:
+        code = data[i]
+        if code == 0 or i + code > n:
+            raise ValueError("corrupt COBS frame")
+        out += data[i + 1:i + code]
+        i += code
+        if code < 0xFF and i < n:
+            out.append(0)
+    return bytes(out)
+
+
+def encode_frame(frame_type, channel_id, payload=b"", crc=False):
+    body = bytes([frame_type | (FLAG_CRC if crc else 0), channel_id]) + bytes(payload)
+    if crc:
+        body += struct.pack("<H", binascii.crc_hqx(body, 0xFFFF))
+    return cobs_encode(body) + b"\x00"
+
+
+def encode_register(channel_id, name, crc=False):
+    return encode_frame(FRAME_REGISTER, channel_id, name.encode("utf-8"), crc)
+
+
+def encode_samples(channel_id, values, frame_type=FRAME_DATA_F32, crc=False, stamp=None, period=None):
+    payload = np.asarray(values).astype(_DTYPES[frame_type]).tobytes()
+    if period is not None:
+        frame_type |= FLAG_PERIOD
+        payload = struct.pack("<f", period) + payload
+    if stamp is not None:
+        frame_type |= FLAG_STAMP
+        payload = struct.pack("<I", stamp & 0xFFFFFFFF) + payload
+    return encode_frame(frame_type, channel_id, payload, crc)
+
+
+def detect_protocol(data):
+    # "binary" once a frame delimiter shows up, "text" once a full ">label:" line does,
+    # "auto" while there is not enough data to tell
+    if b"\x00" in data:
+        return "binary"
+    if b">" in data and b":" in data and b"\n" in data:
+        return "text"
+    return "auto"
+
+
+class BinaryFramer:
+    # Incremental decoder: feed raw bytes, get {label: values} for every complete frame
+    def __init__(self, max_frame=4096, stamp_mode="time"):
+        self.max_frame = max_frame
+        self.stamp_mode = stamp_mode  # as DeviceClock's: "time" or "seq"
+        self.names = {}  # channel id -> label
+        self.bad_frames = 0
+        self.unspaced_frames = 0  # stamped multi-sample frames without a period, "time" mode
+        self._pending = bytearray()
+
+    def label(self, channel_id):
+        return self.names.get(channel_id) or f"ch{channel_id}"
+
+    def feed(self, data, stamps=None):
+        # `stamps`, if given, receives {label: float64 stamps} for channels that sent
+        # stamped frames (NaN for samples from unstamped frames, see FLAG_PERIOD)
+        self._pending += data
+        end = self._pending.rfind(b"\x00")
+        if end < 0:
+            if len(self._pending) > self.max_frame:
+                self._pending.clear()
+                self.bad_frames += 1
+            return {}
+        raw_frames = bytes(self._pending[:end]).split(b"\x00")
+        del self._pending[:end + 1]
+
+        parts = {}
+        for raw in raw_frames:
+            if not raw:
+                continue
+            try:
+                frame = cobs_decode(raw)
+            except ValueError:
+                self.bad_frames += 1
+                continue
+            self._handle_frame(frame, parts)
+
+        batch = {}
+        for label, frames in parts.items():
+            values = [values for values, _ in frames]
+            batch[label] = values[0] if len(values) == 1 else np.concatenate(values)
+            if stamps is not None and any(stamp is not None for _, stamp in frames):
+                stamps[label] = np.concatenate([
+                    stamp if stamp is not None else np.full(len(values), np.nan)
+                    for values, stamp in frames
+                ])
+        return batch
+
+    def _handle_frame(self, frame, parts):
+        if len(frame) < 2:
+            self.bad_frames += 1
+            return
+        frame_type = frame[0]
+        if frame_type & FLAG_CRC:
+            if len(frame) < 4:
+                self.bad_frames += 1
+                return
+            (crc,) = struct.unpack_from("<H", frame, len(frame) - 2)
+            frame = frame[:-2]
+            if binascii.crc_hqx(frame, 0xFFFF) != crc:
+                self.bad_frames += 1
+                return
+            frame_type &= ~FLAG_CRC
+
+        channel_id = frame[1]
+        payload = frame[2:]
+        if frame_type == FRAME_REGISTER:
+            self.names[channel_id] = payload.decode("utf-8", errors="replace")
+            return
+
+        stamp = period = None
+        if frame_type & FLAG_STAMP:
+            header = 8 if frame_type & FLAG_PERIOD else 4
+            if len(payload) < header:
+                self.bad_frames += 1
+                return
+            (stamp,) = struct.unpack_from("<I", payload)
+            if header == 8:
+                (period,) = struct.unpack_from("<f", payload, 4)
+            payload = payload[header:]
+            frame_type &= ~(FLAG_STAMP | FLAG_PERIOD)
+
+        # A stamped frame must carry the sample its stamp belongs to
+        dtype = _DTYPES.get(frame_type)
+        if dtype is None or len(payload) % dtype.itemsize or stamp is not None and not payload:
+            self.bad_frames += 1
+            return
+        values = np.frombuffer(payload, dtype=dtype).astype(np.float64)
+        if stamp is not None:
+            stamp = self._frame_stamps(stamp, period, len(values))
+        parts.setdefault(self.label(channel_id), []).append((values, stamp))
+
+    def _frame_stamps(self, stamp, period, n):
+        # One stamp per sample of a frame whose first sample has `stamp`
+        if period is None and self.stamp_mode == "seq":
+            period = 1.0
+        if period is not None or n == 1:
+            return stamp + (period or 0.0) * np.arange(n, dtype=np.float64)
+        self.unspaced_frames += 1
+        stamps = np.full(n, np.nan)
+        stamps[0] = stamp
+        return stamps
+
+    def reset(self):
+        self._pending.clear()
+        self.names.clear()
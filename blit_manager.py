@@ -0,0 +1,80 @@
+import math
+
+
+class BlitManager:
+    # Blitted rendering for the matplotlib front ends.
+    # Everything static (axes, ticks, grid, legend, buttons) is rendered once and
+    # cached; each frame restores that background and redraws only the animated
+    # line artists. Any full draw (resize, widget hover, invalidate()) refreshes the cache.
+    # invalidate() only marks the cache stale; the next update() asks for the full
+    # draw, so any number of changes within a frame cost one redraw even on backends
+    # (Agg) where draw_idle() draws right away.
+    def __init__(self, canvas, artists=()):
+        self.canvas = canvas
+        self._bg = None
+        self._artists = []
+        for artist in artists:
+            self.add_artist(artist)
+        self._cid = canvas.mpl_connect("draw_event", self.on_draw)
+
+    def add_artist(self, artist):
+        artist.set_animated(True)
+        self._artists.append(artist)
+
+    def on_draw(self, event):
+        self._bg = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        self._draw_animated()
+
+    def invalidate(self):
+        # Static content changed: the next update() redraws everything and re-caches the background
+        self._bg = None
+
+    def set_limits(self, ax, xlim=None, ylim=None):
+        # Only touches the axes (and the cached background) when the limits really change
+        changed = False
+        if xlim is not None and tuple(ax.get_xlim()) != tuple(xlim):
+            ax.set_xlim(*xlim)
+            changed = True
+        if ylim is not None and tuple(ax.get_ylim()) != tuple(ylim):
+            ax.set_ylim(*ylim)
+            changed = True
+        if changed:
+            self.invalidate()
+        return changed
+
+    def update(self):
+        if self._bg is None:
+            # The full draw paints the lines itself (on_draw)
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self._bg)
+        self._draw_animated()
+        self.canvas.blit(self.canvas.figure.bbox)
+
+    def _draw_animated(self):
+        figure = self.canvas.figure
+        for artist in self._artists:
+            figure.draw_artist(artist)
+
+
+def snap_xlim(current_time, window=10, step=1.0):
+    # Scrolling window whose right edge advances in `step` jumps, so the
+    # background only has to be redrawn once per step instead of every frame
+    end = math.ceil(current_time / step) * step
+    return max(0, end - window), end
+
+
+def snap_ylim(y_min, y_max, current, padding=0.1):
+    # Keep the current y-limits while the data fits inside them and still uses
+    # at least half of the range; otherwise pad and round out to a coarse step
+    low, high = current
+    span = y_max - y_min
+    if low <= y_min and y_max <= high and span >= 0.5 * (high - low):
+        return current
+    if span <= 0:
+        span = abs(y_max) or 1.0
+    step = 10 ** math.floor(math.log10(span)) / 2
+    return (
+        math.floor((y_min - span * padding) / step) * step,
+        math.ceil((y_max + span * padding) / step) * step,
+    )
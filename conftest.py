@@ -0,0 +1,2 @@
+# ploter_test.py is the matplotlib plotter script, not a test module
+collect_ignore = ["ploter_test.py"]
@@ -0,0 +1,64 @@
+import numpy as np
+
+
+def visible_slice(x, x0, x1):
+    # Index range of the samples inside [x0, x1], plus one neighbour on each
+    # side so lines still run to the edges of the view. `x` must be sorted.
+    start = max(int(np.searchsorted(x, x0, side="left")) - 1, 0)
+    stop = min(int(np.searchsorted(x, x1, side="right")) + 1, len(x))
+    return start, stop
+
+
+def minmax_decimate(x, y, x0=None, x1=None, pixels=1000):
+    # Reduce a series to about 2 points per horizontal pixel.
+    # Each bucket keeps its min and its max sample at their real x positions,
+    # in time order, so spikes survive no matter how far the series is reduced.
+    if x0 is not None and x1 is not None and len(x):
+        start, stop = visible_slice(x, x0, x1)
+        x = x[start:stop]
+        y = y[start:stop]
+
+    n = len(x)
+    pixels = max(int(pixels), 1)
+    if n <= 2 * pixels:
+        return x, y
+
+    size = -(-n // pixels)  # samples per bucket
+    full = n // size
+    blocks = y[:full * size].reshape(full, size)
+    offsets = np.arange(full) * size
+    lo = blocks.argmin(axis=1) + offsets
+    hi = blocks.argmax(axis=1) + offsets
+
+    if full * size < n:
+        tail = y[full * size:]
+        lo = np.append(lo, full * size + tail.argmin())
+        hi = np.append(hi, full * size + tail.argmax())
+
+    idx = np.empty(2 * len(lo), dtype=np.intp)
+    idx[0::2] = np.minimum(lo, hi)
+    idx[1::2] = np.maximum(lo, hi)
+    return x[idx], y[idx]
+
+
+class Decimator:
+    # Per-series cache: the decimated arrays are reused until the data version,
+    # the view range or the pixel width changes. `changed` tells the caller
+    # whether the last call produced new arrays (i.e. whether to re-upload).
+    def __init__(self):
+        self.changed = False
+        self._key = None
+        self._result = (np.empty(0), np.empty(0))
+
+    def decimate(self, x, y, x0, x1, pixels, version):
+        key = (version, x0, x1, int(pixels))
+        if key == self._key:
+            self.changed = False
+            return self._result
+        self._key = key
+        self._result = minmax_decimate(x, y, x0, x1, pixels)
+        self.changed = True
+        return self._result
+
+    def invalidate(self):
+        self._key = None
@@ -0,0 +1,304 @@
+import ast
+import math
+
+import numpy as np
+
+from ring_buffer import RingBuffer
+
+try:
+    from scipy.signal import lfilter
+except ImportError:
+    lfilter = None
+
+# Host-side derived channels: "name = expression" over other channels, evaluated
+# block by block on each incoming batch. Every stateful step (filters, rolling
+# windows) carries its state between blocks, so the result is the same as running
+# it over the whole series, at a constant cost per sample.
+#
+#   a - b, (a + b) / 2, abs(a) * 3.3   arithmetic; b is aligned to a's timestamps
+#   lowpass(x, hz), highpass(x, hz)    2nd order Butterworth (biquad)
+#   fir(x, [taps]), iir(x, [b], [a])   any linear filter, via lfilter with carried state
+#   mean(x, seconds), rms(x, seconds)  rolling mean / RMS over a time window
+#   ch("COM3/a")                       channel whose label is not a Python name
+#
+# The first channel in the expression sets the output timestamps; the others are
+# linearly interpolated at them, waiting up to MAX_LAG seconds for late samples
+# before holding their last value.
+MAX_LAG = 0.5
+ROLLING_CAPACITY = 1 << 16  # samples a rolling window can span
+RATE_SAMPLES = 16  # samples seen before a filter measures the rate and designs itself
+IIR_BLOCK = 64  # samples per matrix step of the IIR filters when scipy is missing
+
+
+class _Filter:
+    # Linear filter with its state carried between blocks: scipy's lfilter when
+    # available, otherwise one convolution per block (FIR) or the block form of the
+    # direct form II transposed recursion below (IIR)
+    def __init__(self, b, a=(1.0,)):
+        b = np.asarray(b, dtype=np.float64)
+        a = np.asarray(a, dtype=np.float64)
+        if not len(b) or not len(a) or not a[0]:
+            raise ValueError("filter needs taps and a[0] != 0")
+        self.fir = not a[1:].any()
+        self.b = b / a[0]
+        self.a = a / a[0]
+        if lfilter is None and self.fir:
+            self.state = np.zeros(len(b) - 1)  # the previous inputs
+        else:
+            n = max(len(b), len(a))
+            self.b = np.pad(self.b, (0, n - len(b)))
+            self.a = np.pad(self.a, (0, n - len(a)))
+            self.state = np.zeros(n - 1)
+            if lfilter is None:
+                self._block_responses()
+
+    def __call__(self, t, x):
+        if lfilter is not None:
+            y, self.state = lfilter(self.b, self.a, x, zi=self.state)
+            return y
+        if self.fir:
+            history = np.concatenate((self.state, x))
+            if len(self.state):
+                self.state = history[len(x):]
+            return np.convolve(history, self.b, mode="valid")
+        # IIR: the output of a block of r <= IIR_BLOCK samples is the zero-state
+        # response (a triangular Toeplitz product) plus the response to the state it
+        # starts from, so whole blocks are matrix products and only the state hand-off
+        # from block to block stays in Python
+        full = len(x) // IIR_BLOCK * IIR_BLOCK
+        blocks = x[:full].reshape(-1, IIR_BLOCK)
+        y = np.empty(len(x))
+        if full:
+            starts = np.empty((len(blocks), len(self.state)))
+            ends = blocks @ self._input_states[::-1]
+            z, advance = self.state, self._state_steps[-1]
+            for i, end in enumerate(ends):
+                starts[i] = z
+                z = advance @ z + end
+            self.state = z
+            y[:full] = (blocks @ self._toeplitz.T + starts @ self._state_outputs.T).ravel()
+        r = len(x) - full
+        if r:
+            tail = x[full:]
+            y[full:] = self._toeplitz[:r, :r] @ tail + self._state_outputs[:r] @ self.state
+            self.state = self._state_steps[r - 1] @ self.state + tail @ self._input_states[r - 1::-1]
+        return y
+
+    def _block_responses(self):
+        # Responses over IIR_BLOCK samples, from one run of the per-sample recursion
+        # for a unit impulse and one per state variable:
+        #   _toeplitz[i, j]          output i for a unit input at j (zero state)
+        #   _input_states[m]         state m samples after a unit input
+        #   _state_outputs[i, k]     output i for unit state k (zero input)
+        #   _state_steps[m][:, k]    state m + 1 samples after unit state k
+        order = len(self.state)
+        impulse = np.zeros(IIR_BLOCK)
+        impulse[0] = 1.0
+        h, self._input_states = self._run(impulse, np.zeros(order))
+        index = np.arange(IIR_BLOCK)
+        self._toeplitz = np.where(index[:, None] >= index, h[index[:, None] - index], 0.0)
+        runs = [self._run(np.zeros(IIR_BLOCK), unit) for unit in np.eye(order)]
+        self._state_outputs = np.stack([y for y, states in runs], axis=1)
+        self._state_steps = np.stack([states for y, states in runs], axis=2)
+
+    def _run(self, x, z):
+        # Direct form II transposed, one sample at a time; returns the outputs and
+        # the state after each sample
+        b, a, z = self.b, self.a, z.copy()
+        y = np.empty(len(x))
+        states = np.empty((len(x), len(z)))
+        for i, xi in enumerate(x.tolist()):
+            yi = b[0] * xi + z[0]
+            z[:-1] = z[1:] + b[1:-1] * xi - a[1:-1] * yi
+            z[-1] = b[-1] * xi - a[-1] * yi
+            y[i] = yi
+            states[i] = z
+        return y, states
+
+
+class _Biquad:
+    # Butterworth low/high-pass designed (bilinear transform) once the rate is known;
+    # the first RATE_SAMPLES samples pass through unfiltered
+    def __init__(self, kind, cutoff):
+        self.kind = kind
+        self.cutoff = cutoff
+        self.filter = None
+        self._t = []
+
+    def __call__(self, t, x):
+        if self.filter is None:
+            self._t.extend(t[:RATE_SAMPLES].tolist())
+            span = self._t[-1] - self._t[0] if self._t else 0.0
+            if len(self._t) < RATE_SAMPLES or span <= 0:
+                return x
+            self.filter = _Filter(*self._design((len(self._t) - 1) / span))
+        return self.filter(t, x)
+
+    def _design(self, rate):
+        w0 = 2 * math.pi * min(self.cutoff / rate, 0.499)
+        alpha = math.sin(w0) / math.sqrt(2)  # Q = 1/sqrt(2)
+        cos = math.cos(w0)
+        if self.kind == "lowpass":
+            b = [(1 - cos) / 2, 1 - cos, (1 - cos) / 2]
+        else:
+            b = [(1 + cos) / 2, -(1 + cos), (1 + cos) / 2]
+        return b, [1 + alpha, -2 * cos, 1 - alpha]
+
+
+class _Rolling:
+    # Mean (or RMS) over the last `seconds`: a ring of (t, running sum) turns every
+    # output into one difference of two running sums, located by binary search,
+    # whatever the window length. Windows longer than the ring are truncated to it.
+    def __init__(self, seconds, square=False):
+        self.seconds = seconds
+        self.square = square
+        self.sums = RingBuffer(ROLLING_CAPACITY)
+        self.sums.append(-np.inf, 0.0)  # the sum before the first sample
+        self.total = 0.0
+        self.since_rebase = 0
+
+    def __call__(self, t, x):
+        step = self.sums.capacity // 2
+        if len(x) > step:
+            return np.concatenate([self(t[i:i + step], x[i:i + step]) for i in range(0, len(x), step)])
+        if self.since_rebase >= self.sums.capacity:
+            self._rebase()
+        values = x * x if self.square else x
+        running = self.total + np.cumsum(values)
+        self.total = float(running[-1])
+        self.since_rebase += len(x)
+        self.sums.extend(t, running)
+        times, sums = self.sums.view()
+        end = np.arange(len(times) - len(x), len(times))
+        # Window of sample i is (t_i - seconds, t_i]; `start` is the last sum before it
+        start = np.maximum(np.searchsorted(times, t - self.seconds, side="right") - 1, 0)
+        mean = (sums[end] - sums[start]) / np.maximum(end - start, 1)
+        return np.sqrt(np.maximum(mean, 0.0)) if self.square else mean
+
+    def _rebase(self):
+        # Keeps the running sums small, so the differences stay exact in long sessions
+        times, sums = self.sums.view()
+        times, sums = times.copy(), sums - sums[0]
+        self.total -= self.sums.view()[1][0]
+        self.sums.clear()
+        self.sums.extend(times, sums)
+        self.since_rebase = 0
+
+
+_BINARY = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.divide,
+    ast.Pow: np.power,
+}
+
+
+def _constant(node):
+    # Numeric literal or list of them (filter taps), e.g. -0.5 or [1, -0.9]
+    try:
+        value = ast.literal_eval(node)
+    except ValueError:
+        raise ValueError(f"expected a number, got {ast.unparse(node)!r}") from None
+    if isinstance(value, (list, tuple)):
+        return [float(v) for v in value]
+    return float(value)
+
+
+class DerivedChannel:
+    # One "name = expression" channel. feed() takes each batch of any input channel
+    # and returns the (t, values) it completes, usually the same number of samples
+    # as the first input's batch.
+    def __init__(self, name, expression):
+        self.name = name
+        self.expression = expression
+        self.inputs = []  # channel labels, the first one sets the timestamps
+        try:
+            tree = ast.parse(expression, mode="eval").body
+        except SyntaxError as e:
+            raise ValueError(f"{name}: {e.msg}") from None
+        self._evaluate = self._compile(tree)
+        if not self.inputs:
+            raise ValueError(f"{name}: the expression uses no channel")
+        if name in self.inputs:
+            raise ValueError(f"{name}: a derived channel cannot use itself")
+        # Alignment: the first input's samples wait here until every other input has
+        # caught up with them; the others keep their recent samples for interpolation
+        self._pending_t = []
+        self._pending_v = []
+        self._recent = {label: RingBuffer(4096) for label in self.inputs[1:]}
+
+    def _compile(self, node):
+        if isinstance(node, ast.Name):
+            return self._channel(node.id)
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+            value = float(node.value)
+            return lambda t, env: np.full(len(t), value)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = self._compile(node.operand)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+            return lambda t, env: -operand(t, env)
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            op = _BINARY[type(node.op)]
+            left = self._compile(node.left)
+            right = self._compile(node.right)
+            return lambda t, env: op(left(t, env), right(t, env))
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            return self._call(node.func.id, node.args)
+        raise ValueError(f"{self.name}: unsupported expression {ast.unparse(node)!r}")
+
+    def _channel(self, label):
+        if label not in self.inputs:
+            self.inputs.append(label)
+        return lambda t, env: env[label]
+
+    def _call(self, func, args):
+        if func == "ch" and len(args) == 1 and isinstance(args[0], ast.Constant) and isinstance(args[0].value, str):
+            return self._channel(args[0].value)
+        if func == "abs" and len(args) == 1:
+            operand = self._compile(args[0])
+            return lambda t, env: np.abs(operand(t, env))
+        if func in ("lowpass", "highpass") and len(args) == 2:
+            step = _Biquad(func, _constant(args[1]))
+        elif func == "fir" and len(args) == 2:
+            step = _Filter(_constant(args[1]))
+        elif func == "iir" and len(args) == 3:
+            step = _Filter(_constant(args[1]), _constant(args[2]))
+        elif func in ("mean", "rms") and len(args) == 2:
+            step = _Rolling(_constant(args[1]), square=func == "rms")
+        else:
+            raise ValueError(f"{self.name}: unknown function or wrong arguments: {func}()")
+        operand = self._compile(args[0])
+        return lambda t, env: step(t, operand(t, env))
+
+    def feed(self, label, t, values):
+        primary = self.inputs[0]
+        if label == primary:
+            if len(self.inputs) == 1:
+                return t, self._evaluate(t, {primary: values})
+            self._pending_t.append(t)
+            self._pending_v.append(values)
+        else:
+            self._recent[label].extend(t, values)
+        return self._align()
+
+    def _align(self):
+        if not self._pending_t:
+            return None
+        t = np.concatenate(self._pending_t)
+        values = np.concatenate(self._pending_v)
+        # Samples every other input has reached, or older than MAX_LAG (then a late
+        # input holds its last value)
+        latest = [recent.view()[0][-1] if len(recent) else -np.inf for recent in self._recent.values()]
+        ready = int(np.searchsorted(t, max(min(latest), t[-1] - MAX_LAG), side="right"))
+        self._pending_t = [t[ready:]] if ready < len(t) else []
+        self._pending_v = [values[ready:]] if ready < len(t) else []
+        if not ready or -np.inf in latest:
+            return None  # nothing ready, or an input never sent anything: drop the stale samples
+        t, values = t[:ready], values[:ready]
+        env = {self.inputs[0]: values}
+        for label, recent in self._recent.items():
+            x, y = recent.view()
+            env[label] = np.interp(t, x, y)
+        return t, self._evaluate(t, env)
@@ -0,0 +1,242 @@
+import itertools
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import zipfile
+
+import numpy as np
+
+try:
+    import pyarrow
+    import pyarrow.csv
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Export of channel data to CSV, NPZ or Parquet (pyarrow needed), from the engine's
+# buffers (buffer_reader) or a recording (RecordingReader.read). Both are read
+# through read(label, t0, t1) -> (t, values) and streamed in CHUNK-sized pieces,
+# so a recording far larger than memory exports with bounded memory.
+#   long table: one row per sample, label,t,value (NPZ: <label>.t + <label>.v arrays)
+#   wide table: t plus one column per channel on the union of all timestamps,
+#               NaN (fill="nan") or the last value (fill="previous") where a channel
+#               has no sample at that time
+CHUNK = 1 << 20
+FORMATS = ("csv", "npz", "parquet")
+
+
+def buffer_reader(engine):
+    # read() over the engine's in-memory buffers (copies, taken under the engine lock)
+    def read(label, t0=None, t1=None):
+        with engine.lock:
+            buffer = engine.channels.get(label)
+            if buffer is None:
+                return np.empty(0), np.empty(0)
+            t, values = buffer.view()
+            start = 0 if t0 is None else int(np.searchsorted(t, t0, side="left"))
+            stop = len(t) if t1 is None else int(np.searchsorted(t, t1, side="left"))
+            return t[start:stop].copy(), values[start:stop].copy()
+    return read
+
+
+def format_of(path):
+    fmt = os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r}, use one of {', '.join(FORMATS)}")
+    if fmt == "parquet" and pyarrow is None:
+        raise ValueError("Parquet export needs pyarrow")
+    return fmt
+
+
+def _csv_lines(*columns):
+    # Shortest round-trip text of every float, one row per line; non-array columns
+    # (the label) are iterables of strings
+    text = [map(repr, column.tolist()) if isinstance(column, np.ndarray) else column for column in columns]
+    return "".join(f"{','.join(row)}\n" for row in zip(*text))
+
+
+class Exporter:
+    # One export job; start() runs it on a worker thread, run() in the caller's.
+    # `done`/`total` give the progress in samples, `error` the failure if any.
+    def __init__(self, read, labels, path, t0=None, t1=None, wide=False, fill="nan"):
+        self.read = read
+        self.labels = list(labels)
+        self.path = path
+        self.format = format_of(path)
+        self.t0 = t0
+        self.t1 = t1
+        self.wide = wide
+        self.fill = fill
+        self.total = 0
+        self.done = 0
+        self.error = None
+        self.finished = False
+        self.cancelled = False
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run_safely, daemon=True)
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def progress(self):
+        return self.done / self.total if self.total else float(self.finished)
+
+    def _run_safely(self):
+        try:
+            self.run()
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.finished = True
+
+    def run(self):
+        data = {label: self.read(label, self.t0, self.t1) for label in self.labels}
+        self.total = sum(len(t) for t, _ in data.values())
+        if self.wide:
+            self._write_wide(data)
+        else:
+            self._write_long(data)
+        if self.cancelled and os.path.exists(self.path):
+            os.remove(self.path)  # a partial file would look like a complete export
+        self.finished = True
+
+    # --- Long table ---
+    def _long_chunks(self, data):
+        for label, (t, values) in data.items():
+            for i in range(0, len(t), CHUNK):
+                if self.cancelled:
+                    return
+                chunk = np.asarray(values[i:i + CHUNK])
+                self.done += len(chunk)
+                yield [label, np.asarray(t[i:i + CHUNK]), chunk]
+
+    def _write_long(self, data):
+        if self.format != "npz":
+            self._write_rows(["label", "t", "value"], self._long_chunks(data))
+            return
+        with zipfile.ZipFile(self.path, "w", allowZip64=True) as archive:
+            for label, (t, values) in data.items():
+                for suffix, column in ((".t", t), (".v", values)):
+                    with archive.open(label + suffix + ".npy", "w", force_zip64=True) as f:
+                        self._write_npy(f, column, counted=suffix == ".v")
+
+    def _write_rows(self, names, chunks):
+        # CSV or Parquet, one chunk (list of columns) at a time; a str column stands
+        # for that label on every row. pyarrow, if installed, also writes the CSV:
+        # float formatting in Python is what limits CSV speed otherwise.
+        if pyarrow is None:
+            with open(self.path, "w", newline="") as f:
+                f.write(",".join(names) + "\n")
+                for columns in chunks:
+                    n = len(columns[-1])
+                    f.write(_csv_lines(*[itertools.repeat(c, n) if isinstance(c, str) else c for c in columns]))
+            return
+        writer = None
+        try:
+            for columns in chunks:
+                n = len(columns[-1])
+                arrays = [pyarrow.DictionaryArray.from_arrays(np.zeros(n, dtype=np.int32), [c])
+                          if isinstance(c, str) else c for c in columns]
+                table = pyarrow.table(dict(zip(names, arrays)))
+                if writer is None:
+                    if self.format == "parquet":
+                        writer = pyarrow.parquet.ParquetWriter(self.path, table.schema)
+                    else:
+                        writer = pyarrow.csv.CSVWriter(self.path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+
+    def _write_npy(self, f, column, counted):
+        # .npy header, then the float64 data chunk by chunk
+        np.lib.format.write_array_header_2_0(f, {"descr": "<f8", "fortran_order": False, "shape": (len(column),)})
+        for i in range(0, len(column), CHUNK):
+            if self.cancelled:
+                return
+            chunk = np.ascontiguousarray(column[i:i + CHUNK], dtype="<f8")
+            f.write(chunk.data)
+            if counted:
+                self.done += len(chunk)
+
+    # --- Wide table ---
+    def _wide_chunks(self, data):
+        # Time slices of about CHUNK samples of the densest channel, merged per slice
+        pacer = max(data, key=lambda label: len(data[label][0]), default=None)
+        if pacer is None or not len(data[pacer][0]):
+            return
+        bounds = list(np.asarray(data[pacer][0][CHUNK::CHUNK]))
+        last = {label: np.nan for label in data}
+        start = {label: 0 for label in data}
+        for bound in bounds + [None]:
+            if self.cancelled:
+                return
+            parts = {}
+            for label, (t, values) in data.items():
+                stop = len(t) if bound is None else int(np.searchsorted(t, bound, side="left"))
+                parts[label] = (np.asarray(t[start[label]:stop]), np.asarray(values[start[label]:stop]))
+                start[label] = stop
+            times = np.unique(np.concatenate([t for t, _ in parts.values()]))
+            columns = []
+            for label, (t, values) in parts.items():
+                column = np.full(len(times), np.nan)
+                column[np.searchsorted(times, t)] = values
+                if self.fill == "previous":
+                    column = self._fill_previous(column, last[label])
+                    if len(column):
+                        last[label] = column[-1]
+                columns.append(column)
+                self.done += len(t)
+            yield times, columns
+
+    @staticmethod
+    def _fill_previous(column, carry):
+        # Vectorized forward fill: index of the last valid entry at or before each row
+        index = np.where(np.isnan(column), -1, np.arange(len(column)))
+        np.maximum.accumulate(index, out=index)
+        filled = column[np.maximum(index, 0)]
+        filled[index < 0] = carry
+        return filled
+
+    def _write_wide(self, data):
+        names = ["t"] + self.labels
+        if self.format != "npz":
+            self._write_rows(names, ([times] + columns for times, columns in self._wide_chunks(data)))
+            return
+        # The row count is only known at the end: rows go to a scratch file first,
+        # then into the archive as one (rows, 1 + channels) "table" array
+        with tempfile.TemporaryFile() as scratch:
+            rows = 0
+            for times, columns in self._wide_chunks(data):
+                np.column_stack([times] + columns).astype("<f8").tofile(scratch)
+                rows += len(times)
+            scratch.seek(0)
+            with zipfile.ZipFile(self.path, "w", allowZip64=True) as archive:
+                with archive.open("table.npy", "w", force_zip64=True) as f:
+                    header = {"descr": "<f8", "fortran_order": False, "shape": (rows, len(names))}
+                    np.lib.format.write_array_header_2_0(f, header)
+                    shutil.copyfileobj(scratch, f, CHUNK)
+                with archive.open("columns.npy", "w") as f:
+                    np.lib.format.write_array(f, np.array(names))
+
+
+if __name__ == "__main__":
+    # python export.py RECORDING_FOLDER OUTPUT.{csv,npz,parquet} [wide|wide-previous] [LABEL,...]
+    from recorder import RecordingReader
+    reader = RecordingReader(sys.argv[1])
+    mode = sys.argv[3] if len(sys.argv) > 3 else "long"
+    labels = sys.argv[4].split(",") if len(sys.argv) > 4 else reader.labels()
+    exporter = Exporter(reader.read, labels, sys.argv[2], wide=mode.startswith("wide"),
+                        fill="previous" if mode == "wide-previous" else "nan")
+    exporter.run()
+    print(f"{exporter.total} samples of {len(labels)} channels written to {sys.argv[2]}")
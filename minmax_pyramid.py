@@ -0,0 +1,216 @@
+import threading
+
+import numpy as np
+
+from decimate import minmax_decimate, visible_slice
+
+# Columns of one level: each bucket keeps its min and its max sample at their real
+# times. Both time columns are sorted, since buckets never overlap in time.
+T_MIN, V_MIN, T_MAX, V_MAX = range(4)
+STAGE = 256  # single appended samples are reduced in batches of this many
+
+
+def reduce_pairs(cols):
+    # One level up: extrema of each pair of neighbouring buckets (len must be even)
+    a = cols[:, 0::2]
+    b = cols[:, 1::2]
+    lower = b[V_MIN] < a[V_MIN]
+    higher = b[V_MAX] > a[V_MAX]
+    out = np.empty((4, a.shape[1]))
+    out[T_MIN] = np.where(lower, b[T_MIN], a[T_MIN])
+    out[V_MIN] = np.where(lower, b[V_MIN], a[V_MIN])
+    out[T_MAX] = np.where(higher, b[T_MAX], a[T_MAX])
+    out[V_MAX] = np.where(higher, b[V_MAX], a[V_MAX])
+    return out
+
+
+class _Level:
+    # Fixed-capacity ring of buckets, mirrored like RingBuffer so view() never copies.
+    # `pending` is the odd bucket of the level below still waiting for its pair.
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._cols = np.zeros((4, 2 * capacity))
+        self._head = 0
+        self.size = 0
+        self.dropped = 0  # buckets overwritten so far
+        self.pending = None
+
+    def write(self, cols):
+        n = cols.shape[1]
+        cap = self.capacity
+        if n > cap:
+            cols = cols[:, -cap:]
+            self.dropped += n - cap
+            n = cap
+        self.dropped += max(self.size + n - cap, 0)
+        i = self._head
+        first = min(n, cap - i)
+        rest = n - first
+        self._cols[:, i:i + first] = cols[:, :first]
+        self._cols[:, i + cap:i + cap + first] = cols[:, :first]
+        if rest:
+            self._cols[:, :rest] = cols[:, first:]
+            self._cols[:, cap:cap + rest] = cols[:, first:]
+        self._head = (i + n) % cap
+        self.size = min(self.size + n, cap)
+
+    def view(self):
+        end = self._head + self.capacity
+        return self._cols[:, end - self.size:end]
+
+    def pairs(self, cols):
+        # Buckets for this level out of new buckets of the level below
+        if self.pending is not None:
+            cols = np.concatenate((self.pending, cols), axis=1)
+        even = cols.shape[1] & ~1
+        self.pending = cols[:, even:] if even < cols.shape[1] else None
+        return reduce_pairs(cols[:, :even])
+
+
+class MinMaxPyramid:
+    # Whole-session history of one channel for zoomed-out views in bounded memory.
+    # Level k holds the min and max of every 2^k samples, level 0 the samples
+    # themselves; each level is a ring of `capacity` buckets, so fine levels only
+    # reach back over the recent past while a new top level is added whenever the
+    # current top would overwrite something. Memory grows with log2(samples).
+    # query() picks the finest level with at most one bucket per pixel, so a view
+    # costs O(pixels) however long the session is. `source(t0, t1) -> (t, values)`
+    # (e.g. a RecordingReader.read) serves zooms into the past finer than memory holds.
+    # One thread may write while another queries; the source is read outside the lock.
+    def __init__(self, capacity=4096, source=None):
+        self.capacity = max(2, int(capacity))
+        self.source = source
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.levels = [_Level(self.capacity)]
+        self.count = 0  # samples seen, also the data version for caching
+        self._staged_t = []
+        self._staged_v = []
+
+    @classmethod
+    def from_recording(cls, reader, label, capacity=4096, chunk=1 << 20):
+        # Streams a recorded channel through the pyramid; the recording backs the fine levels
+        pyramid = cls(capacity, source=lambda t0, t1: reader.read(label, t0, t1))
+        t, values = reader.read(label)
+        for i in range(0, len(t), chunk):
+            pyramid.extend(t[i:i + chunk], values[i:i + chunk])
+        return pyramid
+
+    def __len__(self):
+        return self.count + len(self._staged_t)
+
+    def append(self, t, value):
+        with self.lock:
+            self._staged_t.append(t)
+            self._staged_v.append(value)
+            if len(self._staged_t) >= STAGE:
+                self._flush()
+
+    def extend(self, t, values):
+        with self.lock:
+            self._flush()
+            self._extend(t, values)
+
+    def _extend(self, t, values):
+        t = np.asarray(t, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if not len(t):
+            return
+        self.count += len(t)
+        cols = np.stack((t, values, t, values))
+        k = 0
+        while len(cols[0]):
+            level = self.levels[k]
+            if k == len(self.levels) - 1 and level.size + cols.shape[1] > level.capacity:
+                self._grow()
+            level.write(cols)
+            if k + 1 == len(self.levels):
+                break
+            k += 1
+            cols = self.levels[k].pairs(cols)
+
+    def _flush(self):
+        if self._staged_t:
+            t, values = self._staged_t, self._staged_v
+            self._staged_t, self._staged_v = [], []
+            self._extend(t, values)
+
+    def _grow(self):
+        # New top level built from the full current top, before it overwrites anything
+        top = _Level(self.capacity)
+        cols = top.pairs(self.levels[-1].view().copy())
+        top.write(cols)
+        self.levels.append(top)
+
+    def clear(self):
+        with self.lock:
+            self._reset()
+
+    def query(self, x0=None, x1=None, pixels=1000):
+        # About 2 points per pixel of [x0, x1] (everything if None), min/max per bucket
+        if x0 is None or x1 is None:
+            x0, x1 = -np.inf, np.inf
+        pixels = max(int(pixels), 1)
+        with self.lock:
+            points = self._query(x0, x1, pixels, use_source=True)
+        if points is None:
+            points = self._read_source(x0, x1, pixels)
+        if points is None:
+            with self.lock:
+                points = self._query(x0, x1, pixels, use_source=False)
+        return points
+
+    def _query(self, x0, x1, pixels, use_source):
+        # None when the recording should serve this view (read it without the lock)
+        self._flush()
+        can_read = use_source and self.source is not None and np.isfinite(x0) and np.isfinite(x1)
+        for k, level in enumerate(self.levels):
+            cols = level.view()
+            start, stop = visible_slice(cols[T_MIN], x0, x1)
+            if stop - start > pixels and k + 1 < len(self.levels):
+                continue
+            if level.dropped and len(cols[0]) and cols[T_MIN, 0] > x0:
+                # This level no longer reaches back to x0
+                if k + 1 < len(self.levels):
+                    if can_read:
+                        return None
+                    continue
+            return self._points(k, cols[:, start:stop], x1, pixels)
+        return np.empty(0), np.empty(0)
+
+    def _points(self, k, cols, x1, pixels):
+        # Buckets of level k plus the newer samples still pending in the levels below it
+        tail = [level.pending for level in self.levels[k:0:-1] if level.pending is not None]
+        if tail:
+            tail = np.concatenate(tail, axis=1)
+            cols = np.concatenate((cols, tail[:, tail[T_MIN] <= x1]), axis=1)
+        if k == 0:
+            x, y = cols[T_MIN], cols[V_MIN]
+        else:
+            min_first = cols[T_MIN] <= cols[T_MAX]
+            x = np.empty(2 * cols.shape[1])
+            y = np.empty(2 * cols.shape[1])
+            x[0::2] = np.where(min_first, cols[T_MIN], cols[T_MAX])
+            y[0::2] = np.where(min_first, cols[V_MIN], cols[V_MAX])
+            x[1::2] = np.where(min_first, cols[T_MAX], cols[T_MIN])
+            y[1::2] = np.where(min_first, cols[V_MAX], cols[V_MIN])
+        return minmax_decimate(x, y, pixels=pixels)
+
+    def _read_source(self, x0, x1, pixels):
+        # Recorded samples, used only if they span the whole view to within a pixel
+        if self.source is None or not np.isfinite(x0) or not np.isfinite(x1):
+            return None
+        try:
+            t, values = self.source(x0, x1)
+        except (OSError, KeyError, ValueError):
+            return None
+        n = min(len(t), len(values))
+        if not n:
+            return None
+        # Within a pixel or a couple of sample periods, whichever is longer
+        slack = max((x1 - x0) / pixels, 2 * (t[n - 1] - t[0]) / max(n - 1, 1))
+        if t[0] > x0 + slack or t[n - 1] < x1 - slack:
+            return None
+        return minmax_decimate(np.asarray(t[:n]), np.asarray(values[:n]), pixels=pixels)
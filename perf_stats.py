@@ -0,0 +1,129 @@
+from time import perf_counter
+
+# Always-on pipeline counters and stage timings. Recording is a couple of integer
+# operations per chunk or frame (never per sample), so it can stay enabled in the
+# hot loop. Each counter/histogram has one writer thread; readers only take
+# snapshots, so no lock is needed.
+BUCKETS = 32
+ALARM_HOLD = 5.0  # seconds an alarm stays active after it was last raised
+
+
+class TimingHistogram:
+    # Durations in power-of-two buckets of 1024 ns: bucket b holds [2^(b-1), 2^b) units
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def record(self, ns):
+        self.counts[min((ns >> 10).bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+
+    def percentile(self, q):
+        # Upper bound of the bucket holding the q-th percentile, in microseconds
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for b, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min((1 << b) * 1.024, self.max_ns / 1000)
+        return self.max_ns / 1000
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_us": self.total_ns / self.count / 1000 if self.count else 0.0,
+            "p50_us": self.percentile(50),
+            "p99_us": self.percentile(99),
+            "max_us": self.max_ns / 1000,
+        }
+
+    def clear(self):
+        self.__init__()
+
+
+class PerfStats:
+    def __init__(self):
+        self.counters = {}
+        self.timings = {}
+        self.gauges = {}  # values sampled at snapshot time, name -> callable
+        self.last_error = None
+        self.alarms = {}  # name -> (perf_counter() when last raised, message)
+        self._last_seq = {}
+        self._last_time = perf_counter()
+
+    def add(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def record(self, name, ns):
+        histogram = self.timings.get(name)
+        if histogram is None:
+            histogram = self.timings[name] = TimingHistogram()
+        histogram.record(ns)
+
+    def error(self, exc):
+        self.add("errors")
+        self.last_error = f"{type(exc).__name__}: {exc}"
+
+    def alarm(self, name, message):
+        # Overload and data-loss conditions; they clear themselves ALARM_HOLD s after the last one
+        self.alarms[name] = (perf_counter(), message)
+
+    def active_alarms(self):
+        now = perf_counter()
+        return {name: message for name, (when, message) in list(self.alarms.items()) if now - when < ALARM_HOLD}
+
+    def snapshot(self, channel_seq=None):
+        # Plain-dict copy of everything; `channel_seq` ({label: samples so far}) gives
+        # samples/s per channel since the previous snapshot
+        now = perf_counter()
+        elapsed = now - self._last_time
+        rates = {}
+        if channel_seq is not None and elapsed > 0:
+            for label, seq in channel_seq.items():
+                rates[label] = (seq - self._last_seq.get(label, 0)) / elapsed
+            self._last_seq = dict(channel_seq)
+            self._last_time = now
+        return {
+            "counters": dict(self.counters),
+            "gauges": {name: gauge() for name, gauge in list(self.gauges.items())},
+            "rates": rates,
+            "timings": {name: h.summary() for name, h in list(self.timings.items())},
+            "last_error": self.last_error,
+            "alarms": self.active_alarms(),
+        }
+
+    def clear(self):
+        self.counters.clear()
+        self.timings.clear()
+        self.last_error = None
+        self.alarms.clear()
+
+
+def format_snapshot(snapshot):
+    # Multi-line text for overlays and console output
+    lines = []
+    counters = snapshot["counters"]
+    if counters:
+        lines.append("  ".join(f"{name}: {value}" for name, value in sorted(counters.items())))
+    gauges = snapshot["gauges"]
+    if gauges:
+        lines.append("  ".join(f"{name}: {value}" for name, value in sorted(gauges.items())))
+    for name, t in sorted(snapshot["timings"].items()):
+        lines.append(f"{name}: mean {t['mean_us']:.0f} us, p50 {t['p50_us']:.0f}, "
+                     f"p99 {t['p99_us']:.0f}, max {t['max_us']:.0f} ({t['count']})")
+    rates = snapshot["rates"]
+    if rates:
+        lines.append("samples/s: " + "  ".join(f"{label} {rate:.0f}" for label, rate in sorted(rates.items())))
+    for name, message in sorted(snapshot.get("alarms", {}).items()):
+        lines.append(f"ALARM {name}: {message}")
+    if snapshot["last_error"]:
+        lines.append(f"last error: {snapshot['last_error']}")
+    return "\n".join(lines)
+
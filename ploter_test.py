@@ -81,19 +81,36 @@
 
 
 import matplotlib.pyplot as plt
-from matplotlib.animation import FuncAnimation
 from matplotlib.widgets import Button
+import os
 import serial
 import time
-import numpy as np
+
+from acquisition import AcquisitionEngine
+from blit_manager import BlitManager, snap_xlim, snap_ylim
+from decimate import minmax_decimate
+from export import Exporter, buffer_reader
+from ring_buffer import TimeWindowBuffer
+from sources import open_source
+from window_extrema import SlidingExtrema
 
 # Serial port configuration
-SERIAL_PORT = 'COM3'
+SERIAL_PORT = os.environ.get('SERIAL_PORT', 'COM3')
+# Also accepts 'synthetic[:CHANNELS[:RATE]]', a capture file / recording folder to replay,
+# or several ports separated by commas (channels are then named '<port>/<label>')
 BAUD_RATE = 115200
 TIMEOUT = 0.1
+REPLAY_SPEED = 1.0  # Replay/synthetic pacing, None = as fast as possible
+
+# Seconds of history shown and kept per sensor
+WINDOW_SECONDS = 10
+
+# Recordings go to a new sub-folder of this folder each time "Record" is clicked
+RECORD_DIR = 'recordings'
 
 # Data storage for sensors
 sensor_data = {}  # Dictionary to store data for each sensor
+read_seq = {}  # Last engine sequence number pulled per channel
 start_time = time.time()
 
 # List of colors for different sensors
@@ -102,21 +119,25 @@ color_index = 0
 
 # Initialize Serial
 try:
-    ser = serial.Serial(SERIAL_PORT, BAUD_RATE, timeout=TIMEOUT)
-    ser.flushInput()
+    sources = [open_source(port.strip(), BAUD_RATE, timeout=TIMEOUT, speed=REPLAY_SPEED) for port in SERIAL_PORT.split(',')]
     print(f"Connected to {SERIAL_PORT}")
 except serial.SerialException as e:
     print(f"Error opening serial port: {e}")
     exit(1)
 
+# Read and parse in the background; update() only pulls new samples
+engine = AcquisitionEngine(window=WINDOW_SECONDS, protocol="text")
+engine.start(sources)
+
 # Figure and plot setup
 fig, ax = plt.subplots()
 ax.set_xlabel('Time (s)')
 ax.set_ylabel('Value')
-ax.set_xlim(0, 10)
+ax.set_xlim(0, WINDOW_SECONDS)
 ax.set_ylim(-10, 10)  # Initial range for safety
 ax.legend()
 ax.grid(True)
+blit = BlitManager(fig.canvas)
 
 # Function to toggle plotting for a sensor
 def toggle_plot(sensor_name):
@@ -124,17 +145,42 @@ def toggle_plot(sensor_name):
         sensor_data[sensor_name]['active'] = not sensor_data[sensor_name]['active']
         print(f"Plotting {sensor_name}: {sensor_data[sensor_name]['active']}")
         sensor_data[sensor_name]['line'].set_visible(sensor_data[sensor_name]['active'])
-        ax.legend()
-        fig.canvas.draw()
+        blit.update()
     return toggle
 
+# Function to start/stop recording everything the engine receives
+def toggle_recording(event):
+    if engine.recorder is None:
+        path = os.path.join(RECORD_DIR, time.strftime('%Y%m%d-%H%M%S'))
+        engine.start_recording(path, raw=True)
+        record_button.label.set_text('Stop')
+        print(f"Recording to {path}")
+    else:
+        engine.stop_recording()
+        record_button.label.set_text('Record')
+        print("Recording stopped")
+
+record_button = Button(plt.axes([0.01, 0.01, 0.08, 0.05]), 'Record', color='lightgray', hovercolor='gray')
+record_button.on_clicked(toggle_recording)
+
+# Function to export the buffered data of the plotted sensors, on a worker thread
+def export_data(event):
+    labels = [label for label in engine.labels() if sensor_data.get(label.lower(), {}).get('active')]
+    path = os.path.join(RECORD_DIR, time.strftime('export-%Y%m%d-%H%M%S.npz'))
+    os.makedirs(RECORD_DIR, exist_ok=True)
+    Exporter(buffer_reader(engine), labels, path).start()
+    print(f"Exporting {len(labels)} sensors to {path}")
+
+export_button = Button(plt.axes([0.10, 0.01, 0.08, 0.05]), 'Export', color='lightgray', hovercolor='gray')
+export_button.on_clicked(export_data)
+
 # Function to add a new sensor to the plot
 def add_sensor(sensor_name):
     global color_index
     # Initialize data for the new sensor
     sensor_data[sensor_name] = {
-        't': [],  # Time data
-        'data': [],  # Sensor values
+        'buffer': TimeWindowBuffer(WINDOW_SECONDS),  # Time data and sensor values
+        'extrema': SlidingExtrema(),  # Running min/max of the window
         'active': True,  # Plotting state
         'line': None,  # Plot line object
         'button': None  # Toggle button
@@ -145,6 +191,7 @@ def add_sensor(sensor_name):
     line, = ax.plot([], [], color, label=sensor_name)
     sensor_data[sensor_name]['line'] = line
     line.set_visible(True)  # Initially visible
+    blit.add_artist(line)  # Redrawn every frame, not part of the cached background
     color_index += 1
     
     # Create a toggle button for the sensor
@@ -156,74 +203,60 @@ def add_sensor(sensor_name):
     
     print(f"Added sensor: {sensor_name}")
     ax.legend()
-    fig.canvas.draw()
+    blit.invalidate()
 
 def update(frame):
-    try:
-        while ser.in_waiting > 0:
-            line_data = ser.readline().decode('utf-8').strip()
-            try:
-                # Process data in format ">sensor: value"
-                if line_data.startswith('>') and ': ' in line_data:
-                    parts = line_data.split('>')
-                    if len(parts) < 2:
-                        continue
-                    sensor_part = parts[1].split(': ')
-                    if len(sensor_part) < 2:
-                        continue
-                    sensor_name = sensor_part[0].lower()  # e.g., "temperature"
-                    value_str = sensor_part[1]  # e.g., "25.5"
-                    value = float(value_str)
-
-                    # Add sensor if it's new
-                    if sensor_name not in sensor_data:
-                        add_sensor(sensor_name)
-
-                    current_time = time.time() - start_time
-
-                    # Store data for the sensor
-                    sensor_data[sensor_name]['t'].append(current_time)
-                    sensor_data[sensor_name]['data'].append(value)
-
-                    # Remove old data outside the 10-second window
-                    while sensor_data[sensor_name]['t'] and sensor_data[sensor_name]['t'][0] < current_time - 10:
-                        sensor_data[sensor_name]['t'].pop(0)
-                        sensor_data[sensor_name]['data'].pop(0)
-
-                    # Update plot if active
-                    if sensor_data[sensor_name]['active']:
-                        sensor_data[sensor_name]['line'].set_data(
-                            sensor_data[sensor_name]['t'],
-                            sensor_data[sensor_name]['data']
-                        )
-
-                    # Always show the last 10 seconds on the x-axis
-                    ax.set_xlim(max(0, current_time - 10), current_time)
-
-                    # Dynamically adjust y-axis based on visible data
-                    all_data = []
-                    for s_name, s_data in sensor_data.items():
-                        if s_data['active'] and s_data['data']:
-                            all_data.extend(s_data['data'])
-                    if all_data:  # Ensure data is not empty
-                        y_min = min(all_data)
-                        y_max = max(all_data)
-                        padding = (y_max - y_min) * 0.1
-                        ax.set_ylim(y_min - padding, y_max + padding)
-
-            except ValueError:
-                print(f"Invalid data received: {line_data}")
-    except serial.SerialException as e:
-        print(f"Serial error: {e}")
-
-    # Return lines that need to be updated
-    lines = [s_data['line'] for s_data in sensor_data.values() if s_data['active']]
-    return lines
-
-# Animation
-ani = FuncAnimation(fig, update, interval=50, blit=False)
-plt.title('Real-Time Serial Data Plot')
+    current_time = time.time() - start_time
+    new_data = False
+    for label in engine.labels():
+        # Only the samples the engine received since the last frame
+        seq, t, values = engine.window(label, read_seq.get(label, 0))
+        read_seq[label] = seq
+        if not len(values):
+            continue
+        new_data = True
+        sensor_name = label.lower()  # e.g., "temperature"
+        t = t - start_time
+
+        # Add sensor if it's new
+        if sensor_name not in sensor_data:
+            add_sensor(sensor_name)
+
+        # Store data for the sensor; the buffer drops samples older than the window itself
+        sensor_data[sensor_name]['buffer'].extend(t, values)
+        sensor_data[sensor_name]['extrema'].push(t[-1], values)
+        sensor_data[sensor_name]['extrema'].evict_before(current_time - WINDOW_SECONDS)
+
+        # Update plot if active, reduced to about 2 points per pixel of the axes
+        if sensor_data[sensor_name]['active']:
+            t, data = sensor_data[sensor_name]['buffer'].view()
+            x, y = minmax_decimate(t, data, current_time - WINDOW_SECONDS, current_time, ax.bbox.width)
+            sensor_data[sensor_name]['line'].set_data(x, y)
+
+    if new_data:
+        # Show the last WINDOW_SECONDS; the x-axis advances in 1 s steps so the
+        # cached background stays valid between steps
+        xlim = snap_xlim(current_time, WINDOW_SECONDS, 1.0)
+
+        # Dynamically adjust y-axis based on visible data, from each sensor's running min/max
+        ylim = None
+        active = [s_data['extrema'] for s_data in sensor_data.values() if s_data['active'] and s_data['extrema']]
+        if active:  # Ensure data is not empty
+            y_min = min(extrema.min for extrema in active)
+            y_max = max(extrema.max for extrema in active)
+            ylim = snap_ylim(y_min, y_max, ax.get_ylim())
+        blit.set_limits(ax, xlim, ylim)
+
+    # Redraw only the lines over the cached background
+    blit.update()
+
+# Animation: a plain canvas timer, the BlitManager does the drawing
+timer = fig.canvas.new_timer(interval=50)
+timer.add_callback(update, None)
+timer.start()
+ax.set_title('Real-Time Serial Data Plot')
 plt.show()
 
 # Close serial port when done
-ser.close()
\ No newline at end of file
+engine.stop_recording()
+engine.stop()
\ No newline at end of file
@@ -0,0 +1,252 @@
+import json
+import os
+import queue
+import re
+import threading
+
+import numpy as np
+
+# On-disk layout of one recording directory:
+#   <stem>.t.f64    timestamps, float64, one per sample
+#   <stem>.v.f64    values, float64, one per sample
+#   <stem>.idx      (t, sample offset) pairs every INDEX_EVERY samples, for seeking by time
+#   raw.bin         optional raw serial bytes, raw.offsets = (t, byte offset) per chunk
+#                   (raw-<port>.bin/.offsets per port when several ports are read)
+#   channels.json   file stem -> channel label
+# Stems are the label with unsafe characters replaced, plus "-2", "-3"... when that
+# would clash with another channel's stem (compared case-insensitively). The raw log's
+# suffixes are not used by channel files, so a channel named "raw" cannot clash with it.
+INDEX_EVERY = 4096
+WRITE_BUFFER = 1 << 20
+MAX_QUEUED_BYTES = 64 << 20  # data waiting for the writer thread
+RAW_INDEX = ".offsets"
+
+
+def _file_stem(label):
+    return re.sub(r"[^\w.-]", "_", label)
+
+
+def raw_index_path(directory, name="raw"):
+    # Recordings made before RAW_INDEX have the raw index in <name>.idx
+    path = os.path.join(directory, name + RAW_INDEX)
+    old = os.path.join(directory, name + ".idx")
+    if not os.path.exists(path) and os.path.exists(old):
+        return old
+    return path
+
+
+class _ChannelLog:
+    def __init__(self, directory, stem):
+        path = os.path.join(directory, stem)
+        self.t_file = open(path + ".t.f64", "ab", buffering=WRITE_BUFFER)
+        self.v_file = open(path + ".v.f64", "ab", buffering=WRITE_BUFFER)
+        self.idx_file = open(path + ".idx", "ab")
+        self.count = self.t_file.tell() // 8
+        self.next_index = -(-self.count // INDEX_EVERY) * INDEX_EVERY
+
+    def write(self, t, values):
+        n = len(values)
+        if self.count + n > self.next_index:
+            # Index entries for every INDEX_EVERY boundary inside this block
+            offsets = np.arange(self.next_index, self.count + n, INDEX_EVERY)
+            entries = np.empty(len(offsets), dtype=[("t", "<f8"), ("offset", "<i8")])
+            entries["t"] = t[offsets - self.count]
+            entries["offset"] = offsets
+            self.idx_file.write(entries.tobytes())
+            self.next_index = offsets[-1] + INDEX_EVERY
+        self.t_file.write(np.ascontiguousarray(t, dtype="<f8").tobytes())
+        self.v_file.write(np.ascontiguousarray(values, dtype="<f8").tobytes())
+        self.count += n
+
+    def close(self):
+        for f in (self.t_file, self.v_file, self.idx_file):
+            f.close()
+
+
+class Recorder:
+    # Continuous recording of parsed samples (and optionally raw bytes).
+    # write()/write_raw() only queue the arrays; a background thread does the
+    # file I/O with large buffered appends, so ingest never waits on the disk.
+    # The queue holds at most `max_bytes`; past that a write is dropped and
+    # counted (returns False), or with block=True waits for the disk to catch up.
+    def __init__(self, directory, raw=False, max_bytes=MAX_QUEUED_BYTES, block=False):
+        self.directory = directory
+        self.raw = raw
+        self.max_bytes = max_bytes
+        self.block = block
+        self.samples_written = 0
+        self.bytes_written = 0
+        self.dropped_samples = 0
+        self.dropped_bytes = 0
+        self._queued_bytes = 0
+        self._room = threading.Condition()
+        os.makedirs(directory, exist_ok=True)
+        self._queue = queue.Queue()
+        self._channels = {}
+        self._names = self._load_names()
+        self._raw_files = {}  # name -> (data file, index file)
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def write(self, label, t, values):
+        if not self._reserve(16 * len(values)):
+            self.dropped_samples += len(values)
+            return False
+        self._queue.put((label, np.array(t, dtype=np.float64), np.array(values, dtype=np.float64)))
+        return True
+
+    def write_raw(self, t, data, name="raw"):
+        if not self.raw or not data:
+            return True
+        if not self._reserve(len(data)):
+            self.dropped_bytes += len(data)
+            return False
+        self._queue.put((None, t, (name, bytes(data))))
+        return True
+
+    def _reserve(self, nbytes):
+        with self._room:
+            while self._queued_bytes + nbytes > self.max_bytes and self._queued_bytes:
+                if not self.block:
+                    return False
+                self._room.wait(0.1)
+            self._queued_bytes += nbytes
+            return True
+
+    def queue_depth(self):
+        # Blocks waiting for the writer thread
+        return self._queue.qsize()
+
+    def queued_bytes(self):
+        return self._queued_bytes
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            label, t, data = item
+            if label is None:
+                self._append_raw(t, data)
+                nbytes = len(data[1])
+            else:
+                self._append_samples(label, t, data)
+                nbytes = 16 * len(data)
+            with self._room:
+                self._queued_bytes -= nbytes
+                self._room.notify()
+        for log in self._channels.values():
+            log.close()
+        for data_file, idx_file in self._raw_files.values():
+            data_file.close()
+            idx_file.close()
+
+    def _append_samples(self, label, t, values):
+        log = self._channels.get(label)
+        if log is None:
+            log = self._channels[label] = _ChannelLog(self.directory, self._stem(label))
+            self._save_names()  # now, so a recording cut short by a crash can still be read
+        log.write(t, values)
+        self.samples_written += len(values)
+
+    def _stem(self, label):
+        # The label's stem from an earlier run into this directory, or a new unique one
+        for stem, name in self._names.items():
+            if name == label:
+                return stem
+        taken = {stem.lower() for stem in self._names}
+        base = stem = _file_stem(label)
+        suffix = 2
+        while stem.lower() in taken:
+            stem = f"{base}-{suffix}"
+            suffix += 1
+        self._names[stem] = label
+        return stem
+
+    def _append_raw(self, t, item):
+        name, data = item
+        files = self._raw_files.get(name)
+        if files is None:
+            path = os.path.join(self.directory, _file_stem(name))
+            files = self._raw_files[name] = (open(path + ".bin", "ab", buffering=WRITE_BUFFER), open(path + RAW_INDEX, "ab"))
+        data_file, idx_file = files
+        offset = data_file.tell()
+        idx_file.write(np.array([(t, offset)], dtype=[("t", "<f8"), ("offset", "<i8")]).tobytes())
+        data_file.write(data)
+        self.bytes_written += len(data)
+
+    def _load_names(self):
+        path = os.path.join(self.directory, "channels.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                return json.load(f)
+        return {}
+
+    def _save_names(self):
+        # Replaced whole, so a reader never sees a half-written file
+        path = os.path.join(self.directory, "channels.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(self._names, f, indent=1)
+        os.replace(path + ".tmp", path)
+
+
+class RecordingReader:
+    # Read access to a recording directory through np.memmap (nothing is loaded up front)
+    def __init__(self, directory):
+        self.directory = directory
+        path = os.path.join(directory, "channels.json")
+        with open(path) as f:
+            self._stems = {label: stem for stem, label in json.load(f).items()}
+
+    def labels(self):
+        return list(self._stems)
+
+    def _map(self, label, suffix, dtype):
+        # Whole records only: a recording cut short by a crash may end mid-record
+        path = os.path.join(self.directory, self._stems[label] + suffix)
+        size = os.path.getsize(path) // np.dtype(dtype).itemsize
+        if not size:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r", shape=(size,))
+
+    def __len__(self):
+        return len(self._stems)
+
+    def count(self, label):
+        return len(self._map(label, ".t.f64", "<f8"))
+
+    def read(self, label, t0=None, t1=None):
+        # (t, values) of `label` with t0 <= t < t1, located through the index
+        t = self._map(label, ".t.f64", "<f8")
+        v = self._map(label, ".v.f64", "<f8")
+        if len(t) != len(v):  # after a crash one column may have been flushed further
+            t, v = t[:len(v)], v[:len(t)]
+        start, stop = 0, len(t)
+        if t0 is not None or t1 is not None:
+            index = self._map(label, ".idx", [("t", "<f8"), ("offset", "<i8")])
+            if t0 is not None:
+                start = self._seek(t, index, t0)
+            if t1 is not None:
+                stop = self._seek(t, index, t1)
+        return t[start:stop], v[start:stop]
+
+    @staticmethod
+    def _seek(t, index, when):
+        # The index narrows the search to one INDEX_EVERY block of the memmapped column
+        block = int(np.searchsorted(index["t"], when, side="left")) - 1 if len(index) else -1
+        lo = int(index["offset"][block]) if block >= 0 else 0
+        hi = min(lo + 2 * INDEX_EVERY, len(t)) if block >= 0 and block + 1 < len(index) else len(t)
+        return lo + int(np.searchsorted(t[lo:hi], when, side="left"))
+
+    def read_raw(self, t0=None, t1=None, name="raw"):
+        data = np.memmap(os.path.join(self.directory, name + ".bin"), dtype=np.uint8, mode="r")
+        index = np.fromfile(raw_index_path(self.directory, name), dtype=[("t", "<f8"), ("offset", "<i8")])
+        start = 0 if t0 is None else int(np.searchsorted(index["t"], t0))
+        stop = len(index) if t1 is None else int(np.searchsorted(index["t"], t1))
+        lo = int(index["offset"][start]) if start < len(index) else len(data)
+        hi = int(index["offset"][stop]) if stop < len(index) else len(data)
+        return data[lo:hi]
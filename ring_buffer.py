@@ -0,0 +1,100 @@
+import numpy as np
+
+
+class RingBuffer:
+    # Fixed-capacity float64 ring of (x, y) samples.
+    # Each sample is written twice (at i and i + capacity), so the newest
+    # `capacity` samples are always one contiguous slice and view() never copies.
+    def __init__(self, capacity=1000):
+        self.capacity = max(1, int(capacity))
+        self._x = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._y = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._head = 0  # next write position in [0, capacity)
+        self._size = 0
+        self.seq = 0  # total samples ever appended
+
+    def __len__(self):
+        return self._size
+
+    def append(self, x, y):
+        i = self._head
+        j = i + self.capacity
+        self._x[i] = self._x[j] = x
+        self._y[i] = self._y[j] = y
+        self._head = (i + 1) % self.capacity
+        if self._size < self.capacity:
+            self._size += 1
+        self.seq += 1
+
+    def extend(self, xs, ys):
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        n = len(xs)
+        if n == 0:
+            return
+        self.seq += n
+        cap = self.capacity
+        if n > cap:
+            xs = xs[-cap:]
+            ys = ys[-cap:]
+            n = cap
+
+        i = self._head
+        first = min(n, cap - i)
+        rest = n - first
+        for buf, vals in ((self._x, xs), (self._y, ys)):
+            buf[i:i + first] = vals[:first]
+            buf[i + cap:i + cap + first] = vals[:first]
+            if rest:
+                buf[:rest] = vals[first:]
+                buf[cap:cap + rest] = vals[first:]
+
+        self._head = (i + n) % cap
+        self._size = min(self._size + n, cap)
+
+    def view(self):
+        # Oldest-to-newest (x, y) views into the ring, valid until the next write
+        end = self._head + self.capacity
+        start = end - self._size
+        return self._x[start:end], self._y[start:end]
+
+    def clear(self):
+        self._head = 0
+        self._size = 0
+
+    def resize(self, capacity):
+        x, y = self.view()
+        x, y = x.copy(), y.copy()
+        self.capacity = max(1, int(capacity))
+        self._x = np.zeros(2 * self.capacity, dtype=np.float64)
+        self._y = np.zeros(2 * self.capacity, dtype=np.float64)
+        self.clear()
+        seq = self.seq
+        self.extend(x, y)
+        self.seq = seq
+
+    def drop_before(self, x):
+        # Evict every sample older than x in one step. x values must be non-decreasing.
+        xs, _ = self.view()
+        n = int(np.searchsorted(xs, x, side="left"))
+        if n:
+            self._size -= n
+        return n
+
+
+class TimeWindowBuffer(RingBuffer):
+    # RingBuffer that only keeps the last `window` seconds (x is the timestamp).
+    # Old samples are dropped in bulk by moving the start index, and memory stays
+    # bounded by `capacity` even if the sample rate outgrows the window.
+    def __init__(self, window=10.0, capacity=100000):
+        super().__init__(capacity)
+        self.window = window
+
+    def extend(self, xs, ys):
+        super().extend(xs, ys)
+        if self._size:
+            self.drop_before(self._x[self._head + self.capacity - 1] - self.window)
+
+    def append(self, x, y):
+        super().append(x, y)
+        self.drop_before(x - self.window)
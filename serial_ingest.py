@@ -0,0 +1,30 @@
+class LineFramer:
+    # Splits a byte stream into complete lines.
+    # Whatever follows the last newline is kept and prepended to the next chunk,
+    # so lines split across reads are never lost.
+    def __init__(self, max_line=4096):
+        self.max_line = max_line
+        self._pending = bytearray()
+
+    def feed(self, data):
+        # Returns the complete lines in `data` as one bytes block (without the last newline)
+        self._pending += data
+        end = self._pending.rfind(b"\n")
+        if end < 0:
+            if len(self._pending) > self.max_line:
+                # No newline in sight, the stream is not line based: drop it
+                self._pending.clear()
+            return b""
+        block = bytes(self._pending[:end])
+        del self._pending[:end + 1]
+        return block
+
+    def feed_lines(self, data):
+        block = self.feed(data)
+        if not block:
+            return []
+        return block.decode("utf-8", errors="replace").splitlines()
+
+    def reset(self):
+        self._pending.clear()
+
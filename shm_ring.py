@@ -0,0 +1,147 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Shared-memory ring of timestamped samples, written by the acquisition process
+# and read by the GUI process without copying through pipes or queues.
+# Layout: header (int64 x 16) | channel name table | records
+#   header[0] = records written so far (write sequence), published after a write
+#   header[1] = number of registered channels
+#   header[2] = size of the name table (max_channels), read by attaching processes
+#   header[3] = end of the write in progress, claimed before its records are touched
+#   header[4:] = the writer's pipeline counters (COUNTERS)
+# A reader validates its copy against the claimed end (seqlock style): records a
+# write may have overwritten while they were copied are dropped as overruns.
+RECORD = np.dtype([("t", "<f8"), ("channel", "<i8"), ("value", "<f8")])
+HEADER_BYTES = 128
+MAX_CHANNELS = 4096
+NAME_BYTES = 256
+COUNTERS = ("bytes_read", "lines", "parse_failures", "errors", "samples", "ring_rejected")
+
+
+class SharedSampleRing:
+    def __init__(self, capacity=1 << 20, name=None, max_channels=MAX_CHANNELS):
+        # name=None creates a new block; otherwise attach to an existing one (same
+        # capacity), whose name table size is read from its header
+        self.capacity = int(capacity)
+        self.owner = name is None
+        if self.owner:
+            self.max_channels = int(max_channels)
+            size = HEADER_BYTES + self.max_channels * NAME_BYTES + self.capacity * RECORD.itemsize
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+
+        buf = self.shm.buf
+        self._header = np.ndarray((HEADER_BYTES // 8,), dtype=np.int64, buffer=buf)
+        if self.owner:
+            self._header[:] = 0
+            self._header[2] = self.max_channels
+        else:
+            self.max_channels = int(self._header[2])
+        records_offset = HEADER_BYTES + self.max_channels * NAME_BYTES
+        self._names = np.ndarray((self.max_channels, NAME_BYTES), dtype=np.uint8, buffer=buf, offset=HEADER_BYTES)
+        self._records = np.ndarray((self.capacity,), dtype=RECORD, buffer=buf, offset=records_offset)
+
+        self._ids = {}  # writer side: label -> channel id
+        self._labels = []  # reader side: channel id -> label
+        self.read_seq = 0
+        self.overruns = 0  # samples the reader lost because the writer lapped it
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    # --- Writer side ---
+    def channel_id(self, label):
+        channel = self._ids.get(label)
+        if channel is None:
+            channel = int(self._header[1])
+            if channel >= self.max_channels:
+                raise ValueError(f"more than {self.max_channels} channels for the shared ring")
+            raw = label.encode("utf-8")
+            if len(raw) >= NAME_BYTES:
+                # Cut long names down, keeping them unique with the channel id
+                suffix = f"~{channel}".encode()
+                raw = raw[:NAME_BYTES - 1 - len(suffix)] + suffix
+            self._names[channel, :] = 0
+            self._names[channel, :len(raw)] = np.frombuffer(raw, dtype=np.uint8)
+            self._header[1] = channel + 1  # publish the name after it is written
+            self._ids[label] = channel
+        return channel
+
+    def write(self, label, t, values):
+        values = np.asarray(values, dtype=np.float64)
+        n = len(values)
+        if not n:
+            return
+        t = np.broadcast_to(np.asarray(t, dtype=np.float64), values.shape)
+        channel = self.channel_id(label)
+        cap = self.capacity
+        seq = int(self._header[0])
+        if n > cap:
+            # Only the newest `cap` fit; the sequence still counts the others, so
+            # readers see them as overruns
+            seq += n - cap
+            t, values, n = t[-cap:], values[-cap:], cap
+
+        self._header[3] = seq + n  # claim before overwriting anything
+        start = seq % cap
+        first = min(n, cap - start)
+        for lo, hi, src in ((start, start + first, slice(0, first)), (0, n - first, slice(first, n))):
+            if hi > lo:
+                records = self._records[lo:hi]
+                records["t"] = t[src]
+                records["channel"] = channel
+                records["value"] = values[src]
+        self._header[0] = seq + n  # publish after the records are in place
+
+    def publish_counters(self, counters):
+        self._header[4:4 + len(COUNTERS)] = [counters.get(name, 0) for name in COUNTERS]
+
+    # --- Reader side ---
+    def counters(self):
+        return dict(zip(COUNTERS, self._header[4:4 + len(COUNTERS)].tolist()))
+
+    def backlog(self):
+        # Records written but not read yet
+        return int(self._header[0]) - self.read_seq
+
+    def label(self, channel):
+        while channel >= len(self._labels) and len(self._labels) < int(self._header[1]):
+            raw = self._names[len(self._labels)].tobytes().split(b"\0", 1)[0]
+            self._labels.append(raw.decode("utf-8", errors="replace"))
+        return self._labels[channel] if channel < len(self._labels) else f"ch{channel}"
+
+    def read(self):
+        # Copy every record written since the last read (oldest first)
+        cap = self.capacity
+        end = int(self._header[0])
+        start = self.read_seq
+        if end - start > cap:
+            self.overruns += end - start - cap
+            start = end - cap
+        if end == start:
+            return self._records[:0].copy()
+
+        lo = start % cap
+        hi = lo + (end - start)
+        if hi <= cap:
+            out = self._records[lo:hi].copy()
+        else:
+            out = np.concatenate((self._records[lo:], self._records[:hi - cap]))
+
+        # Records a write (finished or not) may have overwritten while we were copying
+        # are torn: drop them
+        lapped = int(self._header[3]) - cap - start
+        if lapped > 0:
+            self.overruns += lapped
+            out = out[lapped:]
+        self.read_seq = end
+        return out
+
+    def close(self):
+        self._header = self._names = self._records = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
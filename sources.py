@@ -0,0 +1,334 @@
+import os
+import select
+import selectors
+import socket
+from time import perf_counter, sleep
+
+import numpy as np
+import serial
+
+from binary_protocol import encode_register, encode_samples
+from recorder import raw_index_path
+
+# Byte sources the acquisition engine reads from. A source has
+#   read_chunk(block=True) -> bytes   whatever is available (b"" if nothing)
+#   is_open                           False once the source is closed or exhausted
+#   close()
+#   name                              used to namespace channels when several sources are read
+#   fileno()                          optional, lets the reader select() on the source
+
+
+class SerialSource:
+    # Live serial port: reads whatever the port has buffered in one call
+    def __init__(self, ser, chunk_size=65536):
+        self.ser = ser
+        self.chunk_size = chunk_size
+
+    @property
+    def is_open(self):
+        return self.ser.is_open
+
+    @property
+    def name(self):
+        return os.path.basename(self.ser.port or "serial")
+
+    def fileno(self):
+        # POSIX ports can be selected on; elsewhere the port is polled
+        fileno = getattr(self.ser, "fileno", None)
+        return fileno() if fileno is not None else None
+
+    @property
+    def byte_time(self):
+        # Seconds per byte on the wire: start bit, data bits, parity, stop bits
+        ser = self.ser
+        bits = 1 + ser.bytesize + (ser.parity != serial.PARITY_NONE) + ser.stopbits
+        return bits / ser.baudrate
+
+    def read_chunk(self, block=True):
+        waiting = self.ser.in_waiting
+        if not waiting:
+            if not block:
+                return b""
+            # Wait (up to the port timeout) for the first byte, then take the rest
+            first = self.ser.read(1)
+            if not first:
+                return b""
+            waiting = self.ser.in_waiting
+            return first + self.ser.read(min(waiting, self.chunk_size)) if waiting else first
+        return self.ser.read(min(waiting, self.chunk_size))
+
+    def close(self):
+        if self.ser.is_open:
+            self.ser.close()
+
+
+class _PacedSource:
+    # Shared pacing for replay and synthetic sources: `speed` 1.0 is real time,
+    # N is N times faster, None/0 is as fast as possible
+    def __init__(self, speed=1.0, chunk_size=65536, poll=0.01):
+        self.speed = speed
+        self.chunk_size = chunk_size
+        self.poll = poll
+        self.is_open = True
+        self._start = None
+
+    def elapsed(self):
+        # Source time that should have been delivered by now
+        if self._start is None:
+            self._start = perf_counter()
+        return (perf_counter() - self._start) * self.speed
+
+    def wait(self, block):
+        if block:
+            sleep(self.poll)
+
+    def close(self):
+        self.is_open = False
+
+
+class ReplaySource(_PacedSource):
+    # Replays a recording folder (raw.bin/raw.offsets from recorder.Recorder, with its
+    # original timing) or a plain text capture (paced at `line_rate` lines/s)
+    def __init__(self, path, speed=1.0, line_rate=1000, loop=False, raw_name="raw", **kwargs):
+        super().__init__(speed, **kwargs)
+        self.name = os.path.basename(os.path.normpath(path))
+        self.loop = loop
+        self._pos = 0
+        if os.path.isdir(path):
+            # Multi-port recordings have one raw-<port>.bin per port; pass raw_name to pick one
+            self._data = np.fromfile(os.path.join(path, raw_name + ".bin"), dtype=np.uint8).tobytes()
+            index = np.fromfile(raw_index_path(path, raw_name), dtype=[("t", "<f8"), ("offset", "<i8")])
+            self._times = index["t"] - index["t"][0] if len(index) else np.empty(0)
+            # Chunk i is complete once chunk i + 1 starts
+            self._ends = np.append(index["offset"][1:], len(self._data))
+        else:
+            with open(path, "rb") as f:
+                self._data = f.read()
+            ends = np.flatnonzero(np.frombuffer(self._data, dtype=np.uint8) == ord("\n")) + 1
+            if self._data and not self._data.endswith(b"\n"):
+                ends = np.append(ends, len(self._data))  # the last line has no newline
+            self._ends = ends
+            self._times = np.arange(len(ends)) / float(line_rate)
+
+    def read_chunk(self, block=True):
+        if not self.is_open:
+            return b""
+        if self._pos >= len(self._data):
+            if not self.loop:
+                self.close()
+                return b""
+            self._pos = 0
+            self._start = None
+
+        if self.speed:
+            due = int(np.searchsorted(self._times, self.elapsed(), side="right"))
+            end = int(self._ends[due - 1]) if due else 0
+        else:
+            end = len(self._data)
+        end = min(end, self._pos + self.chunk_size)
+        if end <= self._pos:
+            self.wait(block)
+            return b""
+        chunk = self._data[self._pos:end]
+        self._pos = end
+        return chunk
+
+
+class SyntheticSource(_PacedSource):
+    # Generated ">chN: value" traffic (or binary frames) for testing and profiling
+    # without hardware: `channels` sine waves plus noise, `rate` samples/s per channel
+    def __init__(self, channels=4, rate=1000, speed=1.0, protocol="text", period=4096, **kwargs):
+        super().__init__(speed, **kwargs)
+        self.name = "synthetic"
+        self.channels = channels
+        self.rate = rate
+        self.protocol = protocol
+        self._sent = 0  # samples per channel delivered so far
+        self._header = b""
+        self._block, self._offsets = self._make_block(period)
+
+    def _make_block(self, period):
+        # One period of every channel, pre-encoded; the stream cycles through it
+        rng = np.random.default_rng(0)
+        n = np.arange(period)
+        values = [
+            100 * np.sin(2 * np.pi * (c + 1) * n / period) + rng.normal(0, 5, period)
+            for c in range(self.channels)
+        ]
+        if self.protocol == "binary":
+            self._header = b"".join(encode_register(c, f"ch{c}") for c in range(self.channels))
+            samples = [
+                b"".join(encode_samples(c, values[c][i:i + 1]) for c in range(self.channels))
+                for i in range(period)
+            ]
+        else:
+            samples = [
+                b"".join(b">ch%d: %.3f\n" % (c, values[c][i]) for c in range(self.channels))
+                for i in range(period)
+            ]
+        offsets = np.cumsum([0] + [len(s) for s in samples])
+        return b"".join(samples), offsets
+
+    def read_chunk(self, block=True):
+        if not self.is_open:
+            return b""
+        if self.speed and self.rate:
+            due = int(self.elapsed() * self.rate) - self._sent
+        else:
+            due = self.chunk_size  # as fast as possible: limited by chunk size below
+        period = len(self._offsets) - 1
+        start = self._sent % period
+        count = min(due, period - start)
+        # Keep chunks around chunk_size bytes
+        per_sample = self._offsets[-1] / period
+        count = min(count, max(1, int(self.chunk_size / per_sample)))
+        if count <= 0:
+            self.wait(block)
+            return b""
+        chunk = self._block[self._offsets[start]:self._offsets[start + count]]
+        if self._sent == 0:
+            chunk = self._header + chunk
+        self._sent += count
+        return chunk
+
+
+class UdpSource:
+    # Listens for datagrams, each one a batch of complete ">label: value" lines (or
+    # binary frames). Any number of senders can share the port; their samples merge.
+    def __init__(self, host="0.0.0.0", port=4210, chunk_size=1 << 20, timeout=0.1):
+        self.name = f"udp{port}"
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # A large receive buffer rides out bursts while the reader is busy parsing
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 << 20)
+        self.sock.bind((host, port))
+        self.sock.setblocking(False)
+        self.is_open = True
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def read_chunk(self, block=True):
+        if block:
+            select.select([self.sock], [], [], self.timeout)
+        datagrams = []
+        size = 0
+        while size < self.chunk_size:
+            try:
+                data = self.sock.recv(65535)
+            except (BlockingIOError, InterruptedError):
+                break
+            if data[-1:] not in (b"\n", b"\0"):
+                data += b"\n"  # the datagram ends the line
+            datagrams.append(data)
+            size += len(data)
+        return b"".join(datagrams)
+
+    def close(self):
+        self.is_open = False
+        self.sock.close()
+
+
+class TcpSource:
+    # Accepts any number of TCP clients, each sending a ">label: value" line stream.
+    # One selector serves the listener and every connection (no thread per client);
+    # partial lines are kept per connection, so only whole lines are returned. Like
+    # LineFramer, more than `max_line` bytes without a newline are dropped.
+    def __init__(self, host="0.0.0.0", port=4210, chunk_size=1 << 20, timeout=0.1, max_line=4096):
+        self.name = f"tcp{port}"
+        self.chunk_size = chunk_size
+        self.max_line = max_line
+        self.timeout = timeout
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind((host, port))
+        self.listener.listen()
+        self.listener.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.listener, selectors.EVENT_READ, None)
+        self._pending = {}  # connection -> bytes after its last newline
+        self.is_open = True
+
+    @property
+    def clients(self):
+        return len(self._pending)
+
+    def fileno(self):
+        # epoll/kqueue selectors are themselves selectable; select() based ones are polled
+        fileno = getattr(self._selector, "fileno", None)
+        return fileno() if fileno is not None else None
+
+    def read_chunk(self, block=True):
+        out = []
+        for key, _ in self._selector.select(self.timeout if block else 0):
+            conn = key.fileobj
+            if conn is self.listener:
+                self._accept()
+                continue
+            try:
+                data = conn.recv(self.chunk_size)
+            except (BlockingIOError, InterruptedError):
+                continue
+            except OSError:
+                data = b""
+            if not data:
+                self._drop(conn)
+                continue
+            data = self._pending[conn] + data
+            end = data.rfind(b"\n") + 1
+            # No newline in sight, the client is not sending lines: drop what it sent
+            self._pending[conn] = data[end:] if len(data) - end <= self.max_line else b""
+            if end:
+                out.append(data[:end])
+        return b"".join(out)
+
+    def _accept(self):
+        try:
+            conn, _ = self.listener.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        conn.setblocking(False)
+        self._pending[conn] = b""
+        self._selector.register(conn, selectors.EVENT_READ, None)
+
+    def _drop(self, conn):
+        self._selector.unregister(conn)
+        del self._pending[conn]
+        conn.close()
+
+    def close(self):
+        self.is_open = False
+        for conn in list(self._pending):
+            self._drop(conn)
+        self._selector.close()
+        self.listener.close()
+
+
+def _address(spec):
+    # "udp://host:port" -> (host, port); an empty host listens on every interface
+    host, _, port = spec.split("://", 1)[1].rpartition(":")
+    return host or "0.0.0.0", int(port)
+
+
+def open_source(spec, baudrate=115200, timeout=0.1, speed=1.0, **serial_kwargs):
+    # "synthetic" or "synthetic:CHANNELS:RATE" -> SyntheticSource
+    # "udp://[host]:port", "tcp://[host]:port"   -> UdpSource / TcpSource (listening)
+    # a recording folder or capture file         -> ReplaySource
+    # anything else is a serial port name        -> SerialSource
+    # `speed` paces replay and synthetic sources (None: as fast as possible)
+    if spec.startswith("udp://"):
+        return UdpSource(*_address(spec), timeout=timeout)
+    if spec.startswith("tcp://"):
+        return TcpSource(*_address(spec), timeout=timeout)
+    if spec.startswith("synthetic"):
+        parts = spec.split(":")
+        channels = int(parts[1]) if len(parts) > 1 else 4
+        rate = float(parts[2]) if len(parts) > 2 else 1000
+        return SyntheticSource(channels, rate, speed=speed)
+    if os.path.isdir(spec) or os.path.isfile(spec):  # device nodes are not regular files
+        return ReplaySource(spec, speed=speed)
+    ser = serial.Serial(port=spec, baudrate=baudrate, timeout=timeout, **serial_kwargs)
+    ser.reset_input_buffer()
+    return SerialSource(ser)
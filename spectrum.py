@@ -0,0 +1,138 @@
+from collections import deque
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# A step longer than GAP_PERIODS mean sample periods is a gap (device idle,
+# reconnect, samples the consumer skipped): no segment spans one and the rate is
+# measured afresh after it. Bursty arrival (many samples per read) stays well below.
+GAP_PERIODS = 1000
+# The rate is the mean sample spacing over the last RATE_SEGMENTS * nperseg samples
+RATE_SEGMENTS = 16
+
+
+class StreamingSpectrum:
+    # Incremental Welch / STFT of one channel. feed() only transforms the segments
+    # completed by the new samples (a batch of them in one rfft call) and keeps the
+    # remainder for the next call; the window and its scaling are computed once, and
+    # numpy's FFT caches its plan per segment length. Segment power spectra go into a
+    # ring of `history` rows, which is the waterfall; welch() averages the newest
+    # `averages` rows. fs defaults to the rate measured from the recent timestamps.
+    def __init__(self, nperseg=1024, overlap=0.5, averages=16, history=256, fs=None):
+        self.nperseg = int(nperseg)
+        self.overlap = overlap
+        self.step = max(1, int(self.nperseg * (1 - overlap)))
+        self.averages = averages
+        self.history = history
+        self.fs = fs
+        self.window = np.hanning(self.nperseg)
+        self._window_power = float((self.window ** 2).sum())
+        self.bins = self.nperseg // 2 + 1
+        self._rows = np.zeros((2 * history, self.bins), dtype=np.float32)
+        self._head = 0
+        self._size = 0
+        self.segments = 0  # segments transformed so far, the data version
+        self._carry = np.empty(0)
+        self._marks = deque()  # (sample count, time) at the end of each fed block since the last gap
+        self._count = 0
+        self._t_last = None
+        self._period = None  # last measured, kept across gaps until measured again
+
+    def feed(self, t, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return 0
+        t = np.asarray(t, dtype=np.float64)
+        count = start = 0
+        for gap in self._gaps(t):
+            count += self._feed(t[start:gap], values[start:gap])
+            self.restart()
+            start = gap
+        return count + self._feed(t[start:], values[start:])
+
+    def _gaps(self, t):
+        # Indices of the samples of t that come after a gap, once the rate has been
+        # measured over a segment's worth of samples (a single burst says little)
+        if not self._marks or self._marks[-1][0] - self._marks[0][0] < self.nperseg:
+            return []
+        steps = np.diff(t, prepend=t[0] if self._t_last is None else self._t_last)
+        return np.flatnonzero(steps > GAP_PERIODS * self._period).tolist()
+
+    def _feed(self, t, values):
+        if not len(values):
+            return 0
+        self._measure(t)
+        data = np.concatenate((self._carry, values)) if len(self._carry) else values
+        count = (len(data) - self.nperseg) // self.step + 1 if len(data) >= self.nperseg else 0
+        if count:
+            frames = sliding_window_view(data, self.nperseg)[::self.step][:count]
+            frames = (frames - frames.mean(axis=1, keepdims=True)) * self.window
+            spectrum = np.fft.rfft(frames, axis=1)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+            power[:, 1:(self.nperseg + 1) // 2] *= 2  # one-sided: fold in the negative frequencies
+            self._write(power)
+        self._carry = data[count * self.step:].copy()
+        return count
+
+    def _write(self, rows):
+        # Mirrored ring like RingBuffer: the newest `history` rows are one slice
+        rows = rows[-self.history:]
+        cap = self.history
+        for row in rows:
+            i = self._head
+            self._rows[i] = self._rows[i + cap] = row
+            self._head = (i + 1) % cap
+        self._size = min(self._size + len(rows), cap)
+        self.segments += len(rows)
+
+    def _measure(self, t):
+        # Mean spacing between the oldest mark within the rate window and t[-1]
+        marks = self._marks
+        if not marks:
+            marks.append((0, t[0]))
+        self._count += len(t)
+        marks.append((self._count - 1, t[-1]))
+        while len(marks) > 2 and marks[-1][0] - marks[1][0] >= RATE_SEGMENTS * self.nperseg:
+            marks.popleft()
+        (n0, t0), (n1, t1) = marks[0], marks[-1]
+        if n1 > n0 and t1 > t0:
+            self._period = (t1 - t0) / (n1 - n0)
+        self._t_last = t[-1]
+
+    def restart(self):
+        # After a gap in the data: drop the partial segment and measure the rate
+        # afresh (the last rate stands until then), keep the history
+        self._carry = np.empty(0)
+        self._marks.clear()
+        self._count = 0
+        self._t_last = None
+
+    def clear(self):
+        self.__init__(self.nperseg, self.overlap, self.averages, self.history, self.fs)
+
+    @property
+    def rate(self):
+        if self.fs:
+            return self.fs
+        return 1.0 / self._period if self._period else 1.0
+
+    @property
+    def freqs(self):
+        return np.fft.rfftfreq(self.nperseg, 1 / self.rate)
+
+    def _scale(self):
+        # |X|^2 -> power spectral density (units^2/Hz)
+        return 1.0 / (self.rate * self._window_power)
+
+    def waterfall(self):
+        # (segments, bins) PSD rows, oldest first
+        end = self._head + self.history
+        return self._rows[end - self._size:end] * self._scale()
+
+    def welch(self):
+        # (freqs, PSD) averaged over the newest `averages` segments
+        end = self._head + self.history
+        rows = self._rows[end - min(self._size, self.averages):end]
+        if not len(rows):
+            return self.freqs, np.zeros(self.bins)
+        return self.freqs, rows.mean(axis=0, dtype=np.float64) * self._scale()
@@ -0,0 +1,97 @@
+import time
+
+import numpy as np
+import pytest
+
+from acquisition import AcquisitionEngine
+
+
+def test_window_returns_only_new_samples():
+    engine = AcquisitionEngine(capacity=100)
+    engine.add_samples("a", np.arange(5.0), np.arange(5.0))
+    seq, t, values = engine.window("a")
+    np.testing.assert_array_equal(values, np.arange(5.0))
+    engine.add_samples("a", [5.0, 6.0], [5.0, 6.0])
+    seq, t, values = engine.window("a", seq)
+    np.testing.assert_array_equal(t, [5.0, 6.0])
+    assert engine.window("a", seq)[1].size == 0
+    assert engine.updated({"a": seq}) == []
+
+
+def test_newest_skips_without_counting_losses():
+    engine = AcquisitionEngine(capacity=100)
+    engine.add_samples("a", np.arange(1.0, 51.0), np.arange(50.0))
+    _, t, _ = engine.window("a", 1, newest=10)
+    np.testing.assert_array_equal(t, np.arange(41.0, 51.0))
+    assert not engine.stats.counters.get("dropped")
+
+
+def test_overwritten_samples_are_dropped_and_alarmed():
+    engine = AcquisitionEngine(capacity=10)
+    engine.add_samples("a", [0.0], [0.0])
+    seq, _, _ = engine.window("a")
+    engine.add_samples("a", np.arange(1.0, 26.0), np.arange(25.0))
+    _, t, _ = engine.window("a", seq)
+    np.testing.assert_array_equal(t, np.arange(16.0, 26.0))
+    assert engine.stats.counters["dropped"] == 15
+    assert "display" in engine.stats.alarms
+
+
+def test_time_window_evictions_are_not_drops():
+    engine = AcquisitionEngine(capacity=1000, window=1.0)
+    engine.add_samples("a", [0.0], [0.0])
+    seq, _, _ = engine.window("a")
+    engine.add_samples("a", np.arange(1, 301) / 100, np.zeros(300))
+    _, t, _ = engine.window("a", seq)
+    assert t[0] >= 2.0
+    assert not engine.stats.counters.get("dropped")
+    assert engine.stats.counters["evicted"] == 300 - len(t)
+    assert "display" not in engine.stats.alarms
+
+
+def test_max_window_policies():
+    for policy, counter in (("drop_oldest", "dropped"), ("decimate", "decimated")):
+        engine = AcquisitionEngine(capacity=1000)
+        engine.overload_policy = policy
+        engine.max_window = 100
+        engine.add_samples("a", np.arange(1000.0), np.arange(1000.0))
+        _, t, _ = engine.window("a")
+        assert len(t) <= 100
+        assert t[-1] == 999.0
+        assert engine.stats.counters[counter] == 1000 - len(t)
+
+
+def test_windows_reads_several_channels():
+    engine = AcquisitionEngine(capacity=100)
+    engine.add_samples("a", [0.0, 1.0], [1.0, 2.0])
+    engine.add_samples("b", [0.0], [3.0])
+    result = engine.windows({"a": 0, "b": 0, "c": 0}, newest={"a": 1})
+    np.testing.assert_array_equal(result["a"][2], [2.0])
+    np.testing.assert_array_equal(result["b"][2], [3.0])
+    assert result["c"][0] == 0 and result["c"][2].size == 0
+
+
+def test_history_is_fed_at_ingest():
+    engine = AcquisitionEngine(capacity=10)
+    engine.keep_history = True
+    engine.add_samples("a", np.arange(1000.0), np.arange(1000.0))
+    x, _ = engine.history("a")
+    assert x[0] == 0.0 and x[-1] == 999.0
+
+
+@pytest.mark.parametrize("use_process", [False, True])
+def test_stamp_settings_apply_in_thread_and_process_mode(tmp_path, use_process):
+    capture = tmp_path / "stamped.txt"
+    capture.write_bytes(b"".join(b">a:%d:%d\n" % (i, i) for i in range(200)))
+    engine = AcquisitionEngine(use_process=use_process)
+    engine.protocol = "text"
+    engine.stamp_mode = "seq"
+    engine.stamp_scale = 0.5
+    engine.open(str(capture), speed=None)
+    deadline = time.monotonic() + 20
+    while engine.seq("a") < 200 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    engine.stop()
+    _, t, values = engine.window("a")
+    np.testing.assert_array_equal(values, np.arange(200.0))
+    np.testing.assert_allclose(np.diff(t), 0.5)
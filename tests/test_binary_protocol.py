@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+from binary_protocol import (
+    FRAME_DATA_I16, BinaryFramer, cobs_decode, cobs_encode, detect_protocol,
+    encode_frame, encode_register, encode_samples,
+)
+
+
+@pytest.mark.parametrize("data", [
+    b"",
+    b"\x00",
+    b"\x00\x00",
+    b"\x11\x22\x00\x33",
+    bytes(range(1, 254)),  # 253-byte zero-free run
+    bytes(range(1, 255)),  # 254: exactly one 0xFF block
+    bytes(range(1, 256)),  # 255: one 0xFF block and one byte
+    bytes(range(1, 255)) + b"\x00" + bytes(range(1, 255)),
+    bytes(range(256)) * 4,
+])
+def test_cobs_round_trip(data):
+    encoded = cobs_encode(data)
+    assert b"\x00" not in encoded
+    assert cobs_decode(encoded) == data
+
+
+def test_cobs_254_byte_run_uses_one_ff_block():
+    encoded = cobs_encode(b"\x01" * 254)
+    assert encoded[0] == 0xFF
+    assert encoded[255:] == b"\x01"
+
+
+def test_cobs_decode_rejects_truncated_frame():
+    with pytest.raises(ValueError):
+        cobs_decode(b"\x05\x01\x02")
+    with pytest.raises(ValueError):
+        cobs_decode(b"\x02\x01\x00\x01")
+
+
+def test_framer_decodes_registered_samples_split_across_feeds():
+    data = encode_register(3, "temp") + encode_samples(3, [1.5, -2.0, 3.25], crc=True)
+    framer = BinaryFramer()
+    batch = {}
+    for i in range(len(data)):
+        batch.update(framer.feed(data[i:i + 1]))
+    np.testing.assert_array_equal(batch["temp"], [1.5, -2.0, 3.25])
+    assert framer.bad_frames == 0
+
+
+def test_framer_int16_and_unregistered_channel():
+    framer = BinaryFramer()
+    batch = framer.feed(encode_samples(7, [1, -32768, 32767], frame_type=FRAME_DATA_I16))
+    np.testing.assert_array_equal(batch["ch7"], [1, -32768, 32767])
+
+
+def test_framer_counts_crc_mismatch():
+    frame = bytearray(cobs_decode(encode_samples(1, [1.0, 2.0], crc=True)[:-1]))
+    frame[3] ^= 0x10
+    framer = BinaryFramer()
+    batch = framer.feed(cobs_encode(bytes(frame)) + b"\x00" + encode_samples(1, [4.0], crc=True))
+    np.testing.assert_array_equal(batch["ch1"], [4.0])
+    assert framer.bad_frames == 1
+
+
+def test_framer_counts_corrupt_and_odd_sized_frames():
+    framer = BinaryFramer()
+    framer.feed(b"\x07\x01\x00")  # COBS code past the end
+    framer.feed(encode_frame(0x02, 1, b"\x00\x00\x80"))  # 3 bytes of float32
+    framer.feed(encode_frame(0x0F, 1, b"\x00\x00\x80\x3f"))  # unknown type
+    assert framer.bad_frames == 3
+
+
+def test_framer_drops_overlong_frame_without_delimiter():
+    framer = BinaryFramer(max_frame=16)
+    assert framer.feed(b"\x01" * 32) == {}
+    assert framer.bad_frames == 1
+    np.testing.assert_array_equal(framer.feed(encode_samples(1, [2.0]))["ch1"], [2.0])
+
+
+def test_stamped_frames_with_period():
+    framer = BinaryFramer(stamp_mode="time")
+    stamps = {}
+    framer.feed(encode_samples(1, [1, 2, 3, 4], stamp=1000, period=2.5), stamps)
+    np.testing.assert_array_equal(stamps["ch1"], [1000, 1002.5, 1005, 1007.5])
+    assert framer.unspaced_frames == 0
+
+
+def test_stamped_frames_without_period():
+    stamps = {}
+    BinaryFramer(stamp_mode="seq").feed(encode_samples(1, [1, 2, 3], stamp=10), stamps)
+    np.testing.assert_array_equal(stamps["ch1"], [10, 11, 12])
+
+    framer = BinaryFramer(stamp_mode="time")
+    stamps = {}
+    framer.feed(encode_samples(1, [1, 2, 3], stamp=10) + encode_samples(1, [4], stamp=20), stamps)
+    np.testing.assert_array_equal(stamps["ch1"], [10, np.nan, np.nan, 20])
+    assert framer.unspaced_frames == 1
+
+
+def test_unstamped_frames_get_nan_stamps_next_to_stamped_ones():
+    stamps = {}
+    batch = BinaryFramer().feed(encode_samples(1, [1.0]) + encode_samples(1, [2.0], stamp=5), stamps)
+    np.testing.assert_array_equal(batch["ch1"], [1.0, 2.0])
+    np.testing.assert_array_equal(stamps["ch1"], [np.nan, 5])
+
+
+def test_empty_stamped_frame_is_bad_and_keeps_the_others():
+    framer = BinaryFramer()
+    stamps = {}
+    data = (encode_samples(1, [1.0, 2.0], stamp=5, period=1.0) + encode_samples(1, [], stamp=7)
+            + encode_samples(1, [], stamp=8, period=1.0) + encode_samples(1, [3.0], stamp=9))
+    batch = framer.feed(data, stamps)
+    np.testing.assert_array_equal(batch["ch1"], [1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(stamps["ch1"], [5, 6, 9])
+    assert framer.bad_frames == 2
+
+
+def test_detect_protocol():
+    assert detect_protocol(encode_samples(1, [1.0])) == "binary"
+    assert detect_protocol(b">a: 1\n") == "text"
+    assert detect_protocol(b">a") == "auto"
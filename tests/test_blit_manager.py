@@ -0,0 +1,33 @@
+import pytest
+
+matplotlib = pytest.importorskip("matplotlib")
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+
+from blit_manager import BlitManager, snap_xlim, snap_ylim
+
+
+def test_invalidations_within_a_frame_cost_one_full_draw():
+    # Agg draws synchronously in draw_idle(): invalidate() itself must not draw
+    fig, ax = plt.subplots()
+    blit = BlitManager(fig.canvas)
+    draws = []
+    fig.canvas.mpl_connect("draw_event", lambda event: draws.append(event))
+    for i in range(16):
+        line, = ax.plot([0, 1], [i, i])
+        blit.add_artist(line)
+        blit.invalidate()
+    blit.set_limits(ax, (0, 2), (0, 20))
+    assert not draws
+    blit.update()
+    assert len(draws) == 1
+    blit.update()  # blits over the cached background
+    assert len(draws) == 1
+    assert not blit.set_limits(ax, (0, 2), (0, 20))
+    plt.close(fig)
+
+
+def test_snapped_limits():
+    assert snap_xlim(12.3, window=10, step=1.0) == (3.0, 13.0)
+    assert snap_ylim(-1, 1, (-5, 5)) == (-1.5, 1.5)
+    assert snap_ylim(-1, 1, (-1.5, 1.5)) == (-1.5, 1.5)
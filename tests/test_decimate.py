@@ -0,0 +1,53 @@
+import numpy as np
+
+from decimate import Decimator, minmax_decimate, visible_slice
+
+
+def test_visible_slice_keeps_one_neighbour_per_side():
+    x = np.arange(10.0)
+    assert visible_slice(x, 3.5, 6.5) == (3, 8)
+    assert visible_slice(x, -5, 100) == (0, 10)
+
+
+def test_short_series_is_returned_as_is():
+    x = np.arange(10.0)
+    y = x * 2
+    dx, dy = minmax_decimate(x, y, pixels=5)
+    assert dx is x and dy is y
+
+
+def test_every_bucket_keeps_its_extremes_in_time_order():
+    rng = np.random.default_rng(1)
+    x = np.arange(10007.0)
+    y = rng.normal(size=len(x))
+    y[5000] = 50.0  # a spike must survive
+    y[123] = -50.0
+    dx, dy = minmax_decimate(x, y, pixels=100)
+    assert len(dx) <= 2 * 101
+    assert np.all(np.diff(dx) >= 0)
+    np.testing.assert_array_equal(dy, y[dx.astype(int)])  # real samples at real positions
+    assert dy.max() == 50.0 and dy.min() == -50.0
+    size = -(-len(x) // 100)
+    for i in range(0, len(x), size):
+        bucket = y[i:i + size]
+        assert bucket.max() in dy and bucket.min() in dy
+
+
+def test_decimation_is_limited_to_the_view():
+    x = np.arange(1000.0)
+    dx, _ = minmax_decimate(x, x, 100, 200, pixels=1000)
+    assert dx[0] == 99 and dx[-1] == 201
+
+
+def test_decimator_reuses_the_result_until_an_input_changes():
+    x = np.arange(5000.0)
+    decimator = Decimator()
+    first = decimator.decimate(x, x, 0, 5000, 100, version=1)
+    assert decimator.changed
+    assert decimator.decimate(x, x, 0, 5000, 100, version=1) is first
+    assert not decimator.changed
+    decimator.decimate(x, x, 0, 5000, 100, version=2)
+    assert decimator.changed
+    decimator.invalidate()
+    decimator.decimate(x, x, 0, 5000, 100, version=2)
+    assert decimator.changed
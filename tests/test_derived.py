@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+
+import derived
+from derived import DerivedChannel
+
+
+def direct_form_1(b, a, x):
+    # Reference: y[n] = (sum b[k] x[n-k] - sum a[k] y[n-k]) / a[0]
+    y = np.zeros(len(x))
+    for n in range(len(x)):
+        acc = sum(b[k] * x[n - k] for k in range(len(b)) if n >= k)
+        acc -= sum(a[k] * y[n - k] for k in range(1, len(a)) if n >= k)
+        y[n] = acc / a[0]
+    return y
+
+
+def feed_in_batches(channel, label, t, values, sizes):
+    out_t, out_v, i = [], [], 0
+    for n in sizes:
+        result = channel.feed(label, t[i:i + n], values[i:i + n])
+        if result is not None:
+            out_t.append(result[0])
+            out_v.append(result[1])
+        i += n
+    return np.concatenate(out_t), np.concatenate(out_v)
+
+
+SIZES = [1, 63, 64, 65, 200, 7, 600]
+
+
+@pytest.fixture(params=["lfilter", "numpy"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        monkeypatch.setattr(derived, "lfilter", None)
+    elif derived.lfilter is None:
+        pytest.skip("scipy is not installed")
+
+
+@pytest.mark.parametrize("b, a", [
+    ([0.2, 0.3, 0.5], [1.0]),
+    ([0.1, 0.2, 0.1], [1.0, -1.2, 0.5]),
+    ([1.0], [1.0, -0.999]),
+    ([2.0, 1.0], [2.0, -1.0]),
+    ([0.5, 0.1, 0.0, 0.3], [1.0, -0.3, 0.2, -0.1, 0.05]),
+])
+def test_filters_match_reference_for_any_batching(backend, b, a):
+    rng = np.random.default_rng(0)
+    t = np.arange(1000) / 100
+    x = rng.standard_normal(1000)
+    channel = DerivedChannel("y", f"iir(x, {b}, {a})")
+    _, y = feed_in_batches(channel, "x", t, x, SIZES)
+    np.testing.assert_allclose(y, direct_form_1(b, a, x), atol=1e-9)
+
+
+def test_fir_shorthand(backend):
+    x = np.arange(10.0)
+    _, y = feed_in_batches(DerivedChannel("y", "fir(x, [0.5, 0.5])"), "x", x, x, [3, 3, 4])
+    np.testing.assert_allclose(y, np.concatenate(([0.0], (x[1:] + x[:-1]) / 2)))
+
+
+def test_lowpass_passes_dc_and_blocks_high_frequencies(backend):
+    t = np.arange(20000) / 1000
+    channel = DerivedChannel("y", "lowpass(x, 10)")
+    _, dc = feed_in_batches(channel, "x", t[:10000], np.ones(10000), [100] * 100)
+    assert abs(dc[-1] - 1.0) < 1e-6
+    _, high = feed_in_batches(channel, "x", t[10000:], np.sin(2 * np.pi * 400 * t[10000:]), [100] * 100)
+    assert np.abs(high[-1000:]).max() < 0.01
+
+
+def test_rolling_mean_and_rms_match_reference():
+    rng = np.random.default_rng(2)
+    t = np.cumsum(rng.uniform(0.001, 0.02, 3000))
+    x = rng.standard_normal(3000)
+    _, mean = feed_in_batches(DerivedChannel("m", "mean(x, 0.5)"), "x", t, x, [300] * 10)
+    _, rms = feed_in_batches(DerivedChannel("r", "rms(x, 0.5)"), "x", t, x, [1000, 1, 1999])
+    for i in range(0, 3000, 97):
+        window = x[(t > t[i] - 0.5) & (t <= t[i])]
+        assert abs(mean[i] - window.mean()) < 1e-9
+        assert abs(rms[i] - np.sqrt(np.mean(window ** 2))) < 1e-9
+
+
+def test_second_input_is_interpolated_at_the_first_inputs_times():
+    channel = DerivedChannel("d", "a - b")
+    assert channel.inputs == ["a", "b"]
+    assert channel.feed("a", np.array([1.0, 1.2]), np.array([10.0, 20.0])) is None
+    t, values = channel.feed("b", np.array([0.0, 3.0]), np.array([0.0, 3.0]))
+    np.testing.assert_array_equal(t, [1.0, 1.2])
+    np.testing.assert_allclose(values, [9.0, 18.8])
+
+
+def test_samples_waiting_past_max_lag_for_a_silent_input_are_dropped():
+    channel = DerivedChannel("d", "a - b")
+    assert channel.feed("a", np.array([1.0, 2.0]), np.array([10.0, 20.0])) is None
+    t, values = channel.feed("b", np.array([0.0, 3.0]), np.array([0.0, 3.0]))
+    np.testing.assert_array_equal(t, [2.0])
+    np.testing.assert_allclose(values, [18.0])
+
+
+def test_label_that_is_not_a_python_name():
+    channel = DerivedChannel("s", 'abs(ch("COM3/a")) * 2')
+    t, values = channel.feed("COM3/a", np.array([0.0, 1.0]), np.array([-1.0, 2.0]))
+    np.testing.assert_array_equal(values, [2.0, 4.0])
+
+
+@pytest.mark.parametrize("expression", [
+    "1 + 2", "x +", "y", "foo(x)", "iir(x, [1], [0])", "x.real", "lowpass(x, a)",
+])
+def test_invalid_expressions_raise_value_error(expression):
+    with pytest.raises(ValueError):
+        DerivedChannel("y", expression)
@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+
+import export
+from acquisition import AcquisitionEngine
+from export import Exporter, buffer_reader, format_of
+from recorder import Recorder, RecordingReader
+
+DATA = {
+    "a": (np.array([0.0, 1.0, 2.0, 3.0]), np.array([0.5, 1.5, 2.5, 3.5])),
+    "b": (np.array([1.0, 2.5]), np.array([10.0, 20.0])),
+}
+
+
+def read(label, t0=None, t1=None):
+    t, values = DATA[label]
+    start = 0 if t0 is None else int(np.searchsorted(t, t0))
+    stop = len(t) if t1 is None else int(np.searchsorted(t, t1))
+    return t[start:stop], values[start:stop]
+
+
+@pytest.fixture(params=[None, 1])
+def chunk(request, monkeypatch):
+    # The default chunk and one sample per chunk export the same rows
+    if request.param:
+        monkeypatch.setattr(export, "CHUNK", request.param)
+
+
+def test_long_csv(tmp_path, chunk):
+    path = tmp_path / "out.csv"
+    exporter = Exporter(read, ["a", "b"], str(path))
+    exporter.run()
+    lines = path.read_text().splitlines()
+    assert lines[0] == "label,t,value"
+    assert lines[1:] == ["a,0.0,0.5", "a,1.0,1.5", "a,2.0,2.5", "a,3.0,3.5", "b,1.0,10.0", "b,2.5,20.0"]
+    assert exporter.done == exporter.total == 6
+    assert exporter.progress == 1.0
+
+
+def test_long_npz_in_a_time_range(tmp_path, chunk):
+    path = tmp_path / "out.npz"
+    Exporter(read, ["a", "b"], str(path), t0=1.0, t1=3.0).run()
+    with np.load(path) as archive:
+        np.testing.assert_array_equal(archive["a.t"], [1.0, 2.0])
+        np.testing.assert_array_equal(archive["a.v"], [1.5, 2.5])
+        np.testing.assert_array_equal(archive["b.v"], [10.0, 20.0])
+
+
+def test_wide_table_fills_gaps(tmp_path, chunk):
+    path = tmp_path / "out.npz"
+    Exporter(read, ["a", "b"], str(path), wide=True).run()
+    with np.load(path) as archive:
+        assert list(archive["columns"]) == ["t", "a", "b"]
+        table = archive["table"]
+    np.testing.assert_array_equal(table[:, 0], [0.0, 1.0, 2.0, 2.5, 3.0])
+    np.testing.assert_array_equal(table[:, 2], [np.nan, 10.0, np.nan, 20.0, np.nan])
+
+    path = tmp_path / "out.csv"
+    Exporter(read, ["a", "b"], str(path), wide=True, fill="previous").run()
+    lines = path.read_text().splitlines()
+    assert lines == ["t,a,b", "0.0,0.5,nan", "1.0,1.5,10.0", "2.0,2.5,10.0", "2.5,2.5,20.0", "3.0,3.5,20.0"]
+
+
+def test_cancelled_export_leaves_no_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(export, "CHUNK", 1)
+    path = tmp_path / "out.csv"
+    exporter = Exporter(read, ["a", "b"], str(path))
+    exporter.cancel()
+    exporter.run()
+    assert exporter.finished
+    assert not path.exists()
+
+
+def test_failures_are_reported_not_raised(tmp_path):
+    exporter = Exporter(read, ["missing"], str(tmp_path / "out.csv")).start()
+    exporter.join(5)
+    assert exporter.finished
+    assert exporter.error.startswith("KeyError")
+
+
+def test_format_is_checked_up_front():
+    assert format_of("x.CSV") == "csv"
+    with pytest.raises(ValueError):
+        format_of("x.xlsx")
+    if export.pyarrow is None:
+        with pytest.raises(ValueError):
+            format_of("x.parquet")
+
+
+def test_buffers_and_recordings_export_alike(tmp_path):
+    engine = AcquisitionEngine(capacity=100)
+    recorder = Recorder(str(tmp_path / "rec"))
+    for label, (t, values) in DATA.items():
+        engine.add_samples(label, t, values)
+        recorder.write(label, t, values)
+    recorder.stop()
+    Exporter(buffer_reader(engine), ["a", "b", "c"], str(tmp_path / "buffers.csv")).run()
+    Exporter(RecordingReader(str(tmp_path / "rec")).read, ["a", "b"], str(tmp_path / "rec.csv")).run()
+    assert (tmp_path / "buffers.csv").read_text() == (tmp_path / "rec.csv").read_text()
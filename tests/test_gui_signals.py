@@ -0,0 +1,43 @@
+import os
+
+import numpy as np
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+pytest.importorskip("PyQt6")
+pytest.importorskip("pyqtgraph")
+pytest.importorskip("serial")
+
+from acquisition import AcquisitionEngine
+from GUI_pyqt6 import MAX_SIGNAL_BACKLOG, SerialReader
+
+
+def make_reader(policy):
+    engine = AcquisitionEngine()
+    engine.overload_policy = policy
+    reader = SerialReader(engine)
+    received = []
+    reader.new_data.connect(lambda label, t, value: received.append(value))
+    return reader, received
+
+
+def test_drop_oldest_skips_the_backlog_and_delivers_the_new_batch_whole():
+    reader, received = make_reader("drop_oldest")
+    backlog = MAX_SIGNAL_BACKLOG + 5000
+    reader.emit_samples("a", np.zeros(backlog), np.zeros(backlog))
+    reader.emit_samples("a", np.arange(1000.0), np.arange(1000.0))
+    assert received[backlog:] == list(range(1000))
+    assert reader.stale_until == backlog
+    counters = reader.engine.stats.counters
+    assert counters.get("signal_dropped") == backlog
+    assert not counters.get("signal_decimated")
+
+
+def test_decimate_thins_new_batches_by_the_backlog():
+    reader, received = make_reader("decimate")
+    backlog = MAX_SIGNAL_BACKLOG + 5000
+    reader.emit_samples("a", np.zeros(backlog), np.zeros(backlog))
+    reader.emit_samples("a", np.arange(1000.0), np.arange(1000.0))
+    assert received[backlog:] == list(range(0, 1000, 2))
+    assert reader.stale_until == 0
+    assert reader.engine.stats.counters.get("signal_decimated") == 500
@@ -0,0 +1,91 @@
+import numpy as np
+
+from minmax_pyramid import STAGE, MinMaxPyramid
+
+
+def test_small_series_is_returned_exactly():
+    pyramid = MinMaxPyramid(capacity=64)
+    t = np.arange(50.0)
+    pyramid.extend(t, np.sin(t))
+    x, y = pyramid.query()
+    np.testing.assert_array_equal(x, t)
+    np.testing.assert_array_equal(y, np.sin(t))
+
+
+def test_levels_grow_with_log_of_samples():
+    pyramid = MinMaxPyramid(capacity=16)
+    pyramid.extend(np.arange(16.0), np.zeros(16))
+    assert len(pyramid.levels) == 1
+    pyramid.extend([16.0], [0.0])
+    assert len(pyramid.levels) == 2
+    pyramid.extend(np.arange(17.0, 1024.0), np.zeros(1007))
+    # Each level halves the one below and holds 16 buckets: 1024 samples need 7
+    assert len(pyramid.levels) == 7
+    assert pyramid.levels[-1].dropped == 0
+    assert len(pyramid) == 1024
+
+
+def test_query_keeps_extrema_of_the_whole_session():
+    rng = np.random.default_rng(0)
+    pyramid = MinMaxPyramid(capacity=32)
+    t = np.arange(20000.0)
+    values = rng.standard_normal(len(t))
+    values[1234], values[17000] = 50.0, -60.0
+    for i in range(0, len(t), 999):
+        pyramid.extend(t[i:i + 999], values[i:i + 999])
+    x, y = pyramid.query(pixels=50)
+    assert len(x) <= 4 * 50
+    assert y.max() == 50.0 and x[y.argmax()] == 1234
+    assert y.min() == -60.0 and x[y.argmin()] == 17000
+    assert np.all(np.diff(x) >= 0)
+
+
+def test_query_range_matches_reference_extrema():
+    rng = np.random.default_rng(1)
+    pyramid = MinMaxPyramid(capacity=4096)
+    t = np.arange(100000.0) / 100
+    values = np.cumsum(rng.standard_normal(len(t)))
+    pyramid.extend(t, values)
+    x, y = pyramid.query(200.0, 300.0, pixels=100)
+    # Every point is a real sample, and the view's extrema are among them (the edge
+    # buckets may reach a little past the range)
+    np.testing.assert_array_equal(y, values[np.rint(x * 100).astype(int)])
+    inside = (t >= 200.0) & (t <= 300.0)
+    assert y.max() >= values[inside].max()
+    assert y.min() <= values[inside].min()
+    assert x.min() >= 195.0 and x.max() <= 305.0
+
+
+def test_appended_samples_are_staged_and_still_queried():
+    pyramid = MinMaxPyramid(capacity=4096)
+    for i in range(STAGE + 10):
+        pyramid.append(float(i), float(i))
+    assert len(pyramid) == STAGE + 10
+    x, _ = pyramid.query()
+    assert x[-1] == STAGE + 9
+
+
+def test_source_serves_zooms_finer_than_memory():
+    t = np.arange(100000.0)
+    values = np.sin(t / 100)
+    calls = []
+
+    def source(t0, t1):
+        calls.append((t0, t1))
+        inside = (t >= t0) & (t < t1)
+        return t[inside], values[inside]
+
+    pyramid = MinMaxPyramid(capacity=256, source=source)
+    pyramid.extend(t, values)
+    x, y = pyramid.query(1000.0, 1100.0, pixels=1000)
+    assert calls
+    np.testing.assert_array_equal(x, t[1000:1100])
+    np.testing.assert_array_equal(y, values[1000:1100])
+
+
+def test_clear():
+    pyramid = MinMaxPyramid(capacity=8)
+    pyramid.extend(np.arange(100.0), np.arange(100.0))
+    pyramid.clear()
+    assert len(pyramid) == 0
+    assert len(pyramid.query()[0]) == 0
@@ -0,0 +1,97 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from recorder import INDEX_EVERY, RAW_INDEX, Recorder, RecordingReader, raw_index_path
+
+
+def record(directory, chunks, raw=(), **kwargs):
+    recorder = Recorder(str(directory), raw=bool(raw), **kwargs)
+    for label, t, values in chunks:
+        recorder.write(label, t, values)
+    for t, data in raw:
+        recorder.write_raw(t, data)
+    recorder.stop()
+    return recorder
+
+
+def test_round_trip_and_seek(tmp_path):
+    t = np.arange(3 * INDEX_EVERY + 100) * 0.001
+    values = np.sin(t)
+    chunks = [("a", t[i:i + 1000], values[i:i + 1000]) for i in range(0, len(t), 1000)]
+    recorder = record(tmp_path, chunks + [("b", [0.5], [7.0])])
+    assert recorder.samples_written == len(t) + 1
+
+    reader = RecordingReader(str(tmp_path))
+    assert sorted(reader.labels()) == ["a", "b"]
+    assert reader.count("a") == len(t)
+    x, y = reader.read("a")
+    np.testing.assert_array_equal(x, t)
+    np.testing.assert_array_equal(y, values)
+    for t0, t1 in [(0.0, 0.001), (4.0, 9.0), (4.0955, 4.1), (-1.0, 100.0), (12.3, 12.4)]:
+        x, _ = reader.read("a", t0, t1)
+        np.testing.assert_array_equal(x, t[(t >= t0) & (t < t1)])
+
+
+def test_appending_to_an_existing_recording(tmp_path):
+    record(tmp_path, [("a", [0.0, 1.0], [1.0, 2.0])])
+    record(tmp_path, [("a", [2.0], [3.0])])
+    np.testing.assert_array_equal(RecordingReader(str(tmp_path)).read("a")[1], [1.0, 2.0, 3.0])
+
+
+def test_stems_do_not_collide(tmp_path):
+    labels = ["a/b", "a_b", "A_B", "a:b"]
+    record(tmp_path, [(label, [float(i)], [float(i)]) for i, label in enumerate(labels)])
+    with open(tmp_path / "channels.json") as f:
+        stems = json.load(f)
+    assert len({stem.lower() for stem in stems}) == len(labels)
+    reader = RecordingReader(str(tmp_path))
+    for i, label in enumerate(labels):
+        np.testing.assert_array_equal(reader.read(label)[1], [float(i)])
+
+
+def test_channel_named_raw_does_not_clash_with_raw_log(tmp_path):
+    record(tmp_path, [("raw", np.arange(5000.0), np.arange(5000.0))], raw=[(0.0, b"abc"), (1.0, b"def")])
+    assert os.path.exists(tmp_path / ("raw" + RAW_INDEX))
+    reader = RecordingReader(str(tmp_path))
+    assert bytes(reader.read_raw()) == b"abcdef"
+    assert bytes(reader.read_raw(0.5)) == b"def"
+    assert reader.read("raw", 4096.0)[0][0] == 4096.0
+
+
+def test_raw_index_of_older_recordings(tmp_path):
+    (tmp_path / "raw.idx").write_bytes(b"")
+    assert raw_index_path(str(tmp_path)) == os.path.join(str(tmp_path), "raw.idx")
+    (tmp_path / ("raw" + RAW_INDEX)).write_bytes(b"")
+    assert raw_index_path(str(tmp_path)) == os.path.join(str(tmp_path), "raw" + RAW_INDEX)
+
+
+def test_full_queue_drops_and_counts(tmp_path):
+    recorder = Recorder(str(tmp_path), max_bytes=16 * 100)
+    recorder._reserve(16 * 100)  # the writer thread is busy with a block this size
+    assert not recorder.write("a", np.zeros(10), np.zeros(10))
+    assert recorder.dropped_samples == 10
+    recorder.stop()
+
+
+def test_channel_table_is_written_before_stop(tmp_path):
+    recorder = Recorder(str(tmp_path))
+    recorder.write("a", [0.0], [1.0])
+    while recorder.samples_written < 1:
+        time.sleep(0.01)
+    # As if the process died here: the folder must still open
+    assert RecordingReader(str(tmp_path)).labels() == ["a"]
+    recorder.stop()
+
+
+def test_reader_tolerates_columns_cut_short_by_a_crash(tmp_path):
+    record(tmp_path, [("a", np.arange(10.0), np.arange(10.0))])
+    with open(tmp_path / "a.t.f64", "ab") as f:
+        f.write(b"\x00" * 8 + b"\x01\x02\x03")  # one more timestamp and a partial one
+    with open(tmp_path / "a.v.f64", "r+b") as f:
+        f.truncate(8 * 9 + 5)
+    t, values = RecordingReader(str(tmp_path)).read("a")
+    np.testing.assert_array_equal(t, np.arange(9.0))
+    np.testing.assert_array_equal(values, np.arange(9.0))
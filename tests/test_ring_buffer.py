@@ -0,0 +1,70 @@
+import numpy as np
+
+from ring_buffer import RingBuffer, TimeWindowBuffer
+
+
+def test_append_wraps_around_and_keeps_newest():
+    ring = RingBuffer(4)
+    for i in range(10):
+        ring.append(i, 10 * i)
+    x, y = ring.view()
+    np.testing.assert_array_equal(x, [6, 7, 8, 9])
+    np.testing.assert_array_equal(y, [60, 70, 80, 90])
+    assert len(ring) == 4
+    assert ring.seq == 10
+
+
+def test_extend_across_the_wrap_point_matches_appends():
+    extended, appended = RingBuffer(7), RingBuffer(7)
+    start = 0
+    for n in (3, 5, 1, 7, 2, 6):
+        xs = np.arange(start, start + n, dtype=float)
+        extended.extend(xs, -xs)
+        for v in xs:
+            appended.append(v, -v)
+        start += n
+        np.testing.assert_array_equal(extended.view()[0], appended.view()[0])
+        np.testing.assert_array_equal(extended.view()[1], appended.view()[1])
+    assert extended.seq == appended.seq == start
+
+
+def test_extend_longer_than_capacity():
+    ring = RingBuffer(5)
+    ring.extend(range(3), range(3))
+    ring.extend(range(100), range(100))
+    np.testing.assert_array_equal(ring.view()[0], [95, 96, 97, 98, 99])
+    assert ring.seq == 103
+
+
+def test_view_is_contiguous_slice_of_the_mirror():
+    ring = RingBuffer(4)
+    ring.extend(range(6), range(6))
+    x, _ = ring.view()
+    assert np.shares_memory(x, ring._x)
+    assert x.flags["C_CONTIGUOUS"]
+
+
+def test_resize_keeps_newest_and_seq():
+    ring = RingBuffer(8)
+    ring.extend(range(12), range(12))
+    ring.resize(3)
+    np.testing.assert_array_equal(ring.view()[0], [9, 10, 11])
+    assert ring.seq == 12
+    ring.resize(6)
+    ring.extend([12, 13], [12, 13])
+    np.testing.assert_array_equal(ring.view()[0], [9, 10, 11, 12, 13])
+
+
+def test_drop_before():
+    ring = RingBuffer(6)
+    ring.extend(range(10), range(10))
+    assert ring.drop_before(7) == 3
+    np.testing.assert_array_equal(ring.view()[0], [7, 8, 9])
+
+
+def test_time_window_buffer_keeps_window():
+    ring = TimeWindowBuffer(window=2.0, capacity=100)
+    ring.extend(np.arange(0, 5, 0.5), np.zeros(10))
+    np.testing.assert_array_equal(ring.view()[0], [2.5, 3.0, 3.5, 4.0, 4.5])
+    ring.append(6.0, 1.0)
+    np.testing.assert_array_equal(ring.view()[0], [4.0, 4.5, 6.0])
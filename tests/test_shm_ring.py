@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from shm_ring import NAME_BYTES, SharedSampleRing
+
+
+@pytest.fixture
+def ring():
+    ring = SharedSampleRing(capacity=8, max_channels=4)
+    yield ring
+    ring.close()
+
+
+def test_round_trip_through_a_second_handle(ring):
+    reader = SharedSampleRing(capacity=8, name=ring.name)
+    try:
+        assert reader.max_channels == 4
+        ring.write("a", [1.0, 2.0], [10.0, 20.0])
+        ring.write("b", 3.0, [30.0])
+        records = reader.read()
+        assert [reader.label(c) for c in records["channel"]] == ["a", "a", "b"]
+        np.testing.assert_array_equal(records["t"], [1, 2, 3])
+        np.testing.assert_array_equal(records["value"], [10, 20, 30])
+        assert len(reader.read()) == 0
+    finally:
+        reader.close()
+
+
+def test_wraparound_without_overrun(ring):
+    ring.write("a", np.arange(6.0), np.arange(6.0))
+    ring.read()
+    ring.write("a", np.arange(6.0, 12.0), np.arange(6.0, 12.0))
+    np.testing.assert_array_equal(ring.read()["value"], np.arange(6.0, 12.0))
+    assert ring.overruns == 0
+
+
+def test_overrun_keeps_newest_and_counts_the_rest(ring):
+    ring.write("a", np.arange(5.0), np.arange(5.0))
+    ring.write("a", np.arange(5.0, 20.0), np.arange(5.0, 20.0))
+    np.testing.assert_array_equal(ring.read()["value"], np.arange(12.0, 20.0))
+    assert ring.overruns == 12
+
+
+def test_name_table_full(ring):
+    for i in range(4):
+        ring.write(f"c{i}", 0.0, [0.0])
+    with pytest.raises(ValueError):
+        ring.write("c4", 0.0, [0.0])
+    ring.write("c0", 1.0, [1.0])  # known channels still write
+
+
+def test_long_names_are_cut_and_kept_unique(ring):
+    first, second = "x" * 300 + "1", "x" * 300 + "2"
+    ring.write(first, 0.0, [1.0])
+    ring.write(second, 0.0, [2.0])
+    labels = [ring.label(c) for c in ring.read()["channel"]]
+    assert labels[0] != labels[1]
+    assert all(len(label.encode()) < NAME_BYTES for label in labels)
+    assert labels[1].endswith("~1")
+
+
+def test_counters(ring):
+    ring.publish_counters({"samples": 5, "ring_rejected": 2})
+    counters = ring.counters()
+    assert counters["samples"] == 5
+    assert counters["ring_rejected"] == 2
+    assert counters["lines"] == 0
+
+
+def test_read_drops_records_an_unpublished_write_may_have_torn(ring):
+    ring.write("a", np.arange(6.0), np.arange(6.0))
+    # A writer that claimed 5 more records but has not published them yet: they
+    # land on the 3 oldest unread records
+    ring._header[3] = 11
+    np.testing.assert_array_equal(ring.read()["value"], [3.0, 4.0, 5.0])
+    assert ring.overruns == 3
+    assert ring.backlog() == 0
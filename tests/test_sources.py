@@ -0,0 +1,135 @@
+import socket
+from time import sleep
+
+import numpy as np
+
+from recorder import Recorder
+from sources import ReplaySource, SyntheticSource, TcpSource, UdpSource, open_source
+from text_parser import parse_block
+
+
+def drain(source, limit=1000):
+    chunks = []
+    for _ in range(limit):
+        if not source.is_open:
+            break
+        chunks.append(source.read_chunk(block=False))
+    return b"".join(chunks)
+
+
+def test_replay_of_a_capture_delivers_a_last_line_without_newline(tmp_path):
+    path = tmp_path / "capture.txt"
+    path.write_bytes(b">a: 1\n>a: 2\n>a: 3")
+    source = ReplaySource(str(path), speed=None)
+    assert drain(source) == path.read_bytes()
+    assert not source.is_open
+    # Paced replay must reach the end (and close) too
+    source = ReplaySource(str(path), speed=1000, line_rate=1000)
+    data = b""
+    for _ in range(100):
+        data += source.read_chunk()
+        if not source.is_open:
+            break
+    assert data == path.read_bytes()
+    assert not source.is_open
+
+
+def test_replay_loops(tmp_path):
+    path = tmp_path / "capture.txt"
+    path.write_bytes(b">a: 1\n>a: 2")
+    source = ReplaySource(str(path), speed=None, loop=True, chunk_size=6)
+    data = b"".join(source.read_chunk(block=False) for _ in range(4))
+    assert data == b">a: 1\n>a: 2>a: 1\n>a: 2"
+    assert source.is_open
+
+
+def test_replay_of_a_recording_keeps_its_timing(tmp_path):
+    recorder = Recorder(str(tmp_path), raw=True)
+    recorder.write_raw(10.0, b">a: 1\n")
+    recorder.write_raw(10.2, b">a: 2\n")
+    recorder.stop()
+    source = open_source(str(tmp_path), speed=1.0)
+    assert isinstance(source, ReplaySource)
+    assert source.read_chunk() == b">a: 1\n"
+    assert source.read_chunk(block=False) == b""  # the second chunk is not due yet
+    sleep(0.25)
+    assert source.read_chunk() == b">a: 2\n"
+
+
+def test_synthetic_source_sends_every_channel():
+    source = open_source("synthetic:3:1000", speed=None)
+    assert isinstance(source, SyntheticSource)
+    parsed = parse_block(source.read_chunk())
+    assert sorted(parsed) == ["ch0", "ch1", "ch2"]
+    lengths = {len(values) for values in parsed.values()}
+    assert len(lengths) == 1 and lengths.pop() > 0
+    source.close()
+    assert source.read_chunk() == b""
+
+
+def test_synthetic_source_is_paced():
+    source = SyntheticSource(channels=1, rate=100, speed=1.0)
+    source.read_chunk()
+    sleep(0.1)
+    values = parse_block(source.read_chunk())["ch0"]
+    assert 1 <= len(values) <= 30
+    assert np.all(np.abs(values) < 150)
+
+
+def read_until(source, size, tries=50):
+    data = b""
+    while len(data) < size and tries:
+        data += source.read_chunk()
+        tries -= 1
+    return data
+
+
+def test_udp_source_merges_senders_and_ends_each_datagram():
+    source = UdpSource("127.0.0.1", 0)
+    address = source.sock.getsockname()
+    senders = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(2)]
+    try:
+        senders[0].sendto(b">a: 1\n>a: 2\n", address)
+        senders[1].sendto(b">b: 3", address)
+        data = read_until(source, 18)
+        assert sorted(data.splitlines()) == [b">a: 1", b">a: 2", b">b: 3"]
+        assert data.endswith(b"\n")
+    finally:
+        for sender in senders:
+            sender.close()
+        source.close()
+
+
+def test_tcp_source_returns_whole_lines_per_client():
+    source = TcpSource("127.0.0.1", 0)
+    address = source.listener.getsockname()
+    first = socket.create_connection(address)
+    second = socket.create_connection(address)
+    try:
+        first.sendall(b">a: 1\n>a: ")
+        second.sendall(b">b: 2\n")
+        assert sorted(read_until(source, 12).splitlines()) == [b">a: 1", b">b: 2"]
+        assert source.clients == 2
+        first.sendall(b"3\n")  # completes the line held back for this client only
+        assert read_until(source, 6) == b">a: 3\n"
+        second.close()
+        for _ in range(10):
+            source.read_chunk(block=False)
+        assert source.clients == 1
+    finally:
+        first.close()
+        second.close()
+        source.close()
+
+
+def test_tcp_source_drops_an_overlong_partial_line():
+    source = TcpSource("127.0.0.1", 0, max_line=16)
+    client = socket.create_connection(source.listener.getsockname())
+    try:
+        client.sendall(b"x" * 64)
+        read_until(source, 1, tries=5)
+        client.sendall(b"y\n>a: 1\n")
+        assert read_until(source, 7) == b"y\n>a: 1\n"  # not the 64 bytes before
+    finally:
+        client.close()
+        source.close()
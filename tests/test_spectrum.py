@@ -0,0 +1,75 @@
+import numpy as np
+
+from spectrum import StreamingSpectrum
+
+
+def tone(t, hz):
+    return np.sin(2 * np.pi * hz * t)
+
+
+def peak(spectrum):
+    freqs, psd = spectrum.welch()
+    return freqs[psd.argmax()]
+
+
+def test_tone_lands_in_its_bin_for_any_batching():
+    t = np.arange(8192) / 1000
+    for sizes in ([8192], [1] * 100 + [8092], [333] * 24 + [200]):
+        spectrum = StreamingSpectrum(1024)
+        start = 0
+        for n in sizes:
+            spectrum.feed(t[start:start + n], tone(t[start:start + n], 100))
+            start += n
+        assert abs(spectrum.rate - 1000) < 1e-6
+        assert abs(peak(spectrum) - 100) < 1000 / 1024
+        assert spectrum.segments == (8192 - 1024) // 512 + 1
+
+
+def test_psd_scaling_matches_the_signal_power():
+    rng = np.random.default_rng(0)
+    t = np.arange(1 << 16) / 500
+    spectrum = StreamingSpectrum(512, averages=1000, history=1000)
+    spectrum.feed(t, rng.standard_normal(len(t)))
+    freqs, psd = spectrum.welch()
+    # Integrated PSD of unit-variance white noise is its variance
+    assert abs(psd.sum() * (freqs[1] - freqs[0]) - 1.0) < 0.05
+
+
+def test_gap_in_the_timestamps_does_not_skew_the_rate():
+    t = np.arange(4096) / 1000
+    spectrum = StreamingSpectrum(1024)
+    spectrum.feed(t, tone(t, 100))
+    later = t + 60 + t[-1]
+    spectrum.feed(later, tone(later, 100))
+    assert abs(spectrum.rate - 1000) < 1e-6
+    assert abs(peak(spectrum) - 100) < 1000 / 1024
+
+
+def test_rate_follows_a_changed_device_rate_after_restart():
+    spectrum = StreamingSpectrum(256)
+    t = np.arange(2048) / 1000
+    spectrum.feed(t, np.zeros(len(t)))
+    spectrum.restart()
+    t = 10 + np.arange(2048) / 250
+    spectrum.feed(t, np.zeros(len(t)))
+    assert abs(spectrum.rate - 250) < 1e-6
+
+
+def test_bursty_arrival_is_not_a_gap():
+    # 256-sample frames spread over 11 ms, one every 256 ms: 1 kHz on average
+    t = np.concatenate([k * 0.256 + np.linspace(0, 0.011, 256) for k in range(64)])
+    values = tone(np.arange(len(t)) / 1000, 100)
+    spectrum = StreamingSpectrum(1024)
+    for k in range(64):
+        spectrum.feed(t[k * 256:(k + 1) * 256], values[k * 256:(k + 1) * 256])
+    assert abs(spectrum.rate - 1000) < 30
+    assert spectrum.segments == (len(t) - 1024) // 512 + 1
+
+
+def test_fixed_fs_and_waterfall_rows():
+    spectrum = StreamingSpectrum(256, history=4, fs=2000)
+    spectrum.feed(np.zeros(256 * 10), np.ones(256 * 10))
+    assert spectrum.rate == 2000
+    assert spectrum.waterfall().shape == (4, 129)
+    spectrum.clear()
+    assert spectrum.segments == 0 and len(spectrum.waterfall()) == 0
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from text_parser import parse_block
+
+
+def test_single_and_multiple_channels():
+    result = parse_block(b">a: 1\n>b: -2.5\n>a: .5\n>b: 1e-3\n")
+    np.testing.assert_array_equal(result["a"], [1.0, 0.5])
+    np.testing.assert_array_equal(result["b"], [-2.5, 0.001])
+
+
+def test_many_channels_keep_arrival_order():
+    block = b"".join(b">c%d: %d\n" % (i % 40, i) for i in range(400))
+    result = parse_block(block)
+    assert len(result) == 40
+    np.testing.assert_array_equal(result["c7"], np.arange(7, 400, 40))
+
+
+def test_missing_space_and_stray_lines():
+    result = parse_block(b"boot ok\n>a:1\n>a: 2\nDEBUG x=3\n")
+    np.testing.assert_array_equal(result["a"], [1.0, 2.0])
+
+
+def test_stamped_lines():
+    stamps = {}
+    result = parse_block(b">a:100:1.5\n>a:101:2.5\n>b: 3\n", stamps)
+    np.testing.assert_array_equal(result["a"], [1.5, 2.5])
+    np.testing.assert_array_equal(stamps["a"], [100, 101])
+    assert "b" not in stamps
+
+
+@pytest.mark.parametrize("bad, expected", [
+    (b"nan", []), (b"NaN", []), (b"inf", []), (b"-inf", []), (b"1_0", [1.0]),
+])
+def test_values_outside_number_parse_like_the_regex(bad, expected):
+    # float() takes these but NUMBER does not: the same line gives the same samples
+    # on its own and next to clean lines, and never a non-finite value
+    alone = parse_block(b">a: " + bad + b"\n")
+    mixed = parse_block(b">a: 1\n>a: " + bad + b"\n>a: 2\n")
+    np.testing.assert_array_equal(alone.get("a", []), expected)
+    np.testing.assert_array_equal(mixed["a"], [1.0] + expected + [2.0])
+
+
+def test_empty_and_garbage():
+    assert parse_block(b"") == {}
+    assert parse_block(b"hello world\n") == {}
@@ -0,0 +1,44 @@
+import numpy as np
+
+from timestamps import ArrivalClock, DeviceClock
+
+
+def test_arrival_clock_spreads_a_chunk_over_the_interval():
+    clock = ArrivalClock()
+    assert clock.span(10.0, 100) == 0.0
+    span = clock.span(10.5, 100)
+    assert span == 0.5
+    t = ArrivalClock.spread(10.5, span, 5)
+    np.testing.assert_allclose(t, [10.1, 10.2, 10.3, 10.4, 10.5])
+
+
+def test_arrival_clock_caps_the_span_at_the_wire_time():
+    clock = ArrivalClock(byte_time=1e-4)
+    assert clock.span(0.0, 50) == 50 * 1e-4
+    assert clock.span(100.0, 10) == 10 * 1e-4  # the link was idle
+
+
+def test_device_clock_keeps_device_spacing():
+    clock = DeviceClock("time", scale=1e-3)
+    host = clock.to_host("a", np.array([0.0, 10.0, 20.0]), arrival=100.05)
+    np.testing.assert_allclose(np.diff(host), [0.01, 0.01])
+    # A faster transfer later re-anchors without moving time backwards
+    later = clock.to_host("a", np.array([30.0, 40.0]), arrival=100.06)
+    assert later[0] >= host[-1]
+    np.testing.assert_allclose(later, [100.06 - 0.01, 100.06])
+
+
+def test_device_clock_seq_mode_counts_missing_samples():
+    clock = DeviceClock("seq", scale=0.002)
+    host = clock.to_host("a", np.array([1.0, 2.0, 3.0]), arrival=5.0)
+    np.testing.assert_allclose(np.diff(host), [0.002, 0.002])
+    clock.to_host("a", np.array([7.0, 8.0]), arrival=5.02)
+    assert clock.gaps == 1
+    assert clock.missing == 3
+
+
+def test_device_clock_reanchors_when_stamps_go_back():
+    clock = DeviceClock("time")
+    clock.to_host("a", np.array([1000.0, 1001.0]), arrival=50.0)
+    host = clock.to_host("a", np.array([0.0, 1.0]), arrival=60.0)
+    np.testing.assert_allclose(host, [59.999, 60.0])
@@ -0,0 +1,36 @@
+import numpy as np
+
+from window_extrema import SlidingExtrema
+
+
+def test_matches_a_rescan_of_the_window():
+    rng = np.random.default_rng(2)
+    extrema = SlidingExtrema()
+    blocks = []
+    for i in range(200):
+        values = rng.normal(size=rng.integers(1, 20)) * (1 + i % 7)
+        blocks.append((float(i), values))
+        extrema.push(float(i), values)
+        extrema.evict_before(i - 30)
+        window = np.concatenate([v for t, v in blocks if t >= i - 30])
+        assert extrema.min == window.min()
+        assert extrema.max == window.max()
+
+
+def test_skips_values_that_are_not_finite():
+    extrema = SlidingExtrema()
+    extrema.push(0.0, [np.nan, np.inf])
+    assert not extrema
+    extrema.push(1.0, [np.nan, 2.0, -np.inf, -1.0])
+    assert (extrema.min, extrema.max) == (-1.0, 2.0)
+
+
+def test_empty_after_eviction_and_clear():
+    extrema = SlidingExtrema()
+    assert extrema.min is None and extrema.max is None
+    extrema.push(1.0, [3.0])
+    extrema.evict_before(2.0)
+    assert not extrema
+    extrema.push(3.0, [4.0])
+    extrema.clear()
+    assert extrema.min is None
@@ -0,0 +1,95 @@
+import re
+
+import numpy as np
+
+# ">label: value" samples. Values may use a sign, a leading dot (.5) and an exponent (1e-3).
+# ">label:stamp:value" (Teleplot style) also carries a device timestamp or sequence number.
+NUMBER = rb"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?"
+SAMPLE_PATTERN = re.compile(rb">(\w+):(?:[ \t]*(" + NUMBER + rb"):)?[ \t]*(" + NUMBER + rb")")
+LABEL_TOKEN = re.compile(rb">\w+:\Z")
+STRAY_LINE = re.compile(rb"^[ \t]*[^>\s]", re.MULTILINE)
+BAD_VALUE = object()  # _parse_clean: the block has the right shape but a value is not a NUMBER
+
+# Above this many channels in one block, group with np.unique instead of one mask per channel
+MASK_GROUP_LIMIT = 16
+
+
+def parse_block(block, stamps=None):
+    # Parse a block of complete lines in one pass.
+    # Returns {label: float64 array} with each channel's values in arrival order.
+    # `stamps`, if given, receives {label: float64 stamps} for channels that sent
+    # stamped lines (NaN for the channel's unstamped lines).
+    if not block:
+        return {}
+    result = _parse_clean(block)
+    if result is None:
+        # Usually only a few stray lines (boot messages, debug prints) or a ">label:value"
+        # without the space are in the way. Shape checks fail before any value is
+        # converted, so stamped blocks lose little here on their way to the regex.
+        clean = block
+        if STRAY_LINE.search(block):
+            clean = b"\n".join(line for line in block.splitlines() if line.startswith(b">"))
+        result = _parse_clean(clean.replace(b":", b": "))
+    if result is None or result is BAD_VALUE:
+        result = _parse_regex(block, stamps)
+    return result
+
+
+def _parse_clean(block):
+    # Fast path for a block made only of well-formed ">label: value" tokens.
+    # Splitting on whitespace leaves label/value pairs; the few distinct labels are
+    # checked with a regex and numpy converts all values at once.
+    # Returns None when the block does not have that shape, BAD_VALUE when a value
+    # is something NUMBER rejects but float() takes (nan, inf, 1_0), so every block
+    # parses the same way as the regex path would.
+    tokens = block.split()
+    if not tokens or len(tokens) % 2:
+        return None
+    labels = tokens[0::2]
+    names = list(dict.fromkeys(labels))
+    if not all(LABEL_TOKEN.match(name) for name in names):
+        return None
+    try:
+        values = np.array(tokens[1::2], dtype=np.float64)
+    except ValueError:
+        return BAD_VALUE
+    if not np.isfinite(values).all() or b"_" in b"".join(tokens[1::2]):
+        return BAD_VALUE
+
+    if len(names) == 1:
+        return {names[0][1:-1].decode("ascii"): values}
+    return _group(np.array(labels), names, values, strip=True)
+
+
+def _parse_regex(block, stamps=None):
+    matches = SAMPLE_PATTERN.findall(block)
+    if not matches:
+        return {}
+    labels, stamp_fields, values = zip(*matches)
+    values = np.array(values).astype(np.float64)
+    names = list(dict.fromkeys(labels))
+    if len(names) == 1:
+        result = {names[0].decode("ascii"): values}
+    else:
+        result = _group(np.array(labels), names, values, strip=False)
+    if stamps is not None and any(stamp_fields):
+        stamp_values = np.array([field or b"nan" for field in stamp_fields]).astype(np.float64)
+        if len(names) == 1:
+            grouped = {names[0].decode("ascii"): stamp_values}
+        else:
+            grouped = _group(np.array(labels), names, stamp_values, strip=False)
+        stamps.update((label, s) for label, s in grouped.items() if not np.isnan(s).all())
+    return result
+
+
+def _group(labels, names, values, strip):
+    def key(name):
+        return (name[1:-1] if strip else name).decode("ascii")
+
+    if len(names) <= MASK_GROUP_LIMIT:
+        return {key(name): values[labels == name] for name in names}
+
+    uniq, inverse = np.unique(labels, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    bounds = np.cumsum(np.bincount(inverse, minlength=len(uniq)))[:-1]
+    return {key(name): chunk for name, chunk in zip(uniq, np.split(values[order], bounds))}
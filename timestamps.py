@@ -0,0 +1,87 @@
+from time import perf_counter_ns, time_ns
+
+import numpy as np
+
+# perf_counter_ns() resolution on the time() scale. The offset is fixed once per
+# process, so timestamps stay monotonic and comparable with time.time().
+_EPOCH_NS = time_ns() - perf_counter_ns()
+
+
+def now():
+    return (perf_counter_ns() + _EPOCH_NS) / 1e9
+
+
+class ArrivalClock:
+    # Host-side timestamps: a chunk's samples were sent over the interval since the
+    # previous chunk arrived, so they are spread evenly over it instead of all
+    # getting the arrival time. `byte_time` (seconds per byte on the wire, known for
+    # serial ports) caps that interval after the link was idle.
+    def __init__(self, byte_time=None):
+        self.byte_time = byte_time
+        self.last = None
+
+    def span(self, arrival, nbytes):
+        last, self.last = self.last, arrival
+        span = arrival - last if last is not None else 0.0
+        if self.byte_time:
+            wire = nbytes * self.byte_time
+            span = min(span, wire) if last is not None else wire
+        return span
+
+    @staticmethod
+    def spread(arrival, span, n):
+        # n evenly spaced times, the last one at `arrival`
+        return arrival - span * np.arange(n - 1, -1, -1) / n
+
+
+class DeviceClock:
+    # Device-side timestamps from ">label:stamp:value" lines or stamped binary frames.
+    #   mode "time": stamps are device clock readings, `scale` seconds per unit (ms by default)
+    #   mode "seq":  stamps count samples, `scale` is the sample period in seconds
+    # Each channel is anchored to host time by the smallest (arrival - device time)
+    # seen so far, i.e. its fastest observed transfer, so queueing delays on the host
+    # do not distort the spacing. A stamp going backwards (device reset or counter
+    # wrap) re-anchors the channel.
+    def __init__(self, mode="time", scale=1e-3):
+        self.mode = mode
+        self.scale = scale
+        self.gaps = 0  # discontinuities seen
+        self.missing = 0  # samples missing in them
+        self._offset = {}
+        self._last = {}
+        self._step = {}  # typical stamp step per channel ("time" mode)
+        self._last_host = {}
+
+    def to_host(self, label, stamps, arrival):
+        if self._count_gaps(label, stamps):
+            self._offset.pop(label, None)
+        device = stamps * self.scale
+        offset = arrival - device[-1]
+        if offset < self._offset.get(label, np.inf):
+            self._offset[label] = offset
+        # A new, smaller offset (or a re-anchor) must not move the channel back in time
+        host = np.maximum(device + self._offset[label], self._last_host.get(label, -np.inf))
+        self._last_host[label] = host[-1]
+        return host
+
+    def _count_gaps(self, label, stamps):
+        # Returns True when the stamps went backwards
+        last = self._last.get(label)
+        self._last[label] = stamps[-1]
+        steps = np.diff(stamps, prepend=last) if last is not None else np.diff(stamps)
+        if not len(steps):
+            return False
+        if (steps < 0).any():
+            return True
+        if self.mode == "seq":
+            expected = 1.0
+        else:
+            expected = self._step.get(label) or float(np.median(steps))
+            self._step[label] = expected
+            if expected <= 0:
+                return False  # stamps coarser than the sample period
+        jumps = steps[steps > 1.5 * expected]
+        if len(jumps):
+            self.gaps += len(jumps)
+            self.missing += int(np.rint(jumps / expected).sum()) - len(jumps)
+        return False
@@ -0,0 +1,60 @@
+import math
+from collections import deque
+
+import numpy as np
+
+
+class SlidingExtrema:
+    # Running min/max of a time window in O(1) amortized time.
+    # Samples are pushed in blocks (one batch, reduced with numpy), and two
+    # monotonic deques of (t_last, value) keep only blocks that can still be
+    # the window's minimum or maximum. Eviction works at block granularity.
+    def __init__(self):
+        self._mins = deque()  # values increasing from the front
+        self._maxs = deque()  # values decreasing from the front
+
+    def push(self, t_last, values):
+        values = np.asarray(values, dtype=np.float64)
+        if not len(values):
+            return
+        low = float(values.min())
+        high = float(values.max())
+        if not (math.isfinite(low) and math.isfinite(high)):
+            # NaN/inf would stick in the deques and break autoscaling: skip them
+            values = values[np.isfinite(values)]
+            if not len(values):
+                return
+            low = float(values.min())
+            high = float(values.max())
+
+        mins = self._mins
+        while mins and mins[-1][1] >= low:
+            mins.pop()
+        mins.append((t_last, low))
+
+        maxs = self._maxs
+        while maxs and maxs[-1][1] <= high:
+            maxs.pop()
+        maxs.append((t_last, high))
+
+    def evict_before(self, t):
+        # Drop blocks whose newest sample is older than t
+        while self._mins and self._mins[0][0] < t:
+            self._mins.popleft()
+        while self._maxs and self._maxs[0][0] < t:
+            self._maxs.popleft()
+
+    def __bool__(self):
+        return bool(self._mins)
+
+    @property
+    def min(self):
+        return self._mins[0][1] if self._mins else None
+
+    @property
+    def max(self):
+        return self._maxs[0][1] if self._maxs else None
+
+    def clear(self):
+        self._mins.clear()
+        self._maxs.clear()